@@ -14,8 +14,10 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import json
+import logging
 from collections import defaultdict
-from concurrent.futures import Future
+from concurrent.futures import Future, wait
+from copy import deepcopy
 from functools import partial
 from threading import RLock
 
@@ -25,6 +27,8 @@ from bundleplacer.async import submit
 from bundleplacer.consts import DEFAULT_SERIES
 from bundleplacer.relationtype import RelationType
 
+log = logging.getLogger('bundleplacer')
+
 
 class CharmStoreID:
 
@@ -112,6 +116,9 @@ class MetadataController:
         self.readmes = {}
         self.readme_futures = {}
         self.readme_callbacks = {}
+        # charm id with revision : resources, see get_resources
+        self.resources = {}
+        self.resources_lock = RLock()
         self.metadata_future = None
         self.metadata_future_lock = RLock()
         self.info_callbacks = []
@@ -218,6 +225,22 @@ class MetadataController:
             self.iface_info[id_no_rev] = dict(requires=requires,
                                               provides=provides)
 
+        # the resources of the revisions that will be deployed, so
+        # deploying doesn't have to ask for them one charm at a time
+        resource_ids = []
+        for n in charm_names_or_sources:
+            csid = CharmStoreID(n)
+            if csid.rev == "":
+                info = self.charm_info.get(csid.as_str_without_rev())
+                if info is None:
+                    continue
+                csid = CharmStoreID(info['Id'])
+            resource_ids.append(csid.as_str())
+        try:
+            self.load_resources(resource_ids)
+        except Exception as e:
+            log.debug("Prefetching resources failed: {}".format(e))
+
     def get_recommended_charms(self):
         if not self.loaded():
             return []
@@ -287,19 +310,53 @@ class MetadataController:
             return {}
         return self.charm_info[charm_name]['Meta']['charm-config']['Options']
 
-    def get_resources(self, charm):
+    def load_resources(self, charms):
+        """ Fetches the resources of those of charms that aren't cached
+        yet, all with one charm store request
+
+        charms are charm ids including their revision.
+        """
+        with self.resources_lock:
+            missing = sorted(set(CharmStoreID(c).as_str() for c in charms) -
+                             set(self.resources))
+        if len(missing) == 0:
+            return
         resource_url = ("https://api.jujucharms.com/charmstore/v5/meta/any"
-                        "?include=resources&id={}".format(charm))
+                        "?include=resources&")
+        resource_url += "&".join("id={}".format(c) for c in missing)
         r = requests.get(resource_url)
-        if r.ok:
-            resources = r.json()
-            resources = resources[charm]['Meta']['resources']
-            for r in resources:
-                r['Origin'] = 'store'
-            return resources
-        else:
+        if not r.ok:
             raise Exception("API error getting resource info for "
-                            "charm={} url={}".format(charm, resource_url))
+                            "charms={} url={}".format(missing, resource_url))
+        metas = r.json()
+        with self.resources_lock:
+            for charm in missing:
+                if charm not in metas:
+                    continue
+                resources = metas[charm]['Meta']['resources']
+                for resource in resources:
+                    resource['Origin'] = 'store'
+                self.resources[charm] = resources
+
+    def get_resources(self, charm):
+        """ Returns the resources of charm, an id including its revision
+
+        Served from what the metadata load prefetched when possible,
+        otherwise asks the charm store for this charm and caches it.
+        """
+        if self.metadata_future and not self.metadata_future.done():
+            # may be prefetching it
+            wait([self.metadata_future])
+        key = CharmStoreID(charm).as_str()
+        with self.resources_lock:
+            resources = self.resources.get(key)
+        if resources is None:
+            self.load_resources([key])
+            with self.resources_lock:
+                resources = self.resources.get(key)
+        if resources is None:
+            raise Exception("No resource info for charm={}".format(charm))
+        return deepcopy(resources)
 
     def handle_search_error(self, e):
         self.error_cb(e)
@@ -4,6 +4,7 @@
 from conjureup import juju
 
 from .models import model_status
+from .watcher import current_status
 
 
 @juju.requires_login
@@ -13,7 +14,8 @@ def get_workload_statuses():
     Returns:
     List of all units status
     """
-    apps = model_status()['applications']
+    status = current_status() or model_status()
+    apps = status['applications']
     units = []
     for k, v in apps.items():
         if v['units'] is None:
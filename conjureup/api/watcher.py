@@ -0,0 +1,299 @@
+""" Live model state from the Juju AllWatcher
+
+Instead of pulling a FullStatus every time something wants to know what
+the model looks like, one AllWatcher stream is opened per model and its
+deltas are applied to an in-memory copy of the applications, units,
+machines and relations. Interested parties subscribe to be told when it
+changes.
+
+The watcher runs on a daemon thread of its own rather than an async
+queue: it spends its time blocked in AllWatcher.Next, and a queue's
+worker would be joined at exit, hanging conjure-up on quit until the
+model next changed.
+"""
+
+import sys
+from concurrent.futures import Future
+from threading import Event, RLock, Thread
+
+from conjureup import async, juju
+from conjureup.app_config import app
+from macumba.errors import ConnectionClosedError, RequestAbortedError
+
+this = sys.modules[__name__]
+
+# vars
+this.MODEL_STATE = None
+
+
+def _status_info(status):
+    """ Converts AllWatcher StatusInfo to the FullStatus layout
+    """
+    status = status or {}
+    return {'status': status.get('current', ''),
+            'info': status.get('message', ''),
+            'since': status.get('since', None)}
+
+
+def _application_status(application):
+    """ Converts an AllWatcher application to the FullStatus layout,
+    without its units
+    """
+    return {'charm': application.get('charm-url', ''),
+            'exposed': application.get('exposed', False),
+            'status': _status_info(application.get('status')),
+            'units': {}}
+
+
+class ModelState:
+    """ In-memory copy of a model kept current by an AllWatcher
+    """
+
+    # delta entity kind : field used as its key
+    KEYS = {'application': 'name',
+            'unit': 'name',
+            'machine': 'id',
+            'relation': 'key'}
+
+    def __init__(self, controller, model):
+        self.controller = controller
+        self.model = model
+        self.lock = RLock()
+        self.entities = {kind: {} for kind in self.KEYS}
+        self.subscribers = []
+        self.watcher_id = None
+        self.future = None
+        self.generation = 0
+        self.synced = Event()
+        self.stopped = Event()
+
+    @property
+    def applications(self):
+        return self.entities['application']
+
+    @property
+    def units(self):
+        return self.entities['unit']
+
+    @property
+    def machines(self):
+        return self.entities['machine']
+
+    @property
+    def relations(self):
+        return self.entities['relation']
+
+    def subscribe(self, cb):
+        """ Registers cb to be called with the list of changes after each
+        batch of deltas is applied
+
+        Changes are (kind, op, key) tuples, e.g. ('unit', 'change',
+        'mysql/0'). Callbacks run on the watcher thread.
+        """
+        with self.lock:
+            if cb not in self.subscribers:
+                self.subscribers.append(cb)
+
+    def unsubscribe(self, cb):
+        with self.lock:
+            if cb in self.subscribers:
+                self.subscribers.remove(cb)
+
+    def apply(self, deltas, reset=False):
+        """ Applies a batch of AllWatcher deltas
+
+        Arguments:
+        deltas: list of [kind, op, data] as returned by AllWatcher.Next
+        reset: deltas are the first batch of a new watcher, i.e. the
+               whole model, so anything not in them has gone away
+
+        Returns:
+        list of (kind, op, key) changes that were applied
+        """
+        changes = []
+        with self.lock:
+            if reset:
+                seen = {(kind, data[self.KEYS[kind]])
+                        for kind, op, data in deltas if kind in self.KEYS}
+                for kind, table in self.entities.items():
+                    for key in list(table):
+                        if (kind, key) not in seen:
+                            del table[key]
+                            changes.append((kind, 'remove', key))
+            for kind, op, data in deltas:
+                if kind not in self.KEYS:
+                    continue
+                key = data[self.KEYS[kind]]
+                table = self.entities[kind]
+                if op == 'remove':
+                    if table.pop(key, None) is None:
+                        continue
+                else:
+                    if table.get(key) == data:
+                        continue
+                    table[key] = data
+                changes.append((kind, op, key))
+            self.generation += 1
+            subscribers = list(self.subscribers)
+        self.synced.set()
+        if changes:
+            for cb in subscribers:
+                try:
+                    cb(changes)
+                except Exception:
+                    app.log.exception("model state subscriber failed")
+        return changes
+
+    def unit_status(self, name):
+        """ Returns a single unit in the FullStatus layout
+        """
+        with self.lock:
+            unit = self.units[name]
+            return {'workload-status': _status_info(
+                unit.get('workload-status')),
+                'agent-status': _status_info(unit.get('agent-status')),
+                'machine': unit.get('machine-id', ''),
+                'public-address': unit.get('public-address', '')}
+
+    def status(self):
+        """ Returns the current model in the same layout as FullStatus
+
+        Only the keys conjure-up reads from FullStatus are filled in.
+        """
+        with self.lock:
+            applications = {name: _application_status(application)
+                            for name, application
+                            in self.applications.items()}
+            for name, unit in self.units.items():
+                # a unit's delta can arrive before its application's
+                application = applications.setdefault(
+                    unit['application'], _application_status({}))
+                application['units'][name] = self.unit_status(name)
+            machines = {}
+            for mid, machine in self.machines.items():
+                machines[mid] = {
+                    'agent-status': _status_info(machine.get('agent-status')),
+                    'instance-id': machine.get('instance-id', ''),
+                    'series': machine.get('series', '')}
+            relations = [{'key': key,
+                          'endpoints': relation.get('endpoints', [])}
+                         for key, relation in self.relations.items()]
+            return {'applications': applications,
+                    'machines': machines,
+                    'relations': relations}
+
+    @juju.requires_login
+    def _watch(self):
+        while not self._stopping():
+            try:
+                self._follow()
+            except (ConnectionClosedError, RequestAbortedError) as e:
+                if self._stopping():
+                    return
+                # Watchers don't survive a reconnect, start a new one
+                # once the client is back. Its first batch is the whole
+                # model and replaces what we have.
+                app.log.debug("AllWatcher interrupted, restarting: "
+                              "{}".format(e))
+                async.sleep_until(1)
+            except Exception as e:
+                # stopping the AllWatcher fails the Next waiting on it
+                if self._stopping():
+                    app.log.debug("AllWatcher stopped: {}".format(e))
+                    return
+                raise
+
+    def _stopping(self):
+        return self.stopped.is_set() or async.ShutdownEvent.is_set()
+
+    def _follow(self):
+        rv = juju.CLIENT.Client(request="WatchAll")
+        self.watcher_id = rv['watcher-id']
+        app.log.debug("Watching model {}:{} with AllWatcher {}".format(
+            self.controller, self.model, self.watcher_id))
+        reset = True
+        while not self._stopping():
+            rv = juju.CLIENT.AllWatcher(request="Next",
+                                        object_id=self.watcher_id)
+            self.apply(rv.get('deltas', []), reset=reset)
+            reset = False
+
+    def _handle_exception(self, exc):
+        if self._stopping():
+            app.log.debug("AllWatcher for {}:{} stopped: {}".format(
+                self.controller, self.model, exc))
+            return
+        app.log.exception("AllWatcher for {}:{} stopped: {}".format(
+            self.controller, self.model, exc))
+
+    def start(self):
+        """ Starts following the model in the background
+        """
+        if self.future is not None and not self.future.done():
+            return self.future
+        if async.ShutdownEvent.is_set():
+            return None
+        self.stopped.clear()
+        self.future = Future()
+        self.future.set_running_or_notify_cancel()
+        Thread(target=self._run, args=(self.future,),
+               name="juju-watcher", daemon=True).start()
+        return self.future
+
+    def _run(self, future):
+        try:
+            future.set_result(self._watch())
+        except Exception as e:
+            self._handle_exception(e)
+            future.set_exception(e)
+
+    def stop(self):
+        self.stopped.set()
+        if self.watcher_id is not None and juju.CLIENT is not None:
+            try:
+                juju.CLIENT.submit("AllWatcher", "Stop",
+                                   object_id=self.watcher_id)
+            except Exception as e:
+                app.log.debug("Unable to stop AllWatcher: {}".format(e))
+
+    @property
+    def running(self):
+        return self.future is not None and not self.future.done()
+
+
+def shutdown():
+    """ Stops following the model, unblocking the watcher thread
+    """
+    state = this.MODEL_STATE
+    if state is not None:
+        state.stop()
+
+
+def model_state():
+    """ Returns the live ModelState for the current model, starting the
+    watcher if needed
+    """
+    state = this.MODEL_STATE
+    current = (app.current_controller, app.current_model)
+    if state is None or (state.controller, state.model) != current:
+        if state is not None:
+            state.stop()
+        state = ModelState(*current)
+        this.MODEL_STATE = state
+    state.start()
+    return state
+
+
+def current_status():
+    """ Returns the cached model status if the watcher has caught up,
+    otherwise None
+
+    Callers fall back to a FullStatus request on None.
+    """
+    state = this.MODEL_STATE
+    if state is None or not state.running or not state.synced.is_set():
+        return None
+    if (state.controller, state.model) != (app.current_controller,
+                                           app.current_model):
+        return None
+    return state.status()
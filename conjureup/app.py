@@ -2,6 +2,7 @@
 """
 
 import argparse
+import atexit
 import os
 import os.path as path
 import sys
@@ -13,7 +14,16 @@ from prettytable import PrettyTable
 from termcolor import colored
 
 from conjureup import __version__ as VERSION
-from conjureup import async, consts, controllers, utils
+from conjureup import (
+    async,
+    consts,
+    controllers,
+    journal,
+    juju,
+    statusstream,
+    utils
+)
+from conjureup.api import watcher
 from conjureup.app_config import app
 from conjureup.controllers.steps.common import get_step_metadata_filenames
 from conjureup.download import (
@@ -75,6 +85,39 @@ def parse_options(argv):
                         help='The MAAS node hostname to deploy to. Useful '
                         'for using lower end hardware as the Juju admin '
                         'controller.', metavar='<host>.maas')
+    parser.add_argument('--deploy-wait-ceiling', dest='deploy_wait_ceiling',
+                        type=float, metavar='SECONDS',
+                        help='Most time to leave between checks of whether '
+                        'the deployed applications are ready while the '
+                        'model isn\'t changing. The wait starts at 1 second '
+                        'and backs off to this. Defaults to 30 seconds.')
+    parser.add_argument('--model', dest='model',
+                        help='Name of an existing Juju model to deploy to. '
+                        'Only what the model lacks of the spell\'s bundle '
+                        'is deployed, e.g. to finish a run that failed '
+                        'part way through.')
+    parser.add_argument('--resume', action='store_true', dest='resume',
+                        help='Carry on with the last deployment of the '
+                        'spell from where it stopped, skipping what its '
+                        'journal and model show is done.')
+    parser.add_argument('--status-stream', dest='status_stream',
+                        metavar='TARGET',
+                        help='In headless mode, write a line of JSON for '
+                        'every unit status change while waiting for the '
+                        'deployment. TARGET is - for stdout, a file '
+                        'descriptor number, or a file to append to.')
+    parser.add_argument('--status-stream-throttle',
+                        dest='status_stream_throttle', type=float,
+                        default=1.0, metavar='SECONDS',
+                        help='Write at most one line per unit every SECONDS, '
+                        'going from its last written state to its latest. '
+                        '0 writes every change. Defaults to 1 second.')
+    parser.add_argument('--status-stream-detail',
+                        dest='status_stream_detail',
+                        choices=['status', 'all'], default='status',
+                        help='Write a line when the agent or workload '
+                        'status changes (status), or also when the status '
+                        'message, machine or address does (all).')
     parser.add_argument(
         '--version', action='version', version='%(prog)s {}'.format(VERSION))
     parser.add_argument('--notrack', action='store_true',
@@ -94,6 +137,7 @@ def parse_options(argv):
 
 def unhandled_input(key):
     if key in ['q', 'Q']:
+        watcher.shutdown()
         async.shutdown()
         EventLoop.exit(0)
 
@@ -121,6 +165,24 @@ def _start(*args, **kwargs):
         controllers.use('deploystatus').render()
         return
 
+    if app.argv.resume:
+        entries = journal.load()
+        last = journal.session(entries)
+        if last is None:
+            utils.error("No deployment of this spell to resume, {} "
+                        "not found".format(journal.journal_path()))
+            sys.exit(1)
+        app.current_controller, app.current_model = last
+        app.env['JUJU_CONTROLLER'] = app.current_controller
+        app.env['JUJU_MODEL'] = app.current_model
+        app.reconcile = True
+        journal.start(app.current_controller, app.current_model,
+                      resumed=entries)
+        app.log.info("Resuming deployment to {}:{}".format(
+            app.current_controller, app.current_model))
+        controllers.use('deploy').render()
+        return
+
     if app.argv.cloud:
         controllers.use('clouds').render()
         return
@@ -179,6 +241,10 @@ def main():
     if not os.path.isdir(opts.cache_dir):
         os.makedirs(opts.cache_dir)
 
+    if opts.status_stream == '-':
+        # only the status stream goes to stdout
+        statusstream.claim_stdout()
+
     if os.geteuid() == 0:
         utils.info("")
         utils.info("This should _not_ be run as root or with sudo.")
@@ -191,6 +257,9 @@ def main():
     app.log = setup_logging("conjure-up/{}".format(spell),
                             os.path.join(opts.cache_dir, 'conjure-up.log'),
                             opts.debug)
+    atexit.register(juju.dump_api_stats,
+                    os.path.join(opts.cache_dir, 'juju-api-stats.json'))
+    atexit.register(watcher.shutdown)
 
     # Setup proxy
     apply_proxy()
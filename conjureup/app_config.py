@@ -7,7 +7,10 @@ bootstrap = SimpleNamespace(
     running=False,
 
     # Attached output
-    output=None
+    output=None,
+
+    # Phases and timings of the running bootstrap, a BootstrapProgress
+    progress=None
 )
 
 maas = SimpleNamespace(
@@ -46,6 +49,10 @@ app = SimpleNamespace(
     # Current Juju controller selected
     current_controller=None,
 
+    # Deploying into an existing model, only what it lacks of the bundle
+    # (see reconcile.py)
+    reconcile=False,
+
     # Session ID for current deployment
     session_id=None,
 
@@ -1,13 +1,20 @@
 """ Async Handler
 Provides async operations for various api calls and other non-blocking
 work.
+
+Each named queue runs its jobs on its own pool of workers, one worker
+unless configure_queue() says otherwise. A job can depend on the futures
+of other jobs, in which case it is only queued once they have all
+finished, and can name a limit (see set_limit()) that caps how many jobs
+sharing it run at once across queues.
 """
 
 import logging
 import time
-from collections import defaultdict
-from concurrent.futures import ThreadPoolExecutor
-from threading import Event
+from collections import defaultdict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from threading import Event, Lock
 
 log = logging.getLogger("async")
 
@@ -16,22 +23,219 @@ class ThreadCancelledException(Exception):
     """Exception meaning intentional cancellation"""
 
 
+class DependencyFailed(Exception):
+    """A job wasn't run because a job it depends on failed"""
+
+
 ShutdownEvent = Event()
 
 _queues = defaultdict(lambda: ThreadPoolExecutor(1))
+_limits = {}
+_limits_lock = Lock()
 DEFAULT_QUEUE = "DEFAULT"
 
 
-def submit(func, exc_callback, queue_name="DEFAULT"):
+class _Limit:
+    """ Jobs sharing a limit key, at most n of them handed to workers at
+    once, the rest waiting their turn without holding a worker
+    """
+
+    def __init__(self, n):
+        self.n = n
+        self.running = 0
+        self.waiting = deque()
+
+
+def configure_queue(queue_name, workers):
+    """ Lets up to workers jobs of queue_name run at once
+
+    Must be called before anything is submitted to the queue.
+    """
+    if queue_name in _queues:
+        raise Exception("Queue {} is already running".format(queue_name))
+    _queues[queue_name] = ThreadPoolExecutor(workers)
+
+
+def set_limit(key, n):
+    """ Lets at most n jobs submitted with limit=key run at once
+    """
+    with _limits_lock:
+        limit = _limits.get(key)
+        if limit is None:
+            _limits[key] = _Limit(n)
+            return
+        limit.n = n
+    _next(key)
+
+
+def _job_name(func):
+    while isinstance(func, partial):
+        func = func.func
+    return getattr(func, '__qualname__', repr(func))
+
+
+def _run(func, name, queue_name, queued_at):
+    started = time.time()
+    ok = False
+    try:
+        rv = func()
+        ok = True
+        return rv
+    finally:
+        log.debug("{} on {}: waited {:.2f}s, ran {:.2f}s{}".format(
+            name, queue_name, started - queued_at, time.time() - started,
+            "" if ok else ", failed"))
+
+
+def _chain(dst, src):
+    if src.cancelled():
+        dst.set_exception(ThreadCancelledException("Job cancelled"))
+    elif src.exception() is not None:
+        dst.set_exception(src.exception())
+    else:
+        dst.set_result(src.result())
+
+
+def _start(f, job, limit):
+    """ Hands job to its queue's workers, f gets its result """
+    func, name, queue_name, queued_at = job
+    if not f.set_running_or_notify_cancel():
+        _done(limit)
+        return
+    try:
+        inner = _queues[queue_name].submit(_run, *job)
+    except RuntimeError as e:
+        # shutting down
+        f.set_exception(ThreadCancelledException(str(e)))
+        _done(limit)
+        return
+
+    def inner_done(src):
+        _done(limit)
+        _chain(f, src)
+    inner.add_done_callback(inner_done)
+
+
+def _queue(f, job, limit):
+    """ Starts job now, or once its limit lets it """
+    if limit is not None:
+        with _limits_lock:
+            lim = _limits.get(limit)
+            if lim is not None:
+                if lim.running >= lim.n:
+                    lim.waiting.append((f, job))
+                    return
+                lim.running += 1
+    _start(f, job, limit)
+
+
+def _done(limit):
+    if limit is None:
+        return
+    with _limits_lock:
+        lim = _limits.get(limit)
+        if lim is None:
+            return
+        lim.running -= 1
+    _next(limit)
+
+
+def _next(limit):
+    """ Starts the jobs waiting on limit that it now has room for """
+    while True:
+        with _limits_lock:
+            lim = _limits[limit]
+            if not lim.waiting or lim.running >= lim.n:
+                return
+            f, job = lim.waiting.popleft()
+            lim.running += 1
+        _start(f, job, limit)
+
+
+def submit(func, exc_callback, queue_name=DEFAULT_QUEUE, depends=None,
+           limit=None):
+    """ Runs func on queue_name's workers
+
+    Arguments:
+    func: callable taking no arguments
+    exc_callback: called with the exception if func raises
+    queue_name: queue to run on
+    depends: futures that must complete before func is queued; if any of
+             them fails, func isn't run and the returned future raises
+             DependencyFailed (exc_callback isn't called for it, the
+             dependency has reported its own error)
+    limit: key of a limit set with set_limit(); func is only handed to a
+           worker once the limit has room for it, until then it waits
+           without taking up a worker
+
+    Returns:
+    future of func's result, None during shutdown
+    """
     def cb(cb_f):
+        if cb_f.cancelled():
+            return
         e = cb_f.exception()
-        if e:
+        if e and not isinstance(e, DependencyFailed):
             exc_callback(e)
     if ShutdownEvent.is_set():
         log.debug("ignoring async.submit due to impending shutdown.")
         return
-    f = _queues[queue_name].submit(func)
+    name = _job_name(func)
+    job = (func, name, queue_name, time.time())
+    depends = [d for d in (depends or []) if d is not None]
+    f = Future()
     f.add_done_callback(cb)
+    if not depends:
+        _queue(f, job, limit)
+        return f
+
+    remaining = [len(depends)]
+    lock = Lock()
+
+    def dependency_done(_):
+        with lock:
+            remaining[0] -= 1
+            if remaining[0] > 0:
+                return
+        failed = [d for d in depends
+                  if d.cancelled() or d.exception() is not None]
+        if failed:
+            if not f.set_running_or_notify_cancel():
+                return
+            log.debug("{} on {}: not run, a dependency failed".format(
+                name, queue_name))
+            f.set_exception(DependencyFailed(
+                "{} depends on a job that failed".format(name)))
+            return
+        _queue(f, job, limit)
+
+    for d in depends:
+        d.add_done_callback(dependency_done)
+    return f
+
+
+def when_all(fs):
+    """ Returns a future of the list fs, done once every future in fs is
+
+    The returned future never fails, check each of fs for how it went.
+    """
+    fs = list(fs)
+    f = Future()
+    f.set_running_or_notify_cancel()
+    remaining = [len(fs)]
+    lock = Lock()
+
+    def one_done(_):
+        with lock:
+            remaining[0] -= 1
+            if remaining[0] > 0:
+                return
+        f.set_result(fs)
+
+    if not fs:
+        f.set_result(fs)
+    for d in fs:
+        d.add_done_callback(one_done)
     return f
 
 
@@ -46,8 +250,8 @@ def sleep_until(s):
     If the ShutdownEvent is raised before the wait is over,
     raises a ThreadCancelledException.
     """
-    start = time.time()
-    while not ShutdownEvent.wait(timeout=.1):
-        if time.time() - start >= s:
+    end = time.time() + s
+    while not ShutdownEvent.wait(timeout=max(0, min(.1, end - time.time()))):
+        if time.time() >= end:
             return True
     raise ThreadCancelledException("Thread cancelled while sleeping")
@@ -0,0 +1,142 @@
+""" Bootstrap progress
+
+Follows the output of `juju bootstrap` as it is written and works out
+which phase of the bootstrap it's in, and how long each phase took.
+
+Example:
+progress = BootstrapProgress()
+progress.add_listener(lambda phase, previous: print(phase.label))
+for line in proc.stderr:
+    progress.feed(line.decode())
+print(progress.summary())
+"""
+
+import re
+import time
+from collections import deque
+from threading import Lock
+
+
+class Phase:
+
+    __slots__ = ('name', 'label', 'pattern')
+
+    def __init__(self, name, label, pattern):
+        self.name = name
+        self.label = label
+        self.pattern = re.compile(pattern)
+
+    def __repr__(self):
+        return "<Phase {}>".format(self.name)
+
+
+# In the order juju goes through them, with the first line juju 2.x
+# prints for each
+PHASES = [
+    Phase('prepare', "Preparing",
+          r'^Creating Juju controller'),
+    Phase('launch', "Launching the controller instance",
+          r'^Launching controller instance'),
+    Phase('connect', "Waiting for the instance to come up",
+          r'^(Waiting for address|Attempting to connect to)'),
+    Phase('provision', "Installing packages on the instance",
+          r'^(Logging to .*cloud-init|Running apt-get|Installing )'),
+    Phase('tools', "Fetching the Juju agent",
+          r'^(Fetching Juju agent|Preparing local Juju agent|'
+          r'Uploading .*agent)'),
+    Phase('agent', "Starting the Juju agent",
+          r'^(Starting Juju machine agent|Bootstrap agent now started)'),
+    Phase('api', "Waiting for the controller API",
+          r'^Contacting Juju controller'),
+    Phase('done', "Bootstrap complete",
+          r'^Bootstrap complete'),
+]
+
+
+class BootstrapProgress:
+    """ Phases a bootstrap has been through, fed its output line by line
+
+    Phases only ever move forward: a line matching a phase earlier than
+    the current one is taken as more output of the current phase.
+    """
+
+    def __init__(self, phases=None, tail_lines=10, clock=time.time):
+        self.phases = phases or PHASES
+        self.clock = clock
+        self.started = clock()
+        self.finished = None
+        # (phase, time it started)
+        self.events = []
+        self.tail = deque(maxlen=tail_lines)
+        self.listeners = []
+        self.lock = Lock()
+
+    def add_listener(self, cb):
+        """ Calls cb(phase, previous) on every phase change, previous being
+        (phase, seconds it took) or None for the first phase
+        """
+        self.listeners.append(cb)
+
+    @property
+    def current(self):
+        with self.lock:
+            return self.events[-1][0] if self.events else None
+
+    def feed(self, line):
+        """ Takes a line of bootstrap output
+
+        Returns the phase it starts, or None if it doesn't start one.
+        """
+        line = line.strip()
+        if not line:
+            return None
+        now = self.clock()
+        with self.lock:
+            self.tail.append(line)
+            index = 0
+            if self.events:
+                index = self.phases.index(self.events[-1][0]) + 1
+            phase = next((p for p in self.phases[index:]
+                          if p.pattern.search(line)), None)
+            if phase is None:
+                return None
+            previous = None
+            if self.events:
+                last, started = self.events[-1]
+                previous = (last, now - started)
+            self.events.append((phase, now))
+        for cb in self.listeners:
+            cb(phase, previous)
+        return phase
+
+    def finish(self):
+        """ Marks the bootstrap as over, the current phase ends now """
+        with self.lock:
+            self.finished = self.clock()
+
+    def durations(self):
+        """ Returns (phase, seconds) of every phase gone through so far,
+        the current one's being how long it's been running
+        """
+        with self.lock:
+            end = self.finished or self.clock()
+            starts = [started for _, started in self.events[1:]] + [end]
+            return [(phase, stop - started)
+                    for (phase, started), stop in zip(self.events, starts)]
+
+    def elapsed(self):
+        """ Seconds since the bootstrap started """
+        return (self.finished or self.clock()) - self.started
+
+    def output(self):
+        """ The last few lines of output """
+        with self.lock:
+            return list(self.tail)
+
+    def summary(self):
+        lines = ["Bootstrap took {:.0f}s".format(self.elapsed())]
+        for phase, seconds in self.durations():
+            if phase.name == 'done':
+                continue
+            lines.append("  {:<40} {:>6.0f}s".format(phase.label, seconds))
+        return "\n".join(lines)
@@ -32,6 +32,20 @@ class CloudsController:
         utils.info("Using controller '{}'".format(existing_controller))
 
         app.current_controller = existing_controller
+        if app.argv.model:
+            try:
+                juju.get_model(app.current_controller, app.argv.model)
+            except LookupError:
+                utils.error("Specified model '{}' could not be found on "
+                            "controller '{}'.".format(
+                                app.argv.model, app.current_controller))
+                sys.exit(1)
+            app.current_model = app.argv.model
+            app.reconcile = True
+            utils.info("Using existing juju model '{}'".format(
+                app.current_model))
+            return controllers.use('deploy').render()
+
         app.current_model = petname.Name()
         utils.info("Creating new juju model named '{}', "
                    "please wait.".format(app.current_model))
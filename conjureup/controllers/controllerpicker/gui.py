@@ -1,6 +1,6 @@
 import petname
 
-from conjureup import async, controllers, juju
+from conjureup import controllers, juju
 from conjureup.app_config import app
 from conjureup.telemetry import track_exception, track_screen
 from conjureup.ui.views.ControllerListView import ControllerListView
@@ -15,18 +15,24 @@ class ControllerPicker:
         track_exception(exc.args[0])
         app.ui.show_exception_message(exc)
 
-    def __add_model(self):
-        juju.add_model(app.current_model, app.current_controller)
-
     def finish(self, controller):
         if controller is None:
             return controllers.use('clouds').render()
 
         app.current_controller = controller
+        if app.argv.model:
+            try:
+                juju.get_model(controller, app.argv.model)
+            except LookupError as e:
+                return self.__handle_exception(e)
+            app.current_model = app.argv.model
+            app.reconcile = True
+            return controllers.use('deploy').render()
+
         app.current_model = petname.Name()
-        async.submit(self.__add_model,
-                     self.__handle_exception,
-                     queue_name=juju.JUJU_ASYNC_QUEUE)
+        juju.add_model_async(app.current_model,
+                             app.current_controller,
+                             self.__handle_exception)
 
         return controllers.use('deploy').render()
 
@@ -4,7 +4,7 @@ from functools import partial
 from operator import attrgetter
 from subprocess import PIPE
 
-from conjureup import async, controllers, juju, utils
+from conjureup import controllers, journal, juju, reconcile, utils
 from conjureup.api.models import model_info
 from conjureup.app_config import app
 from conjureup.telemetry import track_event, track_exception, track_screen
@@ -95,14 +95,19 @@ class DeployController:
                             app.metadata_controller.series,
                             msg_cb=msg_both,
                             exc_cb=partial(self._handle_exception, "ED"))
+        # relations with applications deployed earlier needn't wait for
+        # the rest
+        juju.set_relations([application],
+                           exc_cb=partial(self._handle_exception, "ED"),
+                           ready_only=True)
 
     def do_deploy_remaining(self):
         "deploys all un-deployed applications"
-        for application in self.undeployed_applications:
-            juju.deploy_service(application,
-                                app.metadata_controller.series,
-                                app.ui.set_footer,
-                                partial(self._handle_exception, "ED"))
+        juju.deploy_services(self.undeployed_applications,
+                             app.metadata_controller.series,
+                             app.ui.set_footer,
+                             partial(self._handle_exception, "ED"))
+        self.undeployed_applications = []
 
     def finish(self):
         juju.set_relations(self.applications,
@@ -114,22 +119,39 @@ class DeployController:
         else:
             return controllers.use('deploystatus').render()
 
+    def _reconcile_done(self, future):
+        if future.exception() is None:
+            self.finish()
+
     def render(self):
         track_screen("Deploy")
+        journal.begin(app.current_controller, app.current_model)
+        # charm store lookups can start while the user looks at the list
+        juju.prepare_deploys(app.metadata_controller.bundle.services)
         try:
-            future = async.submit(self._pre_deploy_exec,
-                                  partial(self._handle_exception, 'E003'),
-                                  queue_name=juju.JUJU_ASYNC_QUEUE)
+            future = juju.submit(self._pre_deploy_exec,
+                                 partial(self._handle_exception, 'E003'),
+                                 setup=True)
             future.add_done_callback(self._pre_deploy_done)
         except Exception as e:
             return self._handle_exception('E003', e)
 
-        juju.add_machines(
-            list(app.metadata_controller.bundle.machines.values()),
-            exc_cb=partial(self._handle_exception, "ED"))
-
+        machines = list(app.metadata_controller.bundle.machines.values())
         self.applications = sorted(app.metadata_controller.bundle.services,
                                    key=attrgetter('service_name'))
+        if app.reconcile:
+            # existing model, deploy what it lacks without asking
+            app.ui.set_footer("Comparing the model with the bundle...")
+            future = reconcile.reconcile(self.applications, machines,
+                                         app.ui.set_footer,
+                                         partial(self._handle_exception,
+                                                 "ED"))
+            future.add_done_callback(self._reconcile_done)
+            return
+
+        juju.add_machines(machines,
+                          exc_cb=partial(self._handle_exception, "ED"))
+
         self.undeployed_applications = self.applications[:]
 
         self.list_view = ApplicationListView(self.applications,
@@ -6,7 +6,7 @@ from functools import partial
 from operator import attrgetter
 from subprocess import PIPE
 
-from conjureup import controllers, juju, utils
+from conjureup import controllers, journal, juju, reconcile, utils
 from conjureup.api.models import model_info
 from conjureup.app_config import app
 
@@ -57,11 +57,17 @@ class DeployController:
     def finish(self):
         """ handles deployment
         """
-        for service in self.applications:
-            juju.deploy_service(service,
-                                app.metadata_controller.series,
-                                utils.info,
-                                partial(self.__handle_exception, "ED"))
+        if app.reconcile:
+            reconcile.reconcile(
+                self.applications,
+                list(app.metadata_controller.bundle.machines.values()),
+                utils.info,
+                partial(self.__handle_exception, "ED")).result()
+        else:
+            juju.deploy_services(self.applications,
+                                 app.metadata_controller.series,
+                                 utils.info,
+                                 partial(self.__handle_exception, "ED"))
 
         f = juju.set_relations(self.applications,
                                utils.info,
@@ -71,10 +77,12 @@ class DeployController:
         controllers.use('deploystatus').render()
 
     def render(self):
+        journal.begin(app.current_controller, app.current_model)
         self.do_pre_deploy()
-        juju.add_machines(
-            list(app.metadata_controller.bundle.machines.values()),
-            exc_cb=partial(self.__handle_exception, "ED"))
+        if not app.reconcile:
+            juju.add_machines(
+                list(app.metadata_controller.bundle.machines.values()),
+                exc_cb=partial(self.__handle_exception, "ED"))
         self.applications = sorted(app.metadata_controller.bundle.services,
                                    key=attrgetter('service_name'))
 
@@ -2,14 +2,124 @@ import json
 import os
 import time
 from subprocess import CalledProcessError
+from threading import Event, Lock
 
-from conjureup import utils
+from conjureup import async, utils
+from conjureup.api import watcher
 from conjureup.app_config import app
 
+# Seconds to wait for a model change before running the deploy-done
+# check anyway. Doubles after every wait that sees no change, up to the
+# ceiling, which --deploy-wait-ceiling overrides, and goes back to the
+# start once the model changes. Runs are never closer than GAP_INITIAL.
+GAP_INITIAL = 1
+WAIT_CEILING = 30
+# Without a live model state nothing says when to look again, so never
+# wait longer than the fixed interval this replaced
+POLL_MAX = 5
+# Seconds without a model change for it to count as settled, and the
+# longest a stream of changes holds back a check
+SETTLE = .5
+SETTLE_MAX = 5
+
+
+class ModelChanges:
+    """ Tells a waiting thread when the model has changed and settled
+
+    Subscribed to the live model state, whose watcher thread calls it
+    with every batch of changes.
+    """
+
+    def __init__(self):
+        self.changed = Event()
+        self.lock = Lock()
+        self.last = None
+
+    def __call__(self, changes):
+        with self.lock:
+            self.last = time.time()
+        self.changed.set()
+
+    def wait(self, timeout):
+        """ Waits up to timeout seconds for the model to change, then for
+        it to settle
+
+        Returns:
+        True if it changed, False if the timeout passed without a change
+        """
+        if not self.changed.wait(timeout):
+            return False
+        first = time.time()
+        while True:
+            with self.lock:
+                quiet = time.time() - self.last
+                self.changed.clear()
+            if quiet >= SETTLE or time.time() - first >= SETTLE_MAX:
+                return True
+            async.sleep_until(SETTLE - quiet)
+
+
+def _subscribe():
+    """ Returns ModelChanges following the current model, or None if the
+    watcher can't be started
+    """
+    changes = ModelChanges()
+    try:
+        watcher.model_state().subscribe(changes)
+    except Exception as e:
+        app.log.debug("Not following model changes, polling: {}".format(e))
+        return None
+    return changes
+
+
+def _unsubscribe(changes):
+    if changes is None:
+        return
+    try:
+        watcher.model_state().unsubscribe(changes)
+    except Exception:
+        app.log.debug("Unable to unsubscribe from model changes")
+
+
+def _wait_ceiling():
+    ceiling = getattr(app.argv, 'deploy_wait_ceiling', None)
+    return float(ceiling) if ceiling else WAIT_CEILING
+
+
+def _report(script, checks, started):
+    """ Logs how long waiting for the applications took
+
+    Arguments:
+    script: the deploy-done script
+    checks: (seconds waited before it, why, seconds it ran) of each run
+            of script
+    started: when waiting started
+    """
+    if not checks:
+        return
+    ran = sum(c[2] for c in checks)
+    waited = sum(c[0] for c in checks)
+    woken = sum(1 for c in checks if c[1] == 'change')
+    lines = ["Waited {:.1f}s for applications: {} checks, {} after a "
+             "model change, {:.1f}s running {}, {:.1f}s waiting".format(
+                 time.time() - started, len(checks), woken, ran,
+                 os.path.basename(script), waited)]
+    for n, (wait, why, run) in enumerate(checks, 1):
+        lines.append("  check {:>3}: waited {:>6.1f}s ({}), "
+                     "ran {:>5.1f}s".format(n, wait, why, run))
+    app.log.info("\n".join(lines))
+
 
 def wait_for_applications(script, msg_cb):
     """ Processes a 00_deploy-done to verify if applications are available
 
+    The script is run again once the model has changed and settled,
+    but no sooner than GAP_INITIAL after the last run started. If the
+    model doesn't change it's run again after a gap that doubles each
+    time, up to a ceiling, and starts over once the model changes.
+    Without a live model state it's run every gap, but at least every
+    POLL_MAX seconds.
+
     Arguments:
     script: script to run (00_deploy-done.sh)
     msg_cb: message callback
@@ -17,11 +127,19 @@ def wait_for_applications(script, msg_cb):
     if os.path.isfile(script) \
        and os.access(script, os.X_OK):
         msg_cb("Waiting for applications to start")
+        changes = _subscribe()
+        ceiling = _wait_ceiling()
+        gap = min(GAP_INITIAL, ceiling)
+        started = time.time()
+        checks = []
+        wait, why = 0, 'start'
         try:
             rerun = True
             count = 0
             while rerun:
+                ran = time.time()
                 sh = utils.run_script(script)
+                checks.append((wait, why, time.time() - ran))
                 if sh.returncode != 0:
                     app.log.error("error running {}:\n{}".format(script,
                                                                  sh.stderr))
@@ -39,13 +157,31 @@ def wait_for_applications(script, msg_cb):
                         "Failure in deploy done: {}".format(result['message']))
                     raise Exception(result['message'])
                 if not result['isComplete']:
-                    time.sleep(5)
                     if count == 0:
                         msg_cb("{}, please wait".format(
                             result['message']))
                         count += 1
+                    waiting = time.time()
+                    if changes is None:
+                        async.sleep_until(
+                            max(0, ran + min(gap, POLL_MAX) - waiting))
+                        why = 'timeout'
+                    elif changes.wait(max(0, ran + gap - waiting)):
+                        why = 'change'
+                    else:
+                        why = 'timeout'
+                    if why == 'change':
+                        gap = min(GAP_INITIAL, ceiling)
+                        async.sleep_until(
+                            max(0, ran + GAP_INITIAL - time.time()))
+                    else:
+                        gap = min(gap * 2, ceiling)
+                    wait = time.time() - waiting
                     continue
                 count = 0
                 rerun = False
         except CalledProcessError as e:
             raise e
+        finally:
+            _unsubscribe(changes)
+            _report(script, checks, started)
@@ -2,7 +2,8 @@ import os
 import os.path as path
 from functools import partial
 
-from conjureup import async, controllers, juju
+from conjureup import controllers, juju, unithistory
+from conjureup.api.watcher import model_state
 from conjureup.app_config import app
 from conjureup.telemetry import track_exception, track_screen
 from conjureup.ui.views.deploystatus import DeployStatusView
@@ -27,21 +28,23 @@ class DeployStatusController:
         deploy_done_sh = os.path.join(self.bundle_scripts,
                                       '00_deploy-done')
 
-        future = async.submit(partial(common.wait_for_applications,
-                                      deploy_done_sh,
-                                      app.ui.set_footer),
-                              partial(self.__handle_exception, 'ED'),
-                              queue_name=juju.JUJU_ASYNC_QUEUE)
+        future = juju.submit(partial(common.wait_for_applications,
+                                     deploy_done_sh,
+                                     app.ui.set_footer),
+                             partial(self.__handle_exception, 'ED'),
+                             depends=juju.deploy_futures(),
+                             limited=False)
         future.add_done_callback(self.finish)
 
     def finish(self, future):
         if not future.exception():
+            app.log.info(unithistory.report(app.config['spell']))
             return controllers.use('steps').render()
         EventLoop.remove_alarms()
 
-    def __refresh(self, *args):
-        self.view.refresh_nodes()
-        EventLoop.set_alarm_in(1, self.__refresh)
+    def __handle_model_change(self, changes):
+        if any(kind == 'unit' for kind, _, _ in changes):
+            self.view.refresh_nodes()
 
     def render(self):
         """ Render deploy status view
@@ -58,7 +61,10 @@ class DeployStatusController:
                 name)
         )
         app.ui.set_body(self.view)
-        self.__refresh()
+        unithistory.start(app.config['spell'], app.current_controller,
+                          app.current_model)
+        model_state().subscribe(self.__handle_model_change)
+        self.view.refresh_nodes()
         self.__wait_for_applications()
 
 
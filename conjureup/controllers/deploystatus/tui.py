@@ -2,7 +2,7 @@ import os
 import sys
 from functools import partial
 
-from conjureup import async, controllers, juju, utils
+from conjureup import controllers, juju, statusstream, utils
 from conjureup.app_config import app
 
 from . import common
@@ -20,17 +20,23 @@ class DeployStatusController:
         sys.exit(1)
 
     def finish(self, future):
+        statusstream.stop()
         if not future.exception():
             return controllers.use('steps').render()
 
     def render(self):
+        if app.argv.status_stream:
+            statusstream.start(app.argv.status_stream,
+                               app.argv.status_stream_throttle,
+                               app.argv.status_stream_detail)
         deploy_done_sh = os.path.join(self.bundle_scripts,
                                       '00_deploy-done')
-        future = async.submit(partial(common.wait_for_applications,
-                                      deploy_done_sh,
-                                      utils.info),
-                              partial(self.__handle_exception, 'ED'),
-                              queue_name=juju.JUJU_ASYNC_QUEUE)
+        future = juju.submit(partial(common.wait_for_applications,
+                                     deploy_done_sh,
+                                     utils.info),
+                             partial(self.__handle_exception, 'ED'),
+                             depends=juju.deploy_futures(),
+                             limited=False)
         future.add_done_callback(self.finish)
 
 
@@ -60,6 +60,8 @@ class NewCloudController:
 
         app.ui.set_footer('Bootstrapping Juju controller in the background...')
 
+        # look up what the deploy needs while the controller comes up
+        juju.prepare_deploys(app.metadata_controller.bundle.services)
         future = juju.bootstrap_async(
             controller=app.current_controller,
             cloud=cloud,
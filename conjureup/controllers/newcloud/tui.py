@@ -72,6 +72,8 @@ class NewCloudController:
             app.log.debug("Found an IPv4 address, "
                           "assuming LXD is configured.")
 
+        # look up what the deploy needs while the controller comes up
+        juju.prepare_deploys(app.metadata_controller.bundle.services)
         utils.info("Bootstrapping Juju controller")
         p = juju.bootstrap(controller=app.current_controller,
                            cloud=self.cloud,
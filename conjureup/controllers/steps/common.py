@@ -2,7 +2,7 @@ import json
 import os
 from glob import glob
 
-from conjureup import utils
+from conjureup import journal, utils
 from conjureup.api.models import model_info
 from conjureup.app_config import app
 
@@ -77,6 +77,14 @@ def do_step(step_model, step_widget, message_cb, gui=False):
     # Set environment variables so they can be accessed from the step scripts
     set_env(step_model.additional_input)
 
+    step_name = os.path.basename(step_model.path)
+    result = journal.step_result(step_name)
+    if result is not None:
+        # finished before conjure-up was restarted
+        step_model.result = result
+        message_cb("{} already completed.".format(step_model.title))
+        return (step_model, step_widget)
+
     if not os.access(step_model.path, os.X_OK):
         app.log.error("Step {} not executable".format(step_model.path))
 
@@ -104,6 +112,7 @@ def do_step(step_model, step_widget, message_cb, gui=False):
         raise Exception(result['message'])
 
     step_model.result = result['message']
+    journal.record('step', name=step_name, result=step_model.result)
     message_cb("{} completed.".format(step_model.title))
 
     return (step_model, step_widget)
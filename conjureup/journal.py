@@ -0,0 +1,139 @@
+""" Deployment journal
+
+The model a deployment goes to and every step that completes are
+appended to a journal in the cache dir, one JSON object per line, flushed
+to disk before carrying on. The spell directory isn't used, it's
+downloaded afresh on every start. If conjure-up dies part way,
+`conjure-up --resume` reads it back to find the controller and model it
+was deploying to and which steps have already run.
+
+Applications, units, exposure and relations aren't journaled: resuming
+deploys what the model itself shows is missing (see reconcile.py).
+
+Example entries:
+{"op": "start", "controller": "c", "model": "m", "t": 1480000000.0}
+{"op": "step", "name": "step-01_configure", "result": "Done", "t": ...}
+"""
+
+import json
+import os
+import sys
+import time
+from threading import Lock
+
+from conjureup.app_config import app
+
+JOURNAL_FILE = "{}-deploy-journal.jsonl"
+
+this = sys.modules[__name__]
+
+# vars
+# journal being written to, None until start()
+this.PATH = None
+this.LOCK = Lock()
+# entries of the run being resumed
+this.RESUMED = []
+
+
+def journal_path():
+    """ Returns the path of the current spell's journal
+    """
+    spell = app.config['spell'].replace('/', '_')
+    return os.path.join(app.argv.cache_dir, JOURNAL_FILE.format(spell))
+
+
+def load(path=None):
+    """ Returns the entries of the journal, [] if there is none
+
+    A last line cut short by a crash is left out.
+    """
+    path = path or journal_path()
+    entries = []
+    try:
+        with open(path) as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    app.log.debug("Skipping damaged journal line: "
+                                  "{}".format(line))
+    except FileNotFoundError:
+        pass
+    return entries
+
+
+def session(entries):
+    """ Returns (controller, model) of the last run in entries, or None
+    """
+    for entry in reversed(entries):
+        if entry.get('op') == 'start':
+            return entry['controller'], entry['model']
+    return None
+
+
+def _end_damaged_line(path):
+    """ Terminates a last line cut short by a crash, so entries appended
+    after it stay readable
+    """
+    with open(path, 'ab+') as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() == 0:
+            return
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b"\n":
+            f.write(b"\n")
+
+
+def start(controller, model, resumed=None):
+    """ Starts journaling a deployment to controller:model
+
+    Arguments:
+    controller: controller name
+    model: model name
+    resumed: entries of the run being resumed, which the journal keeps;
+             otherwise it is started afresh
+    """
+    with this.LOCK:
+        this.PATH = journal_path()
+        this.RESUMED = list(resumed or [])
+        if not resumed:
+            open(this.PATH, 'w').close()
+        else:
+            _end_damaged_line(this.PATH)
+    record('start', controller=controller, model=model)
+
+
+def begin(controller, model):
+    """ start() afresh, unless a journal is already being written to
+    """
+    if this.PATH is None:
+        start(controller, model)
+
+
+def record(op, **fields):
+    """ Appends an entry for a completed operation, once it's on disk
+    """
+    if this.PATH is None:
+        return
+    fields['op'] = op
+    fields['t'] = time.time()
+    line = json.dumps(fields, sort_keys=True) + "\n"
+    with this.LOCK:
+        try:
+            with open(this.PATH, 'a') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError as e:
+            app.log.warning("Unable to write to journal {}: {}".format(
+                this.PATH, e))
+
+
+def step_result(name):
+    """ Returns the result step name had in the run being resumed, or
+    None if it didn't complete
+    """
+    for entry in reversed(this.RESUMED):
+        if entry.get('op') == 'step' and entry.get('name') == name:
+            return entry.get('result')
+    return None
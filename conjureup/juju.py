@@ -2,20 +2,37 @@
 """
 import os
 import sys
+from collections import defaultdict
 from concurrent import futures
 from functools import partial, wraps
 from subprocess import DEVNULL, PIPE, CalledProcessError, Popen, TimeoutExpired
+from threading import RLock, Thread
 
 import yaml
 
 import macumba
 from bundleplacer.charmstore_api import CharmStoreID
-from conjureup import async
+from conjureup import async, jujudata, sessioncache
 from conjureup.app_config import app
+from conjureup.bootstrap_progress import BootstrapProgress
 from conjureup.utils import juju_path, run
+from macumba.recorder import SessionRecorder
+from macumba.stats import CallStats
 from macumba.v2 import JujuClient
 
 JUJU_ASYNC_QUEUE = "juju-async-queue"
+# bootstrap has a queue of its own so it doesn't hold up other Juju work
+BOOTSTRAP_QUEUE = "juju-bootstrap-queue"
+# Juju jobs that may run at once, in all and against any one controller
+JUJU_WORKERS = 8
+CONTROLLER_CONCURRENCY = 4
+# charm store lookups for deploys don't need a controller, so they run
+# on their own queue, e.g. while bootstrapping
+PREPARE_QUEUE = "juju-prepare-queue"
+PREPARE_WORKERS = 4
+
+async.configure_queue(JUJU_ASYNC_QUEUE, JUJU_WORKERS)
+async.configure_queue(PREPARE_QUEUE, PREPARE_WORKERS)
 
 this = sys.modules[__name__]
 
@@ -23,17 +40,100 @@ this = sys.modules[__name__]
 this.IS_AUTHENTICATED = False
 this.CLIENT = None
 this.USER_TAG = None
+# (controller, model) CLIENT is logged in to
+this.SESSION_KEY = None
+# (controller, model) : (logged in JujuClient, user tag), one per model
+this.SESSIONS = {}
+# Juju API call stats for this run, kept across re-logins
+this.API_STATS = CallStats()
+# Set to a file name to record the Juju API session for replay with
+# python3 -m macumba.fakeserver --replay
+this.RECORD_PATH = os.environ.get('CONJURE_UP_RECORD_JUJU_API')
+this.RECORDER = None
+# Juju jobs run concurrently, only one of them gets to log in
+this.LOGIN_LOCK = RLock()
+# (controller, model) : futures of the jobs setting the model up
+# (bootstrap, add-model, pre-deploy, add machines), see submit()
+this.SETUP_FUTURES = defaultdict(list)
+# application name : future of its deploy
+this.DEPLOY_FUTURES = {}
+# frozenset of a relation's two endpoints : future of adding it
+this.RELATION_FUTURES = {}
+# application name : future of its DeployPlan, see prepare_deploy()
+this.PLAN_FUTURES = {}
+this.PLAN_LOCK = RLock()
 
 
 # login decorator
 def requires_login(f):
+    def logged_in():
+        return this.IS_AUTHENTICATED and \
+            this.SESSION_KEY == (app.current_controller, app.current_model)
+
     def _decorator(*args, **kwargs):
-        if not this.IS_AUTHENTICATED:
-            login(force=True)
+        if not logged_in():
+            with this.LOGIN_LOCK:
+                if not logged_in():
+                    login(force=True)
         return f(*args, **kwargs)
     return wraps(f)(_decorator)
 
 
+def setup_futures():
+    """ Returns the futures of the jobs setting up the current model
+    """
+    return list(this.SETUP_FUTURES[(app.current_controller,
+                                    app.current_model)])
+
+
+def add_setup_future(future):
+    """ Makes Juju work submitted from now on wait for future
+    """
+    if future is not None:
+        this.SETUP_FUTURES[(app.current_controller,
+                            app.current_model)].append(future)
+
+
+def submit(func, exc_cb, depends=None, setup=False, limited=True):
+    """ Queues Juju work for the current model
+
+    Jobs run alongside each other on JUJU_ASYNC_QUEUE, at most
+    CONTROLLER_CONCURRENCY of them against the same controller, once the
+    model has been set up and everything in depends has finished.
+
+    Arguments:
+    func: callable taking no arguments
+    exc_cb: exception handler callback
+    depends: futures func has to wait for besides the model setup
+    setup: func is part of setting up the model, later jobs wait for it
+    limited: count func against CONTROLLER_CONCURRENCY; long-running
+             jobs that mostly wait, like waiting for the applications,
+             pass False so they don't hold a slot other calls need
+
+    Returns:
+    future of func's result
+    """
+    limit = None
+    if limited:
+        limit = "controller:{}".format(app.current_controller)
+        async.set_limit(limit, CONTROLLER_CONCURRENCY)
+    future = async.submit(func, exc_cb,
+                          queue_name=JUJU_ASYNC_QUEUE,
+                          depends=setup_futures() + list(depends or []),
+                          limit=limit)
+    if setup:
+        add_setup_future(future)
+    return future
+
+
+def deploy_futures():
+    """ Returns the futures of the deploys and relations submitted so far,
+    for work that needs the whole bundle in the model to wait on
+    """
+    return list(this.DEPLOY_FUTURES.values()) + \
+        list(this.RELATION_FUTURES.values())
+
+
 def read_config(name):
     """ Reads a juju config file
 
@@ -64,10 +164,7 @@ def get_controller(id):
     Arguments:
     id: controller id
     """
-    if 'controllers' in get_controllers() \
-       and id in get_controllers()['controllers']:
-        return get_controllers()['controllers'][id]
-    return None
+    return get_controllers().get('controllers', {}).get(id, None)
 
 
 def get_controller_in_cloud(cloud):
@@ -89,7 +186,100 @@ def get_controller_in_cloud(cloud):
 def login(force=False):
     """ Login to Juju API server
     """
-    if this.IS_AUTHENTICATED is True and not force:
+    with this.LOGIN_LOCK:
+        _login(force)
+
+
+def _model_uuid_from_api(endpoints, user, password, model):
+    """ Asks the controller for the UUID of model, returns None if it
+    doesn't know it or can't be reached
+    """
+    for server in endpoints:
+        client = JujuClient(user=user,
+                            url=os.path.join('wss://', server, 'api'),
+                            password=password,
+                            stats=this.API_STATS)
+        try:
+            client.login()
+            rv = client.ModelManager(request="ListModels",
+                                     params={'tag': user})
+        except Exception as e:
+            app.log.debug("Listing models on {} failed: {}".format(server,
+                                                                   e))
+            continue
+        finally:
+            client.close()
+        for m in rv.get('user-models') or rv.get('UserModels') or []:
+            info = m.get('model') or m.get('Model') or {}
+            if (info.get('name') or info.get('Name')) == model:
+                return info.get('uuid') or info.get('UUID')
+        return None
+    return None
+
+
+def _session_details(controller, model, password, refresh=False):
+    """ Returns what's needed to connect to controller:model
+
+    Comes from the session cache unless refresh is set, otherwise
+    JUJU_DATA, then the controller's API, then the juju CLI, and is
+    cached for next time.
+    """
+    if not refresh:
+        details = sessioncache.get(controller, model)
+        if details is not None:
+            return details
+
+    env = get_controller(controller)
+    account = get_account(controller)
+    user = "user-{}".format(account['user'].split("@")[0])
+    uuid = None
+    if not refresh:
+        known = jujudata.models(controller) or {'models': []}
+        uuid = next((m['model-uuid'] for m in known['models']
+                     if m['name'] == model), None)
+    if uuid is None:
+        uuid = _model_uuid_from_api(env['api-endpoints'], user, password,
+                                    model)
+    if uuid is None:
+        uuid = get_model(controller, model)['model-uuid']
+    details = {'endpoints': env['api-endpoints'],
+               'uuid': uuid,
+               'ca-cert': env.get('ca-cert'),
+               'user': user}
+    sessioncache.put(controller, model, details)
+    return details
+
+
+def _connect(details, password):
+    """ Logs in to the model in details, trying each of its controller's
+    endpoints in turn
+    """
+    if this.RECORD_PATH and this.RECORDER is None:
+        this.RECORDER = SessionRecorder(this.RECORD_PATH)
+    error = None
+    for server in details['endpoints']:
+        client = JujuClient(
+            user=details['user'],
+            url=os.path.join('wss://', server, 'model', details['uuid'],
+                             'api'),
+            password=password,
+            auto_reconnect=True,
+            stats=this.API_STATS,
+            recorder=this.RECORDER)
+        try:
+            client.login()
+            return client
+        except Exception as e:
+            app.log.debug("Logging in through {} failed: {}".format(server,
+                                                                    e))
+            error = e
+    raise error or macumba.errors.LoginError("No API endpoints known")
+
+
+def _login(force):
+    key = (app.current_controller, app.current_model)
+    if this.IS_AUTHENTICATED is True and this.SESSION_KEY == key and \
+       not force:
         return
 
     if app.current_controller is None:
@@ -98,23 +288,67 @@ def login(force=False):
     if app.current_model is None:
         raise Exception("Tried to login with no current model set.")
 
-    env = get_controller(app.current_controller)
-    account = get_account(app.current_controller)
-    uuid = get_model(app.current_controller, app.current_model)['model-uuid']
-    server = env['api-endpoints'][0]
-    this.USER_TAG = "user-{}".format(account['user'].split("@")[0])
-    url = os.path.join('wss://', server, 'model', uuid, 'api')
-    this.CLIENT = JujuClient(
-        user=this.USER_TAG,
-        url=url,
-        password=account['password'])
-    try:
-        this.CLIENT.login()
-    except macumba.errors.LoginError as e:
-        raise e
+    session = this.SESSIONS.get(key)
+    if session is None:
+        password = get_account(app.current_controller)['password']
+        details = _session_details(*key, password=password)
+        try:
+            client = _connect(details, password)
+        except Exception as e:
+            # the model may have been recreated, or the controller moved
+            app.log.debug("Login with cached details of {}:{} failed, "
+                          "refreshing them: {}".format(*key, e))
+            sessioncache.forget(*key)
+            details = _session_details(*key, password=password,
+                                       refresh=True)
+            client = _connect(details, password)
+        session = this.SESSIONS[key] = (client, details['user'])
+    this.CLIENT, this.USER_TAG = session
+    this.SESSION_KEY = key
     this.IS_AUTHENTICATED = True  # noqa
 
 
+def dump_api_stats(path):
+    """ Writes the Juju API call stats of this run as JSON to path and
+    logs a summary
+
+    Arguments:
+    path: file to write
+    """
+    if not this.API_STATS.requests:
+        return
+    app.log.debug("Juju API calls:\n{}".format(this.API_STATS.summary()))
+    try:
+        this.API_STATS.dump(path)
+    except OSError as e:
+        app.log.debug("Unable to write API stats to {}: {}".format(path, e))
+
+
+def _log_bootstrap_phase(phase, previous):
+    if previous:
+        app.log.info("Bootstrap: {} ({} took {:.0f}s)".format(
+            phase.label, previous[0].label, previous[1]))
+    else:
+        app.log.info("Bootstrap: {}".format(phase.label))
+
+
+def _follow_bootstrap(stream, errf, progress):
+    """ Copies bootstrap's stderr to errf as it comes, feeding progress
+    """
+    for data in iter(stream.readline, b''):
+        text = data.decode('utf8', 'replace')
+        try:
+            errf.write(text)
+            errf.flush()
+        except ValueError:
+            # closed, bootstrap was cancelled
+            pass
+        # progress meters redraw their line with \r
+        for line in text.replace('\r', '\n').splitlines():
+            progress.feed(line)
+    stream.close()
+
+
 def bootstrap(controller, cloud, series="xenial", credential=None):
     """ Performs juju bootstrap
 
@@ -126,6 +360,9 @@ def bootstrap(controller, cloud, series="xenial", credential=None):
     series: define the bootstrap series defaults to xenial
     log: application logger
     credential: credentials key
+
+    Progress through the phases of the bootstrap is logged, and kept in
+    app.bootstrap.progress while it runs.
     """
     cmd = "juju bootstrap {} {} " \
           "--config image-stream=daily ".format(
@@ -155,12 +392,23 @@ def bootstrap(controller, cloud, series="xenial", credential=None):
     try:
         pathbase = os.path.join(app.config['spell-dir'],
                                 '{}-bootstrap').format(app.current_controller)
+        progress = BootstrapProgress()
+        progress.add_listener(_log_bootstrap_phase)
+        app.bootstrap.progress = progress
         with open(pathbase + ".out", 'w') as outf:
             with open(pathbase + ".err", 'w') as errf:
                 p = Popen(cmd, shell=True, stdout=outf,
-                          stderr=errf)
+                          stderr=PIPE)
+                reader = Thread(target=_follow_bootstrap,
+                                args=(p.stderr, errf, progress),
+                                name="bootstrap-output",
+                                daemon=True)
+                reader.start()
                 while p.poll() is None:
-                    async.sleep_until(2)
+                    async.sleep_until(.5)
+                reader.join()
+                progress.finish()
+                app.log.info(progress.summary())
                 return p
     except CalledProcessError:
         raise Exception("Unable to bootstrap.")
@@ -179,11 +427,13 @@ def bootstrap(controller, cloud, series="xenial", credential=None):
 def bootstrap_async(controller, cloud, credential=None, exc_cb=None):
     """ Performs a bootstrap asynchronously
     """
-    return async.submit(partial(bootstrap,
-                                controller=controller,
-                                cloud=cloud,
-                                credential=credential), exc_cb,
-                        queue_name=JUJU_ASYNC_QUEUE)
+    future = async.submit(partial(bootstrap,
+                                  controller=controller,
+                                  cloud=cloud,
+                                  credential=credential), exc_cb,
+                          queue_name=BOOTSTRAP_QUEUE)
+    add_setup_future(future)
+    return future
 
 
 def model_available():
@@ -236,6 +486,11 @@ def get_credentials(secrets=True):
     Returns:
     List of credentials
     """
+    if secrets:
+        creds = jujudata.credentials()
+        if creds is not None:
+            return creds
+
     cmd = 'juju list-credentials --format yaml'
     if secrets:
         cmd += ' --show-secrets'
@@ -258,6 +513,10 @@ def get_clouds():
     Returns:
     Dictionary of all known clouds including newly created MAAS/Local
     """
+    clouds = jujudata.clouds()
+    if clouds is not None:
+        return clouds
+
     sh = run('juju list-clouds --format yaml',
              shell=True, stdout=PIPE, stderr=PIPE)
     if sh.returncode > 0:
@@ -275,8 +534,9 @@ def get_cloud(name):
     Returns:
     Dictionary of cloud attributes
     """
-    if name in get_clouds().keys():
-        return get_clouds()[name]
+    clouds = get_clouds()
+    if name in clouds.keys():
+        return clouds[name]
     raise LookupError("Unable to locate cloud: {}".format(name))
 
 
@@ -342,9 +602,100 @@ def add_machines(machines, msg_cb=None, exc_cb=None):
             msg_cb("Added machines: {}".format(machine_response))
         return machine_response
 
-    return async.submit(_add_machines_async,
-                        exc_cb,
-                        queue_name=JUJU_ASYNC_QUEUE)
+    return submit(_add_machines_async, exc_cb, setup=True)
+
+
+def _resolve_charm_revision(service):
+    """ Pins service to the charm store's latest revision of its charm if
+    it doesn't name one
+    """
+    if service.csid.rev == "":
+        id_no_rev = service.csid.as_str_without_rev()
+        mc = app.metadata_controller
+        futures.wait([mc.metadata_future])
+        info = mc.get_charm_info(id_no_rev, lambda _: None)
+        service.csid = CharmStoreID(info["Id"])
+
+
+class DeployPlan:
+    """ What deploying a service needs from the charm store
+
+    charm_id: id of the charm to deploy, revision included
+    resources: the charm's resources, as AddPendingResources takes them
+    """
+
+    def __init__(self, service, charm_id, resources):
+        self.service = service
+        self.charm_id = charm_id
+        self.resources = resources
+
+    def __repr__(self):
+        return "<DeployPlan {} {}>".format(self.service.service_name,
+                                           self.charm_id)
+
+
+def _prepare_deploy(service):
+    _resolve_charm_revision(service)
+    charm_id = service.csid.as_str()
+    resources = app.metadata_controller.get_resources(charm_id)
+    app.log.debug("Resources for charm id '{}': {}".format(charm_id,
+                                                           resources))
+    return DeployPlan(service, charm_id, resources)
+
+
+def prepare_deploy(service):
+    """ Starts the charm store lookups deploying service needs
+
+    These don't need a controller, so calling this before bootstrap has
+    finished lets deploy_service and deploy_services go straight to
+    talking to Juju once it has. Lookups are only done once per
+    application, unless they failed.
+
+    Returns a future of service's DeployPlan
+    """
+    def log_error(e):
+        app.log.debug("Preparing deploy of {} failed: {}".format(
+            service.service_name, e))
+
+    with this.PLAN_LOCK:
+        future = this.PLAN_FUTURES.get(service.service_name)
+        if future is None or (future.done() and
+                              (future.cancelled() or future.exception())):
+            future = async.submit(partial(_prepare_deploy, service),
+                                  log_error,
+                                  queue_name=PREPARE_QUEUE)
+            if future is None:
+                raise async.ThreadCancelledException("Shutting down")
+            this.PLAN_FUTURES[service.service_name] = future
+        return future
+
+
+def prepare_deploys(services):
+    """ prepare_deploy() for each of services, returns their futures
+    """
+    return [prepare_deploy(service) for service in services]
+
+
+def _pending_resources_params(service, resources):
+    return {"tag": "application-{}".format(service.csid.name),
+            "url": service.csid.as_str(),
+            "resources": resources}
+
+
+def _set_pending_resources(service, resources, resource_ids):
+    """ Points service's resources at the ids AddPendingResources returned
+    """
+    application_to_resource_map = {}
+    for idx, resource in enumerate(resources):
+        pid = resource_ids['pending-ids'][idx]
+        application_to_resource_map[resource['Name']] = pid
+    service.resources = application_to_resource_map
+
+
+def _deploy_args(service):
+    deploy_args = service.as_deployargs()
+    deploy_args['series'] = service.csid.series
+    return deploy_args
 
 
 def deploy_service(service, default_series, msg_cb=None, exc_cb=None):
@@ -366,45 +717,29 @@ def deploy_service(service, default_series, msg_cb=None, exc_cb=None):
 
     """
 
+    plan_future = prepare_deploy(service)
+
     @requires_login
     def _deploy_async():
+        plan = plan_future.result()
 
-        if service.csid.rev == "":
-            id_no_rev = service.csid.as_str_without_rev()
-            mc = app.metadata_controller
-            futures.wait([mc.metadata_future])
-            info = mc.get_charm_info(id_no_rev, lambda _: None)
-            service.csid = CharmStoreID(info["Id"])
-
-        app.log.debug("Adding Charm {}".format(service.csid.as_str()))
+        app.log.debug("Adding Charm {}".format(plan.charm_id))
         rv = this.CLIENT.Client(request="AddCharm",
-                                params={"url": service.csid.as_str()})
+                                params={"url": plan.charm_id})
         app.log.debug("AddCharm returned {}".format(rv))
 
-        charm_id = service.csid.as_str()
-        resources = app.metadata_controller.get_resources(charm_id)
-
-        app.log.debug("Resources for charm id '{}': {}".format(charm_id,
-                                                               resources))
+        resources = plan.resources
         if resources:
-            params = {"tag": "application-{}".format(service.csid.name),
-                      "url": service.csid.as_str(),
-                      "resources": resources}
+            params = _pending_resources_params(service, resources)
             app.log.debug("AddPendingResources: {}".format(params))
             resource_ids = this.CLIENT.Resources(
                 request="AddPendingResources",
                 params=params)
             app.log.debug("AddPendingResources returned: {}".format(
                 resource_ids))
-            application_to_resource_map = {}
-            for idx, resource in enumerate(resources):
-                pid = resource_ids['pending-ids'][idx]
-                application_to_resource_map[resource['Name']] = pid
-            service.resources = application_to_resource_map
+            _set_pending_resources(service, resources, resource_ids)
 
-        deploy_args = service.as_deployargs()
-        deploy_args['series'] = service.csid.series
-        app_params = {"applications": [deploy_args]}
+        app_params = {"applications": [_deploy_args(service)]}
 
         app.log.debug("Deploying {}: {}".format(service, app_params))
 
@@ -432,47 +767,352 @@ def deploy_service(service, default_series, msg_cb=None, exc_cb=None):
                 params=expose_params)
             app.log.debug("Expose returned: {}".format(rv))
 
-    return async.submit(_deploy_async,
-                        exc_cb,
-                        queue_name=JUJU_ASYNC_QUEUE)
+    future = submit(_deploy_async, exc_cb)
+    this.DEPLOY_FUTURES[service.service_name] = future
+    return future
 
 
-def set_relations(services, msg_cb=None, exc_cb=None):
-    """ Juju set relations
+class DeploymentError(Exception):
+    """ Some applications of a bulk deploy failed
+
+    errors maps each failed application's name to its error message
+    """
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__("Error deploying: {}".format(
+            "; ".join("{}: {}".format(name, msg)
+                      for name, msg in sorted(errors.items()))))
+
+
+def _wait_each(fs):
+    """ Returns (result, exception) of each future, in order """
+    rv = []
+    for f in fs:
+        try:
+            rv.append((f.result(), None))
+        except Exception as e:
+            rv.append((None, e))
+    return rv
+
+
+def deploy_services(services, default_series, msg_cb=None, exc_cb=None):
+    """Juju deploy several services at once.
+
+    Does what deploy_service does for each service, but with every
+    AddCharm and AddPendingResources request in flight together, one
+    Application.Deploy for all of the services and their Expose
+    requests pipelined after it.
 
     Arguments:
-    services: list of services with relations to set
+    services: list of Services to deploy
     msg_cb: message callback
     exc_cb: exception handler callback
+
+    Returns a future whose result is the list of deployed application
+    names. If any application failed, the rest are still deployed and
+    the future raises DeploymentError listing what failed and why.
+
+    Each application also gets a future of its own in DEPLOY_FUTURES,
+    completed as soon as it's deployed or has failed, so work on the
+    ones that deployed isn't held up or failed by the others.
     """
-    relations = set()
+    services = list(services)
+    plan_futures = prepare_deploys(services)
+    app_futures = {}
     for service in services:
-        for a, b in service.relations:
-            if (a, b) not in relations and (b, a) not in relations:
-                relations.add((a, b))
+        f = futures.Future()
+        f.set_running_or_notify_cancel()
+        app_futures[service.service_name] = f
+
+    def resolve(name, error=None):
+        f = app_futures[name]
+        if f.done():
+            return
+        if error is None:
+            f.set_result(name)
+        else:
+            f.set_exception(DeploymentError({name: error}))
 
     @requires_login
-    def do_add_all():
-        if msg_cb:
-            msg_cb("Setting application relations")
+    def _deploy_all_async():
+        errors = {}
+        plans = []
+        for service, (plan, e) in zip(services, _wait_each(plan_futures)):
+            if e is not None:
+                errors[service.service_name] = \
+                    "looking up charm {}: {}".format(service.csid.as_str(), e)
+            else:
+                plans.append(plan)
+
+        charm_ids = sorted(set(p.charm_id for p in plans))
+        app.log.debug("Adding Charms {}".format(charm_ids))
+        added = _wait_each(this.CLIENT.submit_many(
+            [("Client", "AddCharm", {"url": charm_id})
+             for charm_id in charm_ids]))
+        failed_charms = {charm_id: e for charm_id, (_, e)
+                         in zip(charm_ids, added) if e is not None}
+        ready = []
+        for plan in plans:
+            e = failed_charms.get(plan.charm_id)
+            if e is not None:
+                errors[plan.service.service_name] = \
+                    "adding charm {}: {}".format(plan.charm_id, e)
+            else:
+                ready.append(plan)
+
+        with_resources = [p for p in ready if p.resources]
+        pending = _wait_each(this.CLIENT.submit_many(
+            [("Resources", "AddPendingResources",
+              _pending_resources_params(p.service, p.resources))
+             for p in with_resources]))
+        for plan, (resource_ids, e) in zip(with_resources, pending):
+            if e is not None:
+                errors[plan.service.service_name] = \
+                    "adding resources: {}".format(e)
+                ready.remove(plan)
+                continue
+            _set_pending_resources(plan.service, plan.resources,
+                                   resource_ids)
+        ready = [p.service for p in ready]
+        for name, msg in errors.items():
+            resolve(name, msg)
+
+        deployed = []
+        if ready:
+            app_params = {"applications": [_deploy_args(s) for s in ready]}
+            app.log.debug("Deploying {}: {}".format(ready, app_params))
+            if msg_cb:
+                msg_cb("Deploying {} applications... ".format(len(ready)))
+            rv = this.CLIENT.Application(request="Deploy",
+                                         params=app_params)
+            app.log.debug("Deploy returned {}".format(rv))
+            results = rv.get('results') or []
+            # without a result of its own an application can't be taken
+            # as deployed
+            for service in ready[len(results):]:
+                errors[service.service_name] = \
+                    "no result from Deploy, got {} for {} applications".format(
+                        len(results), len(ready))
+                resolve(service.service_name, errors[service.service_name])
+            for service, result in zip(ready, results):
+                if result.get('error'):
+                    errors[service.service_name] = result['error'].get(
+                        'message', 'error')
+                    resolve(service.service_name,
+                            errors[service.service_name])
+                    continue
+                deployed.append(service)
+                resolve(service.service_name)
+                if msg_cb:
+                    msg_cb("{}: deployed, installing.".format(
+                        service.service_name))
+
+        exposed = [s for s in deployed if s.expose]
+        app.log.debug("Expose: {}".format(exposed))
+        results = _wait_each(this.CLIENT.submit_many(
+            [("Application", "Expose", {"application": s.service_name})
+             for s in exposed]))
+        for service, (_, e) in zip(exposed, results):
+            if e is not None:
+                errors[service.service_name] = "exposing: {}".format(e)
+
+        if errors:
+            raise DeploymentError(errors)
+        return [s.service_name for s in deployed]
+
+    def bulk_done(future):
+        # whatever the bulk job didn't get to has failed with it
+        if future.cancelled():
+            error = "cancelled"
+        elif future.exception() is not None:
+            error = str(future.exception())
+        else:
+            error = "not deployed"
+        for name in app_futures:
+            resolve(name, error)
+
+    future = submit(_deploy_all_async, exc_cb)
+    if future is not None:
+        future.add_done_callback(bulk_done)
+    else:
+        for name in app_futures:
+            resolve(name, "not submitted, shutting down")
+    this.DEPLOY_FUTURES.update(app_futures)
+    return future
 
-        for a, b in list(relations):
-            params = {"Endpoints": [a, b]}
-            try:
-                app.log.debug("AddRelation: {}".format(params))
-                rv = this.CLIENT.Application(request="AddRelation",
-                                             params=params)
-                app.log.debug("AddRelation returned: {}".format(rv))
-            except Exception as e:
-                if exc_cb:
-                    exc_cb(e)
-                return
+
+def _done_future(result=None):
+    future = futures.Future()
+    future.set_running_or_notify_cancel()
+    future.set_result(result)
+    return future
+
+
+def mark_deployed(name):
+    """ Records application name as already in the model, so relations
+    with it needn't wait for a deploy
+    """
+    this.DEPLOY_FUTURES[name] = _done_future()
+
+
+def mark_related(a, b):
+    """ Records the relation between endpoints a and b as already in the
+    model, so set_relations doesn't add it again
+    """
+    this.RELATION_FUTURES[frozenset((a, b))] = _done_future()
+
+
+def add_units(service, num_units, msg_cb=None, exc_cb=None):
+    """ Juju add-unit
+
+    Arguments:
+    service: Service to add units to
+    num_units: how many units to add
+    msg_cb: message callback
+    exc_cb: exception handler callback
+
+    Returns a future of the names of the new units
+    """
+    @requires_login
+    def _add_units_async():
+        params = {"application": service.service_name,
+                  "num-units": num_units}
+        app.log.debug("AddUnits: {}".format(params))
+        rv = this.CLIENT.Application(request="AddUnits", params=params)
+        app.log.debug("AddUnits returned {}".format(rv))
         if msg_cb:
+            msg_cb("{}: added {} units.".format(
+                service.service_name, num_units))
+        return rv.get('units', [])
+
+    return submit(_add_units_async, exc_cb,
+                  depends=[this.DEPLOY_FUTURES.get(service.service_name)])
+
+
+def expose(service, exc_cb=None):
+    """ Juju expose
+
+    Returns a future completed once service is exposed
+    """
+    @requires_login
+    def _expose_async():
+        params = {"application": service.service_name}
+        app.log.debug("Expose: {}".format(params))
+        rv = this.CLIENT.Application(request="Expose", params=params)
+        app.log.debug("Expose returned: {}".format(rv))
+
+    return submit(_expose_async, exc_cb,
+                  depends=[this.DEPLOY_FUTURES.get(service.service_name)])
+
+
+class RelationError(Exception):
+    """ Some relations couldn't be added
+
+    errors maps each failed relation's pair of endpoints to its error
+    message
+    """
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__("Error setting relations: {}".format(
+            "; ".join("{} <-> {}: {}".format(a, b, msg)
+                      for (a, b), msg in sorted(errors.items()))))
+
+
+def _endpoint_application(endpoint):
+    return endpoint.split(':')[0]
+
+
+def _add_relation(a, b):
+    @requires_login
+    def _add_relation_async():
+        params = {"Endpoints": [a, b]}
+        app.log.debug("AddRelation: {}".format(params))
+        rv = this.CLIENT.Application(request="AddRelation",
+                                     params=params)
+        app.log.debug("AddRelation returned: {}".format(rv))
+        return rv
+
+    def log_error(e):
+        app.log.warning("Adding relation {} <-> {} failed: {}".format(
+            a, b, e))
+
+    depends = [this.DEPLOY_FUTURES.get(_endpoint_application(ep))
+               for ep in (a, b)]
+    return submit(_add_relation_async, log_error, depends=depends)
+
+
+def set_relations(services, msg_cb=None, exc_cb=None, ready_only=False):
+    """ Juju set relations
+
+    Each relation is added as soon as the deploys of both of its
+    applications have finished, alongside other Juju work, and only
+    once even if set_relations is called again for it. A relation that
+    fails doesn't stop the others from being added.
+
+    Arguments:
+    services: list of services with relations to set
+    msg_cb: message callback
+    exc_cb: exception handler callback, called once with a RelationError
+            listing every relation that failed
+    ready_only: leave out relations with an application that hasn't
+                been deployed yet, so they can be set by a later call
+
+    Returns a future whose result is the list of relations added, or
+    which raises RelationError.
+    """
+    relations = []
+    for service in services:
+        for a, b in service.relations:
+            if (a, b) not in relations and (b, a) not in relations:
+                relations.append((a, b))
+    if ready_only:
+        relations = [(a, b) for a, b in relations
+                     if _endpoint_application(a) in this.DEPLOY_FUTURES and
+                     _endpoint_application(b) in this.DEPLOY_FUTURES]
+
+    if msg_cb and relations:
+        msg_cb("Setting application relations")
+    fs = []
+    for a, b in relations:
+        key = frozenset((a, b))
+        if key not in this.RELATION_FUTURES:
+            this.RELATION_FUTURES[key] = _add_relation(a, b)
+        fs.append(this.RELATION_FUTURES[key])
+
+    result = futures.Future()
+    result.set_running_or_notify_cancel()
+
+    def all_done(_):
+        errors = {}
+        for pair, f in zip(relations, fs):
+            if f is None:
+                errors[pair] = "not submitted, shutting down"
+            elif f.cancelled():
+                errors[pair] = "cancelled"
+            elif isinstance(f.exception(), async.DependencyFailed):
+                errors[pair] = "an application failed to deploy"
+            elif f.exception() is not None:
+                errors[pair] = str(f.exception())
+        for a, b in errors:
+            # so a later call tries them again
+            key = frozenset((a, b))
+            if this.RELATION_FUTURES.get(key) is fs[relations.index((a, b))]:
+                del this.RELATION_FUTURES[key]
+        if errors:
+            e = RelationError(errors)
+            result.set_exception(e)
+            if exc_cb:
+                exc_cb(e)
+            return
+        result.set_result(relations)
+        if msg_cb and relations:
             msg_cb("Completed setting application relations")
 
-    return async.submit(do_add_all,
-                        exc_cb,
-                        queue_name=JUJU_ASYNC_QUEUE)
+    async.when_all([f for f in fs if f is not None]).add_done_callback(
+        all_done)
+    return result
 
 
 def get_controller_info(name=None):
@@ -502,6 +1142,10 @@ def get_controllers():
     Returns:
     List of known controllers
     """
+    env = jujudata.controllers()
+    if env is not None:
+        return env
+
     sh = run('juju list-controllers --format yaml',
              shell=True, stdout=PIPE, stderr=PIPE)
     if sh.returncode > 0:
@@ -531,14 +1175,12 @@ def get_accounts():
     Returns:
     List of known accounts
     """
-    env = os.path.join(juju_path(), 'accounts.yaml')
-    if not os.path.isfile(env):
+    env = jujudata.accounts()
+    if env is None:
         raise Exception(
-            "Unable to find: {}".format(env))
-    with open(env, 'r') as c:
-        env = yaml.load(c)
-        return env['controllers']
-    raise Exception("Unable to find accounts")
+            "Unable to find: {}".format(
+                os.path.join(juju_path(), 'accounts.yaml')))
+    return env
 
 
 def get_model(controller, name):
@@ -551,7 +1193,14 @@ def get_model(controller, name):
     Returns:
     Dictionary of model information
     """
-    models = get_models(controller)['models']
+    cached = jujudata.models(controller)
+    if cached is not None:
+        for m in cached['models']:
+            if m['name'] == name:
+                return m
+
+    # not known locally yet, the CLI asks the controller
+    models = get_models(controller, refresh=True)['models']
     for m in models:
         if m['name'] == name:
             return m
@@ -572,15 +1221,28 @@ def add_model(name, controller):
             "Unable to create model: {}".format(sh.stderr.decode('utf8')))
 
 
-def get_models(controller):
+def add_model_async(name, controller, exc_cb=None):
+    """ Adds a model in the background, Juju work for the model waits
+    for it to exist
+    """
+    return submit(partial(add_model, name, controller), exc_cb, setup=True)
+
+
+def get_models(controller, refresh=False):
     """ List available models
 
     Arguments:
     controller: existing controller to get models for
+    refresh: ask the controller instead of reading Juju's local copy
 
     Returns:
     List of known models
     """
+    if not refresh:
+        models = jujudata.models(controller)
+        if models is not None:
+            return models
+
     sh = run('juju list-models --format yaml -c {}'.format(controller),
              shell=True, stdout=PIPE, stderr=PIPE)
     if sh.returncode > 0:
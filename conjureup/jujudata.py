@@ -0,0 +1,132 @@
+""" Reads Juju's client side data files
+
+Juju keeps what it knows about controllers, models, accounts, clouds and
+credentials in yaml files under JUJU_DATA. Reading them directly saves
+starting the juju binary for every `juju list-*` call, which takes the
+better part of a second each time.
+
+Each function returns None when the file isn't there or doesn't hold what
+was asked for, so callers can fall back to asking the juju CLI, which also
+refreshes the files from the controller.
+
+Files are parsed once and cached until their mtime or size changes.
+"""
+
+import os
+import sys
+from copy import deepcopy
+from threading import Lock
+
+import yaml
+
+from conjureup.utils import juju_path
+
+this = sys.modules[__name__]
+
+# vars
+# abs path : ((mtime, size), parsed yaml)
+this.CACHE = {}
+this.CACHE_LOCK = Lock()
+
+# lxd is compiled into juju rather than listed in public-clouds.yaml
+BUILTIN_CLOUDS = {
+    'localhost': {'defined': 'built-in',
+                  'type': 'lxd',
+                  'auth-types': ['empty'],
+                  'regions': {'localhost': {}}}
+}
+
+
+def read(name):
+    """ Returns the parsed contents of JUJU_DATA/name.yaml, or None if the
+    file doesn't exist
+    """
+    path = os.path.join(juju_path(), "{}.yaml".format(name))
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    key = (st.st_mtime_ns, st.st_size)
+    with this.CACHE_LOCK:
+        cached = this.CACHE.get(path)
+    if cached is None or cached[0] != key:
+        with open(path) as f:
+            data = yaml.safe_load(f) or {}
+        cached = (key, data)
+        with this.CACHE_LOCK:
+            this.CACHE[path] = cached
+    return deepcopy(cached[1])
+
+
+def controllers():
+    """ Same layout as `juju list-controllers --format yaml`, without
+    the fields that need a connection to the controller
+    """
+    data = read('controllers')
+    if data is None or 'controllers' not in data:
+        return None
+    data.setdefault('current-controller', None)
+    return data
+
+
+def models(controller):
+    """ Same layout as `juju list-models --format yaml -c controller`,
+    limited to model names and uuids
+    """
+    data = read('models')
+    if data is None:
+        return None
+    known = data.get('controllers', {}).get(controller)
+    if known is None:
+        return None
+
+    def split(name):
+        # newer juju qualifies model names with their owner
+        owner, _, short = name.rpartition('/')
+        return owner, short
+
+    rv = []
+    for name, model in sorted(known.get('models', {}).items()):
+        owner, short = split(name)
+        entry = {'name': short, 'model-uuid': model.get('uuid')}
+        if owner:
+            entry['owner'] = owner
+        rv.append(entry)
+    current = known.get('current-model')
+    return {'models': rv,
+            'current-model': split(current)[1] if current else None}
+
+
+def accounts():
+    """ Accounts by controller name """
+    data = read('accounts')
+    if data is None:
+        return None
+    return data.get('controllers', {})
+
+
+def clouds():
+    """ Same layout as `juju list-clouds --format yaml`
+
+    Needs public-clouds.yaml, which `juju update-clouds` writes; without
+    it only the juju binary knows the public clouds.
+    """
+    public = read('public-clouds')
+    if public is None:
+        return None
+    rv = {}
+    for name, cloud in public.get('clouds', {}).items():
+        rv[name] = dict(cloud, defined='public')
+    rv.update(deepcopy(BUILTIN_CLOUDS))
+    personal = read('clouds') or {}
+    for name, cloud in personal.get('clouds', {}).items():
+        rv[name] = dict(cloud, defined='local')
+    return rv
+
+
+def credentials():
+    """ Credentials by cloud and credential name, secrets included """
+    data = read('credentials')
+    if data is None or 'credentials' not in data:
+        return None
+    return data['credentials']
@@ -42,6 +42,13 @@ def setup_logging(app, logfile, debug=False):
     logger = logging.getLogger(app)
     logger.setLevel(env)
     logger.addHandler(cmdslog)
+
+    # Juju API client messages (reconnects etc) and background job
+    # timings go to the same log
+    for name in ('macumba', 'async'):
+        extra_logger = logging.getLogger(name)
+        extra_logger.setLevel(env)
+        extra_logger.addHandler(cmdslog)
     if os.path.exists('/dev/log'):
         st_mode = os.stat('/dev/log').st_mode
         if stat.S_ISSOCK(st_mode):
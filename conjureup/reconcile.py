@@ -0,0 +1,189 @@
+""" Deploying into a model that already has part of the bundle
+
+Compares what the bundle asks for (applications, units, exposure,
+relations, machines) with what the model already has, and deploys only
+the difference. Running conjure-up again against the model a failed run
+left behind carries on from where it stopped instead of starting over.
+"""
+
+from conjureup import juju
+from conjureup.api import watcher
+from conjureup.api.models import model_status
+from conjureup.app_config import app
+
+
+class Difference:
+    """ What the bundle has that the model doesn't
+
+    applications: services to deploy
+    units: (service, number of units) to add to deployed services
+    expose: deployed services to expose
+    relations: (endpoint, endpoint) pairs to relate
+    machines: bundle machines to add, only when the model has none
+    deployed: names of the services already in the model
+    related: (endpoint, endpoint) pairs already in the model
+    """
+
+    def __init__(self):
+        self.applications = []
+        self.units = []
+        self.expose = []
+        self.relations = []
+        self.machines = []
+        self.deployed = []
+        self.related = []
+
+    def __bool__(self):
+        return bool(self.applications or self.units or self.expose or
+                    self.relations or self.machines)
+
+    def summary(self):
+        if not self:
+            return "Nothing to deploy, the model has the whole bundle"
+        parts = []
+        if self.applications:
+            parts.append("{} applications".format(len(self.applications)))
+        if self.units:
+            parts.append("{} units".format(sum(n for _, n in self.units)))
+        if self.expose:
+            parts.append("{} exposures".format(len(self.expose)))
+        if self.relations:
+            parts.append("{} relations".format(len(self.relations)))
+        if self.machines:
+            parts.append("{} machines".format(len(self.machines)))
+        return "Deploying what the model lacks: {}".format(", ".join(parts))
+
+
+def _split_endpoint(endpoint):
+    application, _, name = endpoint.partition(':')
+    return application, name or None
+
+
+def _live_relations(status):
+    """ Returns ((application, name), (application, name)) of every
+    relation in status
+
+    Takes the FullStatus layout or the watcher's.
+    """
+    rv = []
+    for relation in status.get('relations') or []:
+        endpoints = []
+        for ep in relation.get('endpoints') or []:
+            if 'application-name' in ep:
+                endpoints.append((ep['application-name'],
+                                  ep.get('relation', {}).get('name')))
+            else:
+                endpoints.append((ep.get('application'), ep.get('name')))
+        if len(endpoints) == 2:
+            rv.append(tuple(endpoints))
+    return rv
+
+
+def _is_related(live, a, b):
+    """ Whether live has a relation matching the bundle's (a, b), which may
+    leave out relation names
+    """
+    wanted = (_split_endpoint(a), _split_endpoint(b))
+
+    def matches(want, have):
+        return want[0] == have[0] and want[1] in (None, have[1])
+
+    for x, y in live:
+        if (matches(wanted[0], x) and matches(wanted[1], y)) or \
+           (matches(wanted[0], y) and matches(wanted[1], x)):
+            return True
+    return False
+
+
+def diff(services, machines, status):
+    """ Works out what of the bundle the model in status lacks
+
+    Arguments:
+    services: bundle services
+    machines: bundle machines, as add_machines takes them
+    status: model status in the FullStatus layout
+
+    Returns:
+    Difference
+    """
+    d = Difference()
+    applications = status.get('applications') or {}
+    for service in services:
+        live = applications.get(service.service_name)
+        if live is None:
+            d.applications.append(service)
+            continue
+        d.deployed.append(service.service_name)
+        missing = service.num_units - len(live.get('units') or {})
+        if missing > 0:
+            d.units.append((service, missing))
+        if service.expose and not live.get('exposed'):
+            d.expose.append(service)
+
+    live = _live_relations(status)
+    seen = set()
+    for service in services:
+        for a, b in service.relations:
+            key = frozenset((a, b))
+            if key in seen:
+                continue
+            seen.add(key)
+            if _is_related(live, a, b):
+                d.related.append((a, b))
+            else:
+                d.relations.append((a, b))
+
+    if not status.get('machines'):
+        d.machines = list(machines)
+    return d
+
+
+def apply(d, msg_cb=None, exc_cb=None):
+    """ Submits the Juju work d calls for, except relations
+
+    Relations already in the model are recorded as such, so a
+    set_relations call for the whole bundle afterwards only adds the
+    missing ones.
+
+    Returns the futures of the submitted jobs.
+    """
+    for name in d.deployed:
+        juju.mark_deployed(name)
+    for a, b in d.related:
+        juju.mark_related(a, b)
+
+    fs = []
+    if d.machines:
+        fs.append(juju.add_machines(d.machines, exc_cb=exc_cb))
+    if d.applications:
+        fs.append(juju.deploy_services(d.applications,
+                                       app.metadata_controller.series,
+                                       msg_cb, exc_cb))
+    for service, num_units in d.units:
+        fs.append(juju.add_units(service, num_units, msg_cb, exc_cb))
+    for service in d.expose:
+        fs.append(juju.expose(service, exc_cb))
+    return fs
+
+
+def reconcile(services, machines, msg_cb=None, exc_cb=None):
+    """ Deploys what of the bundle the current model lacks
+
+    Reads the model from the live watcher if it's running, otherwise
+    with a FullStatus, once the model has been set up.
+
+    Returns a future of the Difference, which completes once the work
+    for it has been submitted.
+    """
+    services = list(services)
+
+    def _reconcile():
+        status = watcher.current_status() or model_status()
+        d = diff(services, machines, status)
+        app.log.info(d.summary())
+        if msg_cb:
+            msg_cb(d.summary())
+        apply(d, msg_cb, exc_cb)
+        return d
+
+    return juju.submit(_reconcile, exc_cb)
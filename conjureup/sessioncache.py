@@ -0,0 +1,92 @@
+""" Connection details of the Juju models conjure-up has logged in to
+
+Keeps what's needed to open an API connection to a model, its
+controller's endpoints and CA certificate, the model's UUID and the
+user tag, in juju-sessions.json under the cache dir. Later runs then
+needn't ask the controller (or the juju CLI) for them again. Passwords
+aren't kept, they're read from JUJU_DATA each time.
+
+Entries are dropped by forget() when logging in with them fails, so
+they're refreshed from the controller.
+"""
+
+import json
+import os
+import sys
+from threading import Lock
+
+from conjureup.app_config import app
+
+SESSIONS_FILE = "juju-sessions.json"
+
+this = sys.modules[__name__]
+
+# vars
+# "controller/model" : details, None until read from disk
+this.SESSIONS = None
+this.LOCK = Lock()
+
+
+def sessions_path():
+    """ Returns the path of the cache file, None if there's no cache dir
+    """
+    if app.argv is None or not getattr(app.argv, 'cache_dir', None):
+        return None
+    return os.path.join(app.argv.cache_dir, SESSIONS_FILE)
+
+
+def _key(controller, model):
+    return "{}/{}".format(controller, model)
+
+
+def _sessions():
+    """ Must hold LOCK """
+    if this.SESSIONS is None:
+        this.SESSIONS = {}
+        path = sessions_path()
+        if path is not None and os.path.isfile(path):
+            try:
+                with open(path) as f:
+                    this.SESSIONS = json.load(f)
+            except (OSError, ValueError) as e:
+                app.log.debug("Ignoring session cache {}: {}".format(
+                    path, e))
+    return this.SESSIONS
+
+
+def _save():
+    """ Must hold LOCK """
+    path = sessions_path()
+    if path is None:
+        return
+    tmp = path + ".tmp"
+    try:
+        with open(tmp, 'w') as f:
+            json.dump(this.SESSIONS, f, indent=2, sort_keys=True)
+        os.chmod(tmp, 0o600)
+        os.replace(tmp, path)
+    except OSError as e:
+        app.log.debug("Unable to write session cache {}: {}".format(path, e))
+
+
+def get(controller, model):
+    """ Returns the cached details of controller:model, or None
+
+    Details are a dict with 'endpoints' (list of host:port), 'uuid',
+    'ca-cert' and 'user' (a user tag).
+    """
+    with this.LOCK:
+        details = _sessions().get(_key(controller, model))
+        return dict(details) if details else None
+
+
+def put(controller, model, details):
+    with this.LOCK:
+        _sessions()[_key(controller, model)] = dict(details)
+        _save()
+
+
+def forget(controller, model):
+    with this.LOCK:
+        if _sessions().pop(_key(controller, model), None) is not None:
+            _save()
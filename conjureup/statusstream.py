@@ -0,0 +1,207 @@
+""" Machine-readable unit status stream for headless runs
+
+Follows the live model state and writes a line of JSON for every change
+of a unit's status, so whatever runs conjure-up can follow the deployment
+without polling `juju status` itself.
+
+Example line:
+{"unit": "mysql/0", "application": "mysql",
+ "old": {"agent": "executing", "workload": "maintenance",
+         "message": "installing"},
+ "new": {"agent": "idle", "workload": "active", "message": "ready"},
+ "t": 1480000012.5}
+
+"old" is null for a unit seen for the first time, "new" is null for one
+that went away.
+
+Streaming to stdout (target '-') sends everything else conjure-up and
+the commands it runs would print there to stderr instead, from
+claim_stdout() on, so stdout only has the JSON lines.
+
+Changes of a unit within the throttle interval are folded into one line
+going from the last state written to the latest. Lines that don't change
+what's followed (only the status by default, or also messages, machine
+and address) are left out.
+"""
+
+import json
+import os
+import sys
+import time
+from threading import Lock, Timer
+
+from conjureup.api import watcher
+from conjureup.app_config import app
+
+# What's compared to tell whether a unit changed
+DETAIL_STATUS = 'status'
+DETAIL_ALL = 'all'
+
+this = sys.modules[__name__]
+
+# vars
+this.STREAM = None
+# the process' original stdout, once claim_stdout() has taken it
+this.STDOUT = None
+
+
+def claim_stdout():
+    """ Keeps stdout for the stream, pointing file descriptor 1 (and so
+    sys.stdout and the output of child processes) at stderr
+    """
+    if this.STDOUT is not None:
+        return this.STDOUT
+    sys.stdout.flush()
+    this.STDOUT = os.fdopen(os.dup(1), 'w', buffering=1)
+    os.dup2(2, 1)
+    return this.STDOUT
+
+
+def open_output(target):
+    """ Returns a line buffered file for target, '-' being stdout, a number
+    a file descriptor, anything else a path to append to
+    """
+    if target == '-':
+        return claim_stdout()
+    if target.isdigit():
+        return os.fdopen(int(target), 'w', buffering=1)
+    return open(target, 'a', buffering=1)
+
+
+def unit_state(unit, detail=DETAIL_STATUS):
+    """ Returns what's followed of a unit in the FullStatus layout
+    """
+    agent = unit.get('agent-status') or {}
+    workload = unit.get('workload-status') or {}
+    state = {'agent': agent.get('status', ''),
+             'workload': workload.get('status', ''),
+             'message': workload.get('info', '')}
+    if detail == DETAIL_ALL:
+        state.update({'machine': unit.get('machine', ''),
+                      'address': unit.get('public-address', '')})
+    return state
+
+
+def _compared(state, detail):
+    if state is None:
+        return None
+    if detail == DETAIL_STATUS:
+        return (state['agent'], state['workload'])
+    return state
+
+
+class StatusStream:
+    """ Writes unit status changes of a ModelState to out
+
+    Arguments:
+    out: file to write lines to
+    throttle: seconds to hold a unit's changes back, writing only the
+              latest at the end; 0 writes each as it comes
+    detail: DETAIL_STATUS to only write agent or workload status changes,
+            DETAIL_ALL to also write message, machine or address changes
+    """
+
+    def __init__(self, out, throttle=0, detail=DETAIL_STATUS,
+                 clock=time.time):
+        self.out = out
+        self.state = None
+        self.throttle = throttle
+        self.detail = detail
+        self.clock = clock
+        self.lock = Lock()
+        # unit : (application, state) last written
+        self.written = {}
+        # unit : (application, state or None) not written yet
+        self.pending = {}
+        self.timer = None
+
+    def __call__(self, changes):
+        """ ModelState subscriber, runs on the watcher thread """
+        state = self.state
+        for kind, op, name in changes:
+            if kind != 'unit':
+                continue
+            if op == 'remove':
+                current = None
+            else:
+                try:
+                    current = unit_state(state.unit_status(name),
+                                         self.detail)
+                except KeyError:
+                    current = None
+            self.update(name, name.split('/')[0], current)
+
+    def update(self, unit, application, current):
+        """ Takes the latest state of unit, None if it went away
+        """
+        with self.lock:
+            self.pending[unit] = (application, current)
+            if self.throttle <= 0:
+                self._flush()
+            elif self.timer is None:
+                self.timer = Timer(self.throttle, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        """ Must hold lock """
+        self.timer = None
+        pending, self.pending = self.pending, {}
+        now = self.clock()
+        for unit in sorted(pending):
+            application, new = pending[unit]
+            old = self.written.get(unit, (application, None))[1]
+            if _compared(old, self.detail) == _compared(new, self.detail):
+                continue
+            if new is None:
+                self.written.pop(unit, None)
+            else:
+                self.written[unit] = (application, new)
+            self.write({'unit': unit, 'application': application,
+                        'old': old, 'new': new, 't': now})
+
+    def write(self, event):
+        try:
+            self.out.write(json.dumps(event, sort_keys=True) + "\n")
+            self.out.flush()
+        except (OSError, ValueError) as e:
+            app.log.warning("Unable to write status stream: {}".format(e))
+
+    def close(self):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+            self._flush()
+        if self.out is not this.STDOUT:
+            self.out.close()
+
+
+def start(target, throttle=0, detail=DETAIL_STATUS):
+    """ Starts writing unit status changes of the current model to target,
+    see open_output()
+
+    Units already in the model are written first, with no old state.
+    """
+    stop()
+    stream = StatusStream(open_output(target), throttle, detail)
+    this.STREAM = stream
+    stream.state = watcher.model_state()
+    with stream.state.lock:
+        stream.state.subscribe(stream)
+        units = list(stream.state.units)
+    stream([('unit', 'change', name) for name in units])
+    return stream
+
+
+def stop():
+    """ Writes out anything held back and stops the stream
+    """
+    stream, this.STREAM = this.STREAM, None
+    if stream is None:
+        return
+    stream.state.unsubscribe(stream)
+    stream.close()
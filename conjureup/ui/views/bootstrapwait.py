@@ -26,21 +26,35 @@ class BootstrapWaitView(WidgetWrap):
         self.loading_boxes = [Text(x) for x in self.load_attributes]
         super().__init__(self._build_node_waiting())
 
+    def _sanitize(self, line):
+        sanitize = "".join(ch for ch
+                           in line if unicodedata.category(ch)[0] != "C")
+        if sanitize.endswith("%"):
+            return sanitize.split("%")[0]
+        return sanitize
+
     def _clear_control_characters(self, text):
-        text = text.decode().splitlines()
-        new_out = []
-        for t in text:
-            sanitize = "".join(ch for ch
-                               in t if unicodedata.category(ch)[0] != "C")
-            if sanitize.endswith("%"):
-                new_out.append(sanitize.split("%")[0])
-            else:
-                new_out.append(sanitize)
+        new_out = [self._sanitize(t) for t in text.decode().splitlines()]
         if len(new_out) >= 10:
             return "\n".join(new_out[-10:])
         else:
             return "\n".join(new_out)
 
+    def _progress_text(self, progress):
+        """ Phases gone through with their timings, then the latest
+        output
+        """
+        durations = progress.durations()
+        lines = []
+        for i, (phase, seconds) in enumerate(durations):
+            marker = "\N{BLACK RIGHT-POINTING SMALL TRIANGLE} " \
+                if i == len(durations) - 1 else "  "
+            lines.append("{}{:<40} {:>5.0f}s".format(marker, phase.label,
+                                                     seconds))
+        lines.append("")
+        lines += [self._sanitize(line) for line in progress.output()]
+        return "\n".join(lines)
+
     def redraw_kitt(self):
         """ Redraws the KITT bar
         """
@@ -49,6 +63,10 @@ class BootstrapWaitView(WidgetWrap):
             i.set_text(
                 self.load_attributes[random.randrange(
                     len(self.load_attributes))])
+        if app.bootstrap.progress is not None:
+            self.output.set_text(self._progress_text(app.bootstrap.progress))
+            return
+
         cache_dir = app.config['spell-dir']
 
         bootstrap_stderrpath = os.path.join(
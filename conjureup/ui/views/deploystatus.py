@@ -1,67 +1,190 @@
 import random
+from threading import Lock
 
-from urwid import Text, WidgetWrap
+from urwid import Columns, Frame, Pile, Text, WidgetWrap
 
+from conjureup import async, unithistory
 from conjureup.api.models import model_status
+from conjureup.api.watcher import current_status
 from ubuntui.ev import EventLoop
 from ubuntui.utils import Color, Padding
-from ubuntui.widgets.juju.service import ServiceWidget
-from ubuntui.widgets.table import Table
+from ubuntui.widgets.hr import HR
+from ubuntui.widgets.table import LazyTable
+
+STATUS_QUEUE = "deploy-status-queue"
+
+# agent states whose icon is picked at random on every refresh
+PENDING_STATES = ("maintenance", "allocating", "executing")
+
+
+def unit_row(unit):
+    """ Returns what's shown of a unit, as
+    (machine, public address, workload info, status)
+    """
+    workload = unit.get('workload-status') or {}
+    status = workload.get('status', '')
+    if status in ('', 'unknown'):
+        status = (unit.get('agent-status') or {}).get('status', '')
+    return (unit.get('machine', '-'),
+            unit.get('public-address', ''),
+            workload.get('info', ''),
+            status)
+
+
+def unit_order(row):
+    """ Sort key putting unit/2 before unit/10 """
+    application, _, number = row.row_id.rpartition('/')
+    try:
+        return (application, int(number))
+    except ValueError:
+        return (application, 0)
+
+
+def status_order(row):
+    """ Sort key putting units by status, then in unit order """
+    return (row.values[2], unit_order(row))
 
 
 class DeployStatusView(WidgetWrap):
 
     def __init__(self, app):
         self.app = app
-        self.deployed = {}
         self.unit_w = None
-        self.table = Table()
-        super().__init__(Padding.center_80(self.table.render()))
+        self.table = LazyTable(self._build_row, self._build_group)
+        self.table.sort(unit_order)
+        self.table.group()
+        self.by_status = False
+        self.grouped = True
+        # unit name : unit_row() as last shown
+        self.shown = {}
+        self.fetch_lock = Lock()
+        self.fetching = False
+        self.refresh_again = False
+        self.eta = Text("")
+        header = Pile([Color.info_context(self.eta),
+                       Color.info_context(Text(
+                           "(s) sort by status/name, "
+                           "(g) group by application on/off"))])
+        super().__init__(Padding.center_80(
+            Frame(self.table.render(), header=header)))
+
+    def selectable(self):
+        return True
+
+    def keypress(self, size, key):
+        if key == 's':
+            self.sort_by_status(not self.by_status)
+            return None
+        if key == 'g':
+            self.group_by_application(not self.grouped)
+            return None
+        return super().keypress(size, key)
 
     def refresh_nodes(self):
         """Adds services to the view if they don't already exist
 
-        Schedules UI update on main thread to avoid urwid issues with
-        changing listbox state during render.
+        The status is read on a worker and compared with what's shown, then
+        only the units that changed are updated, on the main thread to
+        avoid urwid issues with changing listbox state during render.
+        A refresh asked for while one is running is done once it's over.
         """
-        EventLoop.loop.event_loop._loop.call_soon_threadsafe(
-            self._refresh_nodes_on_main_thread)
+        with self.fetch_lock:
+            if self.fetching:
+                self.refresh_again = True
+                return
+            self.fetching = True
+        f = async.submit(self._fetch, self._fetch_failed,
+                         queue_name=STATUS_QUEUE)
+        if f is None:
+            with self.fetch_lock:
+                self.fetching = False
+            return
+        f.add_done_callback(self._fetch_done)
 
-    def _refresh_nodes_on_main_thread(self):
-        status = model_status()
+    def _fetch_failed(self, exc):
+        self.app.log.error("Unable to refresh deploy status: {}".format(exc))
+
+    def _fetch_done(self, future):
+        with self.fetch_lock:
+            self.fetching = False
+            again, self.refresh_again = self.refresh_again, False
+        if again:
+            self.refresh_nodes()
+
+    def _fetch(self):
+        """ Reads the status and schedules the changes since the last
+        refresh to be shown
+        """
+        status = current_status() or model_status()
+        changed = {}
+        pending = []
         for name, service in sorted(status['applications'].items()):
-            service_w = ServiceWidget(name, service)
-            for unit in service_w.Units:
-                try:
-                    unit_w = self.deployed[unit._name]
-                except:
-                    self.deployed[unit._name] = unit
-                    unit_w = self.deployed[unit._name]
-                    self.table.addColumns(
-                        unit._name,
-                        [
-                            ('fixed', 3, getattr(unit_w, 'Icon')),
-                            ('fixed', 50, getattr(unit_w, 'Name')),
-                            ('fixed', 20, getattr(unit_w, 'AgentStatus'))
-                        ]
-                    )
-
-                    if not hasattr(unit_w, 'WorkloadInfo'):
-                        continue
-                    self.table.addColumns(
-                        unit._name,
-                        [
-                            ('fixed', 5, Text("")),
-                            Color.info_context(
-                                unit_w.WorkloadInfo)
-                        ],
-                        force=True)
-                self.update_ui_state(unit_w, unit._unit)
+            for unit_name, unit in (service.get('units') or {}).items():
+                unithistory.record(
+                    name, service.get('charm', ''), unit_name,
+                    (unit.get('agent-status') or {}).get('status', ''),
+                    (unit.get('workload-status') or {}).get('status', ''))
+                row = unit_row(unit)
+                if row[3] in PENDING_STATES:
+                    pending.append((unit_name, row[3]))
+                if self.shown.get(unit_name) == row:
+                    continue
+                self.shown[unit_name] = row
+                changed[unit_name] = (name, row)
+        eta = self._eta_text()
+        if not (changed or pending) and eta == self.eta.text:
+            return
+        EventLoop.loop.event_loop._loop.call_soon_threadsafe(
+            self._refresh_nodes_on_main_thread, changed, pending, eta)
+
+    def _eta_text(self):
+        seconds = unithistory.eta()
+        if seconds is None:
+            return ""
+        if seconds < 60:
+            return "Almost there, judging by previous runs"
+        return "About {:.0f} minutes to go, judging by previous " \
+            "runs".format(seconds / 60)
+
+    def _build_row(self, row):
+        icon, name, status, info = row.values
+        return Pile([
+            Columns([
+                ('fixed', 3, Text(icon)),
+                ('fixed', 50, Text(name)),
+                ('fixed', 20, Text(status))
+            ], dividechars=1),
+            Columns([
+                ('fixed', 5, Text("")),
+                Color.info_context(Text(info))
+            ], dividechars=1),
+            HR(0, 0)
+        ])
+
+    def _build_group(self, application):
+        return Color.label(Text(application))
+
+    def sort_by_status(self, by_status=True):
+        """ Lists units by status rather than by name """
+        self.by_status = by_status
+        self.table.sort(status_order if by_status else unit_order)
+
+    def group_by_application(self, grouped=True):
+        self.grouped = grouped
+        self.table.group(grouped)
+
+    def _refresh_nodes_on_main_thread(self, changed, pending, eta=""):
+        self.eta.set_text(eta)
+        for name, (application, row) in changed.items():
+            self.update_ui_state(name, application, row)
+        for name, status in pending:
+            if name not in changed:
+                values = self.table.row(name).values
+                self.table.update_row(
+                    name, (self.status_icon_state(status),) + values[1:])
 
     def status_icon_state(self, agent_state):
-        if agent_state == "maintenance" \
-           or agent_state == "allocating" \
-           or agent_state == "executing":
+        if agent_state in PENDING_STATES:
             pending_status = [("pending_icon", "\N{CIRCLED BULLET}"),
                               ("pending_icon", "\N{CIRCLED WHITE BULLET}"),
                               ("pending_icon", "\N{FISHEYE}")]
@@ -81,26 +204,19 @@ class DeployStatusView(WidgetWrap):
             status = ("error_icon", "?")
         return status
 
-    def update_ui_state(self, unit_w, unit):
-        """ Updates individual machine information
+    def update_ui_state(self, name, application, row):
+        """ Updates individual unit information
 
         Arguments:
-        service: current service
-        unit_w: UnitInfo widget
-        unit: current unit for service
+        name: unit name
+        application: application the unit belongs to
+        row: what to show of the unit, see unit_row()
         """
+        machine, address, info, status = row
         try:
-            unit_w.Machine.set_text(unit.get('machine', '-'))
-            unit_w.PublicAddress.set_text(unit['public-address'])
-            unit_w.WorkloadInfo.set_text(unit['workload-status']['info'])
-            if unit['workload-status']['status'] != 'unknown':
-                unit_w.AgentStatus.set_text(unit['workload-status']['status'])
-                unit_w.Icon.set_text(
-                    self.status_icon_state(unit['workload-status']['status']))
-            else:
-                unit_w.AgentStatus.set_text(unit['agent-status']['status'])
-                unit_w.Icon.set_text(
-                    self.status_icon_state(unit['agent-status']['status']))
+            self.table.add_row(
+                name, (self.status_icon_state(status), name, status, info),
+                group=application)
         except Exception as e:
             self.app.log.exception(e)
             self.app.ui.show_exception_message(e)
@@ -0,0 +1,257 @@
+""" Unit status history
+
+Every change of a unit's agent or workload status seen on the deploy
+status screen is kept, with when it was seen, in an SQLite database under
+the cache dir. Runs of a spell are kept side by side, so how long each
+application's units take to go active can be compared across runs, and
+the current run gets an ETA from the ones before it.
+
+Example:
+unithistory.start('openstack-novalxd', 'localhost-controller', 'default')
+unithistory.record('mysql', 'cs:mysql-57', 'mysql/0', 'idle', 'active')
+unithistory.eta()
+"""
+
+import os
+import sqlite3
+import sys
+import time
+from threading import Lock
+
+from conjureup.app_config import app
+
+HISTORY_FILE = "unit-history.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id TEXT PRIMARY KEY,
+    spell TEXT,
+    controller TEXT,
+    model TEXT,
+    started REAL
+);
+CREATE TABLE IF NOT EXISTS transitions (
+    run TEXT,
+    application TEXT,
+    charm TEXT,
+    unit TEXT,
+    agent TEXT,
+    workload TEXT,
+    t REAL
+);
+CREATE INDEX IF NOT EXISTS transitions_run ON transitions (run);
+"""
+
+this = sys.modules[__name__]
+
+# vars
+this.DB = None
+this.LOCK = Lock()
+# id and spell of the run being recorded, None until start()
+this.RUN = None
+this.SPELL = None
+# unit : (agent, workload) last recorded
+this.LAST = {}
+# unit : (application, time first seen)
+this.SEEN = {}
+# units that have gone active this run
+this.ACTIVE = set()
+# application : seconds its units took to go active in past runs
+this.PAST = None
+
+
+class AppStats:
+    """ How long an application's units took to go active in past runs
+    """
+
+    __slots__ = ('application', 'charm', 'times')
+
+    def __init__(self, application, charm, times):
+        self.application = application
+        self.charm = charm
+        self.times = sorted(times)
+
+    @property
+    def runs(self):
+        return len(self.times)
+
+    @property
+    def median(self):
+        mid = len(self.times) // 2
+        if len(self.times) % 2:
+            return self.times[mid]
+        return (self.times[mid - 1] + self.times[mid]) / 2
+
+    def __repr__(self):
+        return "<AppStats {} {:.0f}s over {} runs>".format(
+            self.application, self.median, self.runs)
+
+
+def is_active(agent, workload):
+    """ Whether a unit is up, charms that don't set a workload status
+    being up once their agent is idle
+    """
+    return workload == 'active' or \
+        (workload in ('', 'unknown') and agent == 'idle')
+
+
+def history_path():
+    """ Returns the path of the database, None if there's no cache dir
+    """
+    if app.argv is None or not getattr(app.argv, 'cache_dir', None):
+        return None
+    return os.path.join(app.argv.cache_dir, HISTORY_FILE)
+
+
+def _db():
+    """ Must hold LOCK """
+    if this.DB is None:
+        path = history_path()
+        if path is None:
+            return None
+        try:
+            this.DB = sqlite3.connect(path, check_same_thread=False)
+            this.DB.executescript(SCHEMA)
+        except sqlite3.Error as e:
+            app.log.warning("Unable to open unit history {}: {}".format(
+                path, e))
+            this.DB = None
+    return this.DB
+
+
+def start(spell, controller, model, run=None):
+    """ Starts recording a run of spell against controller:model
+
+    Arguments:
+    run: id of the run, defaults to the session id
+    """
+    run = run or app.session_id
+    with this.LOCK:
+        this.RUN = run
+        this.SPELL = spell
+        this.LAST = {}
+        this.SEEN = {}
+        this.ACTIVE = set()
+        this.PAST = None
+        db = _db()
+        if db is None:
+            return
+        try:
+            with db:
+                db.execute("INSERT OR IGNORE INTO runs VALUES (?, ?, ?, ?, ?)",
+                           (run, spell, controller, model, time.time()))
+        except sqlite3.Error as e:
+            app.log.warning("Unable to record run in unit history: "
+                            "{}".format(e))
+
+
+def record(application, charm, unit, agent, workload, t=None):
+    """ Records unit's status, if it changed since it was last recorded
+    """
+    t = t or time.time()
+    with this.LOCK:
+        if this.RUN is None or this.LAST.get(unit) == (agent, workload):
+            return
+        this.LAST[unit] = (agent, workload)
+        this.SEEN.setdefault(unit, (application, t))
+        if is_active(agent, workload):
+            this.ACTIVE.add(unit)
+        db = _db()
+        if db is None:
+            return
+        try:
+            with db:
+                db.execute("INSERT INTO transitions VALUES "
+                           "(?, ?, ?, ?, ?, ?, ?)",
+                           (this.RUN, application, charm, unit, agent,
+                            workload, t))
+        except sqlite3.Error as e:
+            app.log.warning("Unable to record unit history: {}".format(e))
+
+
+def stats(spell, exclude=None):
+    """ Returns AppStats of every application of spell, from the runs in
+    which all its units went active
+
+    Arguments:
+    spell: spell name
+    exclude: id of a run to leave out, e.g. the current one
+    """
+    with this.LOCK:
+        db = _db()
+        if db is None:
+            return {}
+        try:
+            rows = db.execute(
+                "SELECT t.run, t.application, MAX(t.charm), t.unit, "
+                "MIN(t.t), MIN(CASE WHEN t.workload = 'active' OR "
+                "(t.workload IN ('', 'unknown') AND t.agent = 'idle') "
+                "THEN t.t END) "
+                "FROM transitions t JOIN runs r ON r.id = t.run "
+                "WHERE r.spell = ? AND r.id IS NOT ? "
+                "GROUP BY t.run, t.application, t.unit",
+                (spell, exclude)).fetchall()
+        except sqlite3.Error as e:
+            app.log.warning("Unable to read unit history: {}".format(e))
+            return {}
+
+    # (run, application) : seconds until its last unit went active,
+    # None if one never did
+    took = {}
+    charms = {}
+    for run, application, charm, unit, first, active in rows:
+        key = (run, application)
+        charms[application] = charm or charms.get(application)
+        if active is None or took.get(key, 0) is None:
+            took[key] = None
+            continue
+        took[key] = max(took.get(key, 0), active - first)
+    times = {}
+    for (run, application), seconds in took.items():
+        if seconds is not None:
+            times.setdefault(application, []).append(seconds)
+    return {application: AppStats(application, charms[application], t)
+            for application, t in times.items()}
+
+
+def eta(now=None):
+    """ Returns the estimated seconds until every unit seen so far is
+    active, going by past runs of the spell, or None without any
+
+    Units of applications that never went active before are left out.
+    """
+    if this.RUN is None:
+        return None
+    if this.PAST is None:
+        this.PAST = stats(this.SPELL, exclude=this.RUN)
+    if not this.PAST:
+        return None
+    now = now or time.time()
+    with this.LOCK:
+        pending = [(application, seen)
+                   for unit, (application, seen) in this.SEEN.items()
+                   if unit not in this.ACTIVE]
+    remaining = [this.PAST[application].median - (now - seen)
+                 for application, seen in pending
+                 if application in this.PAST]
+    if not remaining:
+        return None
+    return max(0, max(remaining))
+
+
+def report(spell):
+    """ Returns a table of how long each application of spell took to go
+    active, slowest first
+    """
+    apps = sorted(stats(spell).values(), key=lambda s: -s.median)
+    if not apps:
+        return "No unit history for {}".format(spell)
+    lines = ["Time to active for {}:".format(spell),
+             "  {:<30} {:<30} {:>5} {:>8} {:>8} {:>8}".format(
+                 "application", "charm", "runs", "median", "min", "max")]
+    for s in apps:
+        lines.append("  {:<30} {:<30} {:>5} {:>7.0f}s {:>7.0f}s "
+                     "{:>7.0f}s".format(s.application, s.charm or "",
+                                        s.runs, s.median, s.times[0],
+                                        s.times[-1]))
+    return "\n".join(lines)
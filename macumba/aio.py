@@ -0,0 +1,73 @@
+import asyncio
+from functools import partial
+
+from .v2 import JujuClient
+
+
+class AsyncJujuClient(JujuClient):
+    """ Exposes Juju 2.0 facades as coroutines
+
+    Requests are pipelined over the same websocket as JujuClient, replies
+    are delivered to the given asyncio loop (by default the current one,
+    which is the loop urwid runs on in conjure-up), so any number of calls
+    can be awaited concurrently without tying up a thread each.
+
+    Example:
+    jujuc = AsyncJujuClient(
+        'wss://10.0.3.53:17070/model/e712da7b-6808-49ec-8c90-113b26d1650d/api',
+        'f2cbbb1f163f2ed8725e973e5eeaf51a')
+    await jujuc.login()
+    status = await jujuc.Client(request="FullStatus")
+    """
+
+    def __init__(self, url, password, user='user-admin', loop=None,
+                 **kwargs):
+        if loop is None:
+            loop = asyncio.get_event_loop()
+        self.loop = loop
+        super().__init__(url, password, user, **kwargs)
+
+    def _bind_facade(self, name, version):
+        return partial(self._request_async, name_type=name, version=version)
+
+    def wrap(self, future):
+        """ Returns an awaitable for a Future from send()/submit() """
+        return asyncio.wrap_future(future, loop=self.loop)
+
+    async def _request_async(self, name_type, version, request, params=None,
+                             object_id=None):
+        """ Performs a request
+
+            Params:
+            name_type: Facade type
+            version: Facade version
+            request: Name of Juju API call
+            params: Query options to pass to request
+            object_id: Id of the server side object to call
+        """
+        return await self.wrap(self.send(self._envelope(
+            name_type, version, request, params, object_id)))
+
+    async def gather(self, requests, return_exceptions=False):
+        """ Pipelines requests and waits for all of the replies
+
+            Params:
+            requests: iterable of (facade, request[, params[, object_id]])
+                      tuples
+            return_exceptions: return errors in place of results instead
+                               of raising the first one
+
+            Returns list of responses in the same order as requests
+        """
+        fs = [self.wrap(f) for f in self.submit_many(requests)]
+        return await asyncio.gather(*fs, return_exceptions=return_exceptions)
+
+    # Opening the socket is a blocking handshake, keep it off the loop.
+    async def login(self):
+        await self.loop.run_in_executor(None, super().login)
+
+    async def reconnect(self):
+        await self.loop.run_in_executor(None, super().reconnect)
+
+    async def close(self):
+        await self.loop.run_in_executor(None, super().close)
@@ -1,14 +1,21 @@
-import time
 import os.path as path
+import random
 import requests
 import logging
 import threading
+import time
+from concurrent import futures
+from functools import partial
 from .errors import (LoginError,
                      CharmNotFoundError,
+                     ConnectionClosedError,
+                     PendingLimitError,
+                     RequestAbortedError,
                      RequestTimeout,
                      ServerError,
                      BadResponseError,
                      MacumbaError)
+from .stats import CallStats
 from .ws import JujuWS
 
 log = logging.getLogger('macumba')
@@ -52,19 +59,61 @@ class Base:
     CREDS_VERSION = None
     FACADE_VERSIONS = {}
 
-    def __init__(self, url, password, user='user-admin'):
+    # Requests that only read state (or are harmless to repeat) and so
+    # are resent after an automatic reconnect. Anything else that was in
+    # flight when the connection dropped fails with RequestAbortedError,
+    # as we can't know whether the controller acted on it.
+    IDEMPOTENT_REQUESTS = frozenset([
+        'AddCharm',
+        'CharmInfo',
+        'FullStatus',
+        'GetConstraints',
+        'GetModelConstraints',
+        'ListModels',
+        'ListResources',
+        'ModelGet',
+        'ModelInfo',
+        'ModelUserInfo',
+        'WatchAll',
+    ])
+
+    # reconnect backoff, in seconds
+    RECONNECT_BASE_DELAY = 0.5
+    RECONNECT_MAX_DELAY = 30
+
+    def __init__(self, url, password, user='user-admin',
+                 auto_reconnect=False, max_reconnect_attempts=10,
+                 stats=None, recorder=None, request_timeout=None,
+                 max_pending=None):
         """ init
 
         Params:
         url: URL in form of wss://{api-endpoint}/model/{uuid}/api
         password: Password for user
         user: juju user with access to endpoint
+        auto_reconnect: reconnect and log in again when the connection
+                        drops, replaying idempotent in-flight requests
+        max_reconnect_attempts: give up reconnecting after this many
+                                failed attempts
+        stats: CallStats to record calls in, shared between clients
+               e.g. across re-logins; a new one is made if not given
+        recorder: SessionRecorder that every message sent and received
+                  is written to, for replaying against the fake server
+        request_timeout: default seconds call() waits for a reply, None
+                         to wait forever
+        max_pending: refuse to send with PendingLimitError while this
+                     many requests are waiting on a reply
         """
         self.url = url
         self.password = password
+        self.recorder = recorder
+        self.request_timeout = request_timeout
+        self.max_pending = max_pending
+        self.login_response = None
         self.connlock = threading.RLock()
         with self.connlock:
-            self.conn = JujuWS(url, password)
+            self.conn = JujuWS(url, password, recorder=recorder,
+                               max_pending=max_pending)
 
         self.creds = {'Type': 'Admin',
                       'Version': self.CREDS_VERSION,
@@ -73,6 +122,19 @@ class Base:
                       'Params': {'auth-tag': user,
                                  'credentials': password}}
 
+        self.auto_reconnect = auto_reconnect
+        self.max_reconnect_attempts = max_reconnect_attempts
+        # reconnect bookkeeping, guarded by connlock
+        self.reconnect_count = 0
+        self.downtime = 0.0
+        self._closing = False
+        self._reconnecting = False
+        self._replay = []
+
+        if stats is None:
+            stats = CallStats()
+        self.stats = stats
+
     def _prepare_strparams(self, d):
         r = {}
         for k, v in d.items():
@@ -90,48 +152,145 @@ class Base:
 
         block other threads until done.
         """
+        self._login()
+
+    def _login(self):
         with self.connlock:
-            req_id = self.conn.do_connect(self.creds)
-            try:
-                res = self.receive(req_id)
-                if 'Error' in res:
-                    raise LoginError(res['ErrorCode'])
-            except Exception as e:
-                raise LoginError(str(e))
+            self._closing = False
+            self._authenticate(self.conn)
+
+    def _authenticate(self, conn):
+        req_id = conn.do_connect(self.creds)
+        try:
+            res = conn.get_future(req_id).result()
+            conn.discard(req_id)
+            if 'Error' in res:
+                raise LoginError(res['ErrorCode'])
+        except Exception as e:
+            raise LoginError(str(e))
+        self.login_response = res.get('Response', {})
+        self._negotiate(self.login_response)
+
+    def _negotiate(self, login_response):
+        """ Called after each successful login with the Login response,
+        which lists the facades and versions the controller supports
+        """
+        pass
 
     def reconnect(self):
         with self.connlock:
-            self.close()
-            start_id = self.conn.get_current_request_id() + 1
-            self.conn = JujuWS(self.url,
-                               self.password,
-                               start_reqid=start_id)
-            self.login()
+            self.conn.do_close()
+            self.conn = self._new_conn()
+            self._login()
+
+    def _new_conn(self):
+        start_id = self.conn.get_current_request_id() + 1
+        return JujuWS(self.url, self.password, start_reqid=start_id,
+                      recorder=self.recorder, max_pending=self.max_pending)
 
     def close(self):
         """ Closes connection to juju websocket """
         with self.connlock:
+            self._closing = True
             self.conn.do_close()
 
+    def _is_idempotent(self, params):
+        return params.get('Request') in self.IDEMPOTENT_REQUESTS
+
+    def _start_reconnect(self):
+        """ Kicks off the reconnect thread, must hold connlock """
+        if self._reconnecting:
+            return
+        self._reconnecting = True
+        log.warning("connection to {} lost, reconnecting".format(self.url))
+        t = threading.Thread(target=self._reconnect_loop,
+                             name="macumba-reconnect",
+                             daemon=True)
+        t.start()
+
+    def _reconnect_delay(self, attempt):
+        """ Exponential backoff with jitter so many clients dropped at
+        once don't all come back at the same instant
+        """
+        delay = min(self.RECONNECT_MAX_DELAY,
+                    self.RECONNECT_BASE_DELAY * 2 ** attempt)
+        return random.uniform(delay / 2, delay)
+
+    def _reconnect_loop(self):
+        started = time.time()
+        attempt = 0
+        while True:
+            with self.connlock:
+                closing = self._closing
+                conn = self._new_conn()
+            if closing:
+                err = ConnectionClosedError("client closed while reconnecting")
+                break
+            try:
+                self._authenticate(conn)
+                err = None
+                break
+            except Exception as e:
+                attempt += 1
+                log.debug("reconnect attempt {} to {} failed: {}".format(
+                    attempt, self.url, e))
+                if attempt >= self.max_reconnect_attempts:
+                    err = ConnectionClosedError(
+                        "unable to reconnect to {} after {} attempts: "
+                        "{}".format(self.url, attempt, e))
+                    break
+                time.sleep(self._reconnect_delay(attempt))
+
+        with self.connlock:
+            if err is None:
+                self.conn = conn
+                self.reconnect_count += 1
+            downtime = time.time() - started
+            self.downtime += downtime
+            self._reconnecting = False
+            replay, self._replay = self._replay, []
+
+        if err is not None:
+            log.error(str(err))
+            for params, future, timeout in replay:
+                future.set_exception(err)
+            return
+
+        log.info("reconnected to {} after {:.1f}s ({} reconnects, {:.1f}s "
+                 "total downtime), replaying {} requests".format(
+                     self.url, downtime, self.reconnect_count,
+                     self.downtime, len(replay)))
+        for params, future, timeout in replay:
+            self._dispatch(params, future, timeout)
+
     def receive(self, request_id, timeout=None):
         """receives expected message.
 
         returns parsed response object.
 
+        Blocks until the reply arrives, waking as soon as the socket
+        thread hands it over. If the connection closes first, raises
+        ConnectionClosedError.
+
         if timeout is set, raises RequestTimeout after 'timeout' seconds
         with no received message.
 
         """
-        res = None
-        start_time = time.time()
-        while res is None:
-            with self.connlock:
-                res = self.conn.do_receive(request_id)
-            if res is None:
-                time.sleep(0.1)
-                if timeout and (time.time() - start_time > timeout):
-                    raise RequestTimeout(request_id)
+        with self.connlock:
+            conn = self.conn
+        future = conn.get_future(request_id)
+        try:
+            res = future.result(timeout)
+        except futures.TimeoutError:
+            conn.cancel(request_id)
+            raise RequestTimeout(request_id)
+        finally:
+            if future.done():
+                conn.discard(request_id)
 
+        return self._parse_response(res)
+
+    def _parse_response(self, res):
         if 'Error' in res:
             raise ServerError(res['Error'], res)
 
@@ -140,18 +299,137 @@ class Base:
         except:
             raise BadResponseError("Failed to parse response: {}".format(res))
 
-    def call(self, params, timeout=None):
-        """ Get json data from juju api daemon.
-
-        :params params: Additional params to be passed into request
-        :type params: dict
-        """
+    def _prepare_params(self, params):
         if params['Type'] in self.FACADE_VERSIONS:
             params.update({'Version': self.FACADE_VERSIONS[params['Type']]})
         else:
             raise MacumbaError(
                 'Unknown facade type: {}'.format(params['Type']))
+        return params
+
+    def send(self, params, timeout=None):
+        """ Sends a request without waiting for its reply.
+
+        Replies are matched up by RequestId so any number of requests
+        can be in flight on the one connection.
+
+        :params params: Additional params to be passed into request
+        :type params: dict
+        :params timeout: seconds after which the future fails with
+                         RequestTimeout and a late reply is dropped
+        :returns: concurrent.futures.Future whose result is the parsed
+                  response, or which raises ServerError etc. exactly as
+                  call() would. Cancelling it stops waiting for the
+                  reply.
+        """
+        params = self._prepare_params(params)
+        future = futures.Future()
+        self._dispatch(params, future, timeout)
+        return future
+
+    def _dispatch(self, params, future, timeout=None):
+        """ Puts params on the wire, completing future with the reply """
+        with self.connlock:
+            if future.cancelled():
+                return
+            if self._reconnecting:
+                # not sent yet, so safe to send once we're back
+                self._replay.append((params, future, timeout))
+                return
+            conn = self.conn
+            sent_at = time.time()
+            try:
+                req_id, raw = conn.submit(params, timeout)
+            except PendingLimitError as e:
+                future.set_exception(e)
+                return
+            except Exception as e:
+                if not self.auto_reconnect or self._closing:
+                    future.set_exception(e)
+                    return
+                self._replay.append((params, future, timeout))
+                self._start_reconnect()
+                return
+
+        raw.add_done_callback(partial(self._reply_done, conn, req_id, params,
+                                      future, timeout, sent_at))
+        future.add_done_callback(partial(self._cancel_request, conn, req_id))
+
+    def _cancel_request(self, conn, req_id, future):
+        if future.cancelled():
+            conn.cancel(req_id)
+
+    def outstanding(self):
+        """ Returns (request id, label, age in seconds) of each request
+        still waiting on a reply, oldest first
+        """
+        with self.connlock:
+            conn = self.conn
+        return conn.pending.outstanding()
+
+    def _reply_done(self, conn, req_id, params, future, timeout, sent_at,
+                    raw):
+        conn.discard(req_id)
+        if raw.cancelled():
+            return
+        if isinstance(raw.exception(), ConnectionClosedError) \
+           and self.auto_reconnect and not self._closing:
+            return self._requeue(conn, params, future, timeout)
+        error = None
+        try:
+            res = self._parse_response(raw.result())
+        except Exception as e:
+            error = e
+        self._record(params, raw, time.time() - sent_at, error is not None)
+        if not future.set_running_or_notify_cancel():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(res)
+
+    def _record(self, params, raw, latency, error):
+        sent_bytes = getattr(raw, 'request_size', 0)
+        received_bytes = getattr(raw, 'response_size', 0)
+        self.stats.record(params.get('Type'), params.get('Request'),
+                          latency, sent_bytes, received_bytes, error)
+        log.debug("{}.{} took {:.3f}s ({} bytes sent, {} received{})".format(
+            params.get('Type'), params.get('Request'), latency,
+            sent_bytes, received_bytes, ", failed" if error else ""))
+
+    def _requeue(self, conn, params, future, timeout):
+        """ Handles a request cut off by a dropped connection """
+        resend = False
         with self.connlock:
-            req_id = self.conn.do_send(params)
+            if not self._is_idempotent(params):
+                future.set_exception(RequestAbortedError(
+                    "{}.{} was in flight when the connection to the "
+                    "controller dropped and is not safe to resend".format(
+                        params.get('Type'), params.get('Request'))))
+            elif conn is not self.conn and not self._reconnecting:
+                # the connection was replaced while this reply was pending
+                resend = True
+            else:
+                self._replay.append((params, future, timeout))
+            if conn is self.conn:
+                self._start_reconnect()
+        if resend:
+            self._dispatch(params, future, timeout)
+
+    def call(self, params, timeout=None):
+        """ Get json data from juju api daemon.
 
-        return self.receive(req_id, timeout)
+        :params params: Additional params to be passed into request
+        :type params: dict
+        :params timeout: seconds to wait for the reply, defaults to
+                         request_timeout
+        """
+        if timeout is None:
+            timeout = self.request_timeout
+        future = self.send(params, timeout)
+        try:
+            return future.result(timeout)
+        except futures.TimeoutError:
+            future.cancel()
+            raise RequestTimeout("{}.{}".format(params['Type'],
+                                                params['Request']))
@@ -0,0 +1,110 @@
+""" JSON encoding of API messages
+
+Messages are decoded straight from the bytes received on the websocket
+and encoded to the bytes sent on it, with the fastest JSON library
+installed: orjson, then ujson, then the standard library. Set
+MACUMBA_JSON to one of BACKENDS, or call use(), to pick one explicitly.
+
+Example:
+from macumba import codec
+msg = codec.loads(b'{"RequestId": 1, "Response": {}}')
+data = codec.dumps(msg)
+"""
+
+import json
+import logging
+import os
+import sys
+
+log = logging.getLogger('macumba')
+
+# in order of preference
+BACKENDS = ('orjson', 'ujson', 'json')
+
+
+def _orjson():
+    import orjson
+
+    def dumps(obj):
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+    return orjson.loads, dumps
+
+
+def _ujson():
+    import ujson
+
+    def dumps(obj):
+        return ujson.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+    return ujson.loads, dumps
+
+
+def _json():
+    if sys.version_info < (3, 6):
+        # json.loads only takes str before 3.6
+        def loads(data):
+            if isinstance(data, (bytes, bytearray)):
+                data = data.decode('utf-8')
+            return json.loads(data)
+    else:
+        loads = json.loads
+
+    def dumps(obj):
+        return json.dumps(obj).encode('utf-8')
+
+    return loads, dumps
+
+
+_LOADERS = {'orjson': _orjson,
+            'ujson': _ujson,
+            'json': _json}
+
+
+def available():
+    """ Returns the names of the backends that can be imported """
+    names = []
+    for name in BACKENDS:
+        try:
+            _LOADERS[name]()
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def get_backend(name):
+    """ Returns (loads, dumps) of backend name
+
+    loads takes bytes (or str) and dumps returns UTF-8 encoded bytes,
+    whatever the backend.
+    """
+    if name not in _LOADERS:
+        raise ValueError("Unknown JSON backend {}, expected one of "
+                         "{}".format(name, ", ".join(BACKENDS)))
+    return _LOADERS[name]()
+
+
+def use(name=None):
+    """ Switches the module level loads/dumps to backend name, or the
+    first one installed if not given
+
+    Returns the name of the backend in use.
+    """
+    global backend, loads, dumps
+    for candidate in ([name] if name else BACKENDS):
+        try:
+            loads, dumps = get_backend(candidate)
+        except ImportError:
+            if name:
+                raise
+            continue
+        backend = candidate
+        log.debug("Using {} to encode API messages".format(backend))
+        return backend
+
+
+backend = None
+loads = None
+dumps = None
+use(os.environ.get('MACUMBA_JSON'))
@@ -40,3 +40,18 @@ class UnknownRequestError(MacumbaError):
 class RequestTimeout(MacumbaError):
 
     "Request timed out"
+
+
+class RequestAbortedError(MacumbaError):
+
+    "Connection dropped while a non-idempotent request was in flight"
+
+
+class UnknownFacadeError(MacumbaError, AttributeError):
+
+    "Facade is not known to the client or not offered by the controller"
+
+
+class PendingLimitError(MacumbaError):
+
+    "Too many requests are already waiting on a reply"
@@ -0,0 +1,500 @@
+""" A stand-in Juju API server
+
+Speaks the RPC envelope a Juju 2.0 controller does (Type, Version,
+Request, RequestId, Params and Id in, RequestId with Response or Error
+out) on a plain ws:// websocket, backed by a small in-memory model. This
+lets the deploy and status code paths be measured repeatably on a laptop
+with no controller or network.
+
+Sessions with a real controller can be captured with
+macumba.recorder.SessionRecorder (pass it as JujuClient(...,
+recorder=...)) and answered again later with SessionReplay.
+
+Usage:
+python3 -m macumba.fakeserver --port 17070 --latency 0.05 \\
+    --applications 40 --units 3
+python3 -m macumba.fakeserver --replay session.jsonl --recorded-latency
+"""
+
+import argparse
+import itertools
+import logging
+import socket
+import threading
+import time
+import uuid
+from wsgiref.simple_server import make_server
+
+from ws4py.server.wsgirefserver import (WSGIServer,
+                                        WebSocketWSGIRequestHandler)
+from ws4py.server.wsgiutils import WebSocketWSGIApplication
+from ws4py.websocket import WebSocket
+
+from . import codec
+from .recorder import ReplayError, SessionReplay
+from .v2 import _FACADE_VERSIONS
+
+log = logging.getLogger('macumba')
+
+
+class FakeServerError(Exception):
+
+    "Error returned to the client as a Juju API error"
+
+    def __init__(self, message, code=''):
+        self.code = code
+        super().__init__(message)
+
+
+def _status(current, message=''):
+    return {'current': current, 'message': message, 'since': time.time()}
+
+
+class FakeModel:
+    """ In-memory model the fake server operates on
+
+    Changes are kept as AllWatcher deltas so watchers see the same stream
+    of application, unit, machine and relation updates a controller would
+    send.
+    """
+
+    def __init__(self, num_applications=0, units_per_application=1,
+                 settle_time=None):
+        """ init
+
+        Params:
+        num_applications: applications to pre-populate the model with
+        units_per_application: units for each of those
+        settle_time: seconds before newly deployed units go active,
+                     None leaves them pending
+        """
+        self.uuid = str(uuid.uuid4())
+        self.name = "fake"
+        self.settle_time = settle_time
+        self.cond = threading.Condition()
+        self.charms = set()
+        self.entities = {'application': {},
+                         'unit': {},
+                         'machine': {},
+                         'relation': {}}
+        self.deltas = []
+        # watcher id : index of the next delta to send, None before the
+        # first Next
+        self.watchers = {}
+        self._machine_ids = itertools.count()
+        self._watcher_ids = itertools.count(1)
+        for i in range(num_applications):
+            name = "app-{}".format(i)
+            self.deploy({'application': name,
+                         'charm-url': 'cs:xenial/{}-1'.format(name),
+                         'num-units': units_per_application},
+                        settled=True)
+
+    @property
+    def applications(self):
+        return self.entities['application']
+
+    @property
+    def units(self):
+        return self.entities['unit']
+
+    @property
+    def machines(self):
+        return self.entities['machine']
+
+    @property
+    def relations(self):
+        return self.entities['relation']
+
+    def _put(self, kind, key, data):
+        with self.cond:
+            self.entities[kind][key] = data
+            self.deltas.append([kind, 'change', dict(data)])
+            self.cond.notify_all()
+
+    def add_machine(self, series='xenial'):
+        mid = str(next(self._machine_ids))
+        self._put('machine', mid, {'id': mid,
+                                   'instance-id': 'fake-{}'.format(mid),
+                                   'series': series,
+                                   'agent-status': _status('started'),
+                                   'instance-status': _status('running'),
+                                   'life': 'alive'})
+        return mid
+
+    def add_unit(self, application, settled=False):
+        with self.cond:
+            num = sum(1 for u in self.units.values()
+                      if u['application'] == application)
+            name = "{}/{}".format(application, num)
+            mid = self.add_machine()
+            if settled:
+                agent, workload = _status('idle'), _status('active', 'ready')
+            else:
+                agent = _status('allocating')
+                workload = _status('waiting', 'waiting for machine')
+            self._put('unit', name, {
+                'name': name,
+                'application': application,
+                'machine-id': mid,
+                'public-address': '10.0.{}.{}'.format(int(mid) // 250,
+                                                      int(mid) % 250 + 2),
+                'agent-status': agent,
+                'workload-status': workload})
+        if not settled and self.settle_time is not None:
+            t = threading.Timer(self.settle_time, self.settle_unit, [name])
+            t.daemon = True
+            t.start()
+        return name
+
+    def settle_unit(self, name):
+        with self.cond:
+            unit = dict(self.units[name])
+            unit['agent-status'] = _status('idle')
+            unit['workload-status'] = _status('active', 'ready')
+            self._put('unit', name, unit)
+
+    def deploy(self, args, settled=False):
+        name = args['application']
+        with self.cond:
+            if name in self.applications:
+                raise FakeServerError(
+                    'application "{}" already exists'.format(name),
+                    'already exists')
+            self._put('application', name, {
+                'name': name,
+                'charm-url': args.get('charm-url', ''),
+                'exposed': False,
+                'life': 'alive',
+                'status': _status('waiting' if not settled else 'active')})
+            for _ in range(int(args.get('num-units', 1))):
+                self.add_unit(name, settled)
+
+    def expose(self, name):
+        with self.cond:
+            if name not in self.applications:
+                raise FakeServerError(
+                    'application "{}" not found'.format(name), 'not found')
+            application = dict(self.applications[name])
+            application['exposed'] = True
+            self._put('application', name, application)
+
+    def add_relation(self, endpoints):
+        names = [e.split(':')[0] for e in endpoints]
+        key = " ".join(sorted(endpoints))
+        with self.cond:
+            for name in names:
+                if name not in self.applications:
+                    raise FakeServerError(
+                        'application "{}" not found'.format(name),
+                        'not found')
+            if key in self.relations:
+                raise FakeServerError(
+                    'relation {} already exists'.format(key),
+                    'already exists')
+            eps = []
+            for e in endpoints:
+                app_name, _, relname = e.partition(':')
+                eps.append({'application-name': app_name,
+                            'relation': {'name': relname or 'juju-info'}})
+            self._put('relation', key, {'key': key,
+                                        'id': len(self.relations),
+                                        'endpoints': eps})
+        return {'endpoints': {e['application-name']: e['relation']
+                              for e in eps}}
+
+    def full_status(self):
+        def fs(status):
+            return {'status': status['current'], 'info': status['message'],
+                    'since': status['since']}
+
+        with self.cond:
+            applications = {}
+            for name, a in self.applications.items():
+                applications[name] = {'charm': a['charm-url'],
+                                      'exposed': a['exposed'],
+                                      'life': a['life'],
+                                      'status': fs(a['status']),
+                                      'relations': {},
+                                      'units': {}}
+            for name, u in self.units.items():
+                applications[u['application']]['units'][name] = {
+                    'agent-status': fs(u['agent-status']),
+                    'workload-status': fs(u['workload-status']),
+                    'machine': u['machine-id'],
+                    'public-address': u['public-address']}
+            machines = {mid: {'agent-status': fs(m['agent-status']),
+                              'instance-status': fs(m['instance-status']),
+                              'instance-id': m['instance-id'],
+                              'series': m['series']}
+                        for mid, m in self.machines.items()}
+            relations = [{'key': key, 'id': r['id'],
+                          'endpoints': r['endpoints']}
+                         for key, r in self.relations.items()]
+        return {'model': {'name': self.name,
+                          'cloud': 'fake',
+                          'version': '2.0.0'},
+                'machines': machines,
+                'applications': applications,
+                'relations': relations}
+
+    def watch_all(self):
+        with self.cond:
+            wid = str(next(self._watcher_ids))
+            self.watchers[wid] = None
+        return wid
+
+    def next(self, wid):
+        """ Blocks until there are deltas the watcher hasn't seen """
+        with self.cond:
+            if wid not in self.watchers:
+                raise FakeServerError('unknown watcher id', 'not found')
+            cursor = self.watchers[wid]
+            if cursor is None:
+                self.watchers[wid] = len(self.deltas)
+                return [[kind, 'change', dict(data)]
+                        for kind, table in self.entities.items()
+                        for data in table.values()]
+            while len(self.deltas) <= cursor and wid in self.watchers:
+                self.cond.wait()
+            if wid not in self.watchers:
+                raise FakeServerError('watcher was stopped', 'stopped')
+            self.watchers[wid] = len(self.deltas)
+            return self.deltas[cursor:]
+
+    def stop_watcher(self, wid):
+        with self.cond:
+            self.watchers.pop(wid, None)
+            self.cond.notify_all()
+
+
+class FakeJujuSocket(WebSocket):
+    """ Server side of one client connection """
+
+    # set on a per-server subclass
+    fake = None
+
+    def opened(self):
+        self.send_lock = threading.Lock()
+        # replies to pipelined requests go out back to back, don't let
+        # Nagle hold them for the client's delayed ACK
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def received_message(self, m):
+        msg = codec.loads(m.data)
+        # Reply from a thread of its own so a slow or blocking request
+        # (AllWatcher.Next) doesn't hold up ones pipelined behind it.
+        t = threading.Thread(target=self.fake.reply, args=(self, msg))
+        t.daemon = True
+        t.start()
+
+
+class FakeJujuServer:
+    """ Serves a FakeModel, or a recorded session, over a websocket
+
+    Example:
+    server = FakeJujuServer(FakeModel(num_applications=40), latency=0.05)
+    server.start()
+    client = JujuClient(server.url, 'secret')
+    """
+
+    def __init__(self, model=None, host='127.0.0.1', port=0, latency=0.0,
+                 replay=None, recorded_latency=False):
+        """ init
+
+        Params:
+        model: FakeModel to serve, an empty one if not given
+        host: address to listen on
+        port: port to listen on, 0 picks a free one
+        latency: seconds to wait before answering each request
+        replay: SessionReplay to answer requests from instead of model
+        recorded_latency: with replay, wait as long as the recorded
+                          controller took instead of latency
+        """
+        self.model = model or FakeModel()
+        self.latency = latency
+        self.replay = replay
+        self.recorded_latency = recorded_latency
+        self.handlers = {
+            ('Admin', 'Login'): self._login,
+            ('Client', 'AddCharm'): self._add_charm,
+            ('Client', 'AddMachines'): self._add_machines,
+            ('Client', 'FullStatus'): self._full_status,
+            ('Client', 'ModelInfo'): self._model_info,
+            ('Client', 'WatchAll'): self._watch_all,
+            ('AllWatcher', 'Next'): self._next,
+            ('AllWatcher', 'Stop'): self._stop,
+            ('Application', 'Deploy'): self._deploy,
+            ('Application', 'AddRelation'): self._add_relation,
+            ('Application', 'Expose'): self._expose,
+            ('Resources', 'AddPendingResources'): self._add_pending_resources,
+        }
+        handler_cls = type('FakeJujuSocket', (FakeJujuSocket,),
+                           {'fake': self})
+        self.httpd = make_server(
+            host, port,
+            server_class=WSGIServer,
+            handler_class=WebSocketWSGIRequestHandler,
+            app=WebSocketWSGIApplication(handler_cls=handler_cls))
+        self.httpd.initialize_websockets_manager()
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return "ws://{}:{}/model/{}/api".format(host, port, self.model.uuid)
+
+    def start(self):
+        """ Serves in a background thread """
+        self.thread = threading.Thread(target=self.httpd.serve_forever,
+                                       name="fake-juju-server")
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def drop_connections(self):
+        """ Closes every client connection, as a controller restart would,
+        while still accepting new ones
+        """
+        self.httpd.manager.close_all(code=1001, message='fake server dropped '
+                                     'the connection')
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        for wid in list(self.model.watchers):
+            self.model.stop_watcher(wid)
+
+    def reply(self, ws, msg):
+        reply = {'RequestId': msg.get('RequestId')}
+        try:
+            if self.replay is not None:
+                recorded, latency = self.replay.reply_for(msg)
+                time.sleep(latency if self.recorded_latency
+                           else self.latency)
+                reply.update({k: v for k, v in recorded.items()
+                              if k != 'RequestId'})
+            else:
+                time.sleep(self.latency)
+                reply['Response'] = self.handle(msg)
+        except FakeServerError as e:
+            reply.update({'Error': str(e), 'ErrorCode': e.code})
+        except ReplayError as e:
+            reply.update({'Error': str(e), 'ErrorCode': 'not implemented'})
+        except Exception as e:
+            log.exception("fake server failed to handle {}".format(msg))
+            reply.update({'Error': str(e), 'ErrorCode': ''})
+
+        try:
+            with ws.send_lock:
+                ws.send(codec.dumps(reply))
+        except Exception as e:
+            log.debug("fake server unable to reply: {}".format(e))
+
+    def handle(self, msg):
+        key = (msg.get('Type'), msg.get('Request'))
+        if key not in self.handlers:
+            raise FakeServerError(
+                "no such request - method {}.{} is not implemented".format(
+                    *key), 'not implemented')
+        return self.handlers[key](msg.get('Params') or {}, msg)
+
+    def _login(self, params, msg):
+        return {'facades': [{'name': name, 'versions': [version]}
+                            for name, version in _FACADE_VERSIONS.items()],
+                'model-tag': 'model-{}'.format(self.model.uuid),
+                'server-version': '2.0.0',
+                'user-info': {'identity': params.get('auth-tag', ''),
+                              'controller-access': 'superuser',
+                              'model-access': 'admin'}}
+
+    def _add_charm(self, params, msg):
+        self.model.charms.add(params.get('url'))
+        return {}
+
+    def _add_machines(self, params, msg):
+        return {'machines': [
+            {'machine': self.model.add_machine(p.get('series', 'xenial'))}
+            for p in params.get('params', [])]}
+
+    def _full_status(self, params, msg):
+        return self.model.full_status()
+
+    def _model_info(self, params, msg):
+        return {'name': self.model.name,
+                'uuid': self.model.uuid,
+                'provider-type': 'fake',
+                'default-series': 'xenial'}
+
+    def _watch_all(self, params, msg):
+        return {'watcher-id': self.model.watch_all()}
+
+    def _next(self, params, msg):
+        return {'deltas': self.model.next(msg.get('Id'))}
+
+    def _stop(self, params, msg):
+        self.model.stop_watcher(msg.get('Id'))
+        return {}
+
+    def _deploy(self, params, msg):
+        results = []
+        for args in params.get('applications', []):
+            try:
+                self.model.deploy(args)
+                results.append({})
+            except FakeServerError as e:
+                results.append({'error': {'message': str(e),
+                                          'code': e.code}})
+        return {'results': results}
+
+    def _add_relation(self, params, msg):
+        return self.model.add_relation(params.get('Endpoints', []))
+
+    def _expose(self, params, msg):
+        self.model.expose(params.get('application'))
+        return {}
+
+    def _add_pending_resources(self, params, msg):
+        return {'pending-ids': [str(uuid.uuid4())
+                                for _ in params.get('resources', [])]}
+
+
+def parse_options(argv=None):
+    parser = argparse.ArgumentParser(description='Fake Juju API server',
+                                     prog='macumba-fakeserver')
+    parser.add_argument('--host', default='127.0.0.1',
+                        help='Address to listen on')
+    parser.add_argument('--port', type=int, default=17070,
+                        help='Port to listen on')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Seconds to wait before each reply')
+    parser.add_argument('--applications', type=int, default=0,
+                        help='Applications to start the model with')
+    parser.add_argument('--units', type=int, default=1,
+                        help='Units per pre-populated application')
+    parser.add_argument('--settle-time', type=float, default=None,
+                        help='Seconds before deployed units go active')
+    parser.add_argument('--replay', dest='replay',
+                        help='Answer from a session recorded with '
+                        'SessionRecorder instead of the fake model')
+    parser.add_argument('--recorded-latency', action='store_true',
+                        help='With --replay, reply as slowly as the '
+                        'recorded controller did')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    opts = parse_options(argv)
+    model = FakeModel(opts.applications, opts.units, opts.settle_time)
+    replay = SessionReplay(opts.replay) if opts.replay else None
+    server = FakeJujuServer(model, opts.host, opts.port, opts.latency,
+                            replay, opts.recorded_latency)
+    print("Serving fake Juju API on {}".format(server.url))
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+""" Requests waiting on a reply from the controller
+
+Each request sent on a JujuWS connection is registered here with the
+Future its reply completes. Entries can carry a deadline, after which the
+future fails with RequestTimeout and the entry is dropped, so a reply
+that turns up later is thrown away rather than kept around for a caller
+that has long given up. Cancelling the future drops the entry as well.
+"""
+
+import heapq
+import threading
+import time
+from functools import partial
+
+from .errors import PendingLimitError, RequestTimeout
+
+
+class _Pending:
+
+    __slots__ = ('future', 'label', 'sent_at', 'deadline', 'claimed')
+
+    def __init__(self, future, label, sent_at, deadline):
+        self.future = future
+        self.label = label
+        self.sent_at = sent_at
+        self.deadline = deadline
+        # set once something has completed (or is completing) the future
+        self.claimed = False
+
+
+class PendingRequests:
+    """ Outstanding requests of one connection, by request id
+
+    Example:
+    pending = PendingRequests(max_pending=1000)
+    pending.add(7, future, label="Client.FullStatus", timeout=30)
+    pending.resolve(7, reply)
+    pending.outstanding()  # [(request id, label, age in seconds), ...]
+    """
+
+    def __init__(self, max_pending=None):
+        """ init
+
+        Params:
+        max_pending: refuse new requests with PendingLimitError once this
+                     many are waiting on a reply, None for no limit
+        """
+        self.max_pending = max_pending
+        self.cond = threading.Condition(threading.RLock())
+        self.entries = {}
+        # heap of (deadline, request id)
+        self.deadlines = []
+        self.reaper = None
+        self.unclaimed = 0
+        # requests failed by their deadline
+        self.expired = 0
+        # replies that arrived for requests no longer registered
+        self.evicted = 0
+
+    def __len__(self):
+        return self.unclaimed
+
+    def add(self, request_id, future, label=None, timeout=None):
+        """ Registers future to be completed with the reply to request_id
+
+        Params:
+        request_id: RequestId of the request
+        future: concurrent.futures.Future for the raw reply
+        label: what to call the request in outstanding(), e.g.
+               Client.FullStatus
+        timeout: seconds to wait for the reply, None to wait forever
+        """
+        now = time.monotonic()
+        deadline = None if timeout is None else now + timeout
+        with self.cond:
+            if self.max_pending is not None and \
+               self.unclaimed >= self.max_pending:
+                raise PendingLimitError(
+                    "{} requests are already waiting on a reply".format(
+                        self.unclaimed))
+            self.entries[request_id] = _Pending(future, label, now, deadline)
+            self.unclaimed += 1
+            if deadline is not None:
+                heapq.heappush(self.deadlines, (deadline, request_id))
+                self._wake_reaper()
+        future.add_done_callback(partial(self._future_done, request_id))
+
+    def get(self, request_id):
+        """ Returns the future of request_id, or None if not registered """
+        with self.cond:
+            entry = self.entries.get(request_id)
+        return entry.future if entry is not None else None
+
+    def discard(self, request_id):
+        """ Forgets about request_id, any late reply is dropped """
+        with self.cond:
+            entry = self.entries.pop(request_id, None)
+            if entry is not None and not entry.claimed:
+                self.unclaimed -= 1
+
+    def cancel(self, request_id):
+        """ Stops waiting for request_id and cancels its future """
+        with self.cond:
+            entry = self._claim(request_id, remove=True)
+        if entry is not None:
+            entry.future.cancel()
+
+    def _claim(self, request_id, remove=False):
+        """ Marks request_id as being completed, must hold cond
+
+        Returns the entry, or None if it's gone or already claimed.
+        """
+        entry = self.entries.get(request_id)
+        if entry is None or entry.claimed:
+            return None
+        entry.claimed = True
+        self.unclaimed -= 1
+        if remove:
+            del self.entries[request_id]
+        return entry
+
+    def resolve(self, request_id, reply):
+        """ Completes request_id's future with reply
+
+        The entry stays registered until discarded, so a caller can still
+        pick the reply up by id. Returns False if the reply was dropped
+        because nothing is waiting on it any more.
+        """
+        with self.cond:
+            entry = self._claim(request_id)
+            if entry is None:
+                self.evicted += 1
+                return False
+        if not entry.future.cancelled():
+            entry.future.set_result(reply)
+        return True
+
+    def fail_all(self, exc):
+        """ Fails every request still waiting on a reply with exc """
+        with self.cond:
+            entries = [self._claim(rid) for rid in list(self.entries)]
+        for entry in entries:
+            if entry is not None and not entry.future.done():
+                entry.future.set_exception(exc)
+
+    def _future_done(self, request_id, future):
+        # cancelled by whoever is waiting, nothing will pick up a reply
+        if future.cancelled():
+            self.discard(request_id)
+
+    def outstanding(self):
+        """ Returns (request id, label, age in seconds) of every request
+        still waiting on a reply, oldest first
+        """
+        now = time.monotonic()
+        with self.cond:
+            rv = [(rid, e.label, now - e.sent_at)
+                  for rid, e in self.entries.items() if not e.claimed]
+        return sorted(rv, key=lambda r: r[2], reverse=True)
+
+    @property
+    def oldest_age(self):
+        """ Seconds the oldest outstanding request has been waiting """
+        outstanding = self.outstanding()
+        return outstanding[0][2] if outstanding else 0.0
+
+    def _wake_reaper(self):
+        """ Must hold cond """
+        if self.reaper is None:
+            self.reaper = threading.Thread(target=self._reap,
+                                           name="macumba-pending-reaper",
+                                           daemon=True)
+            self.reaper.start()
+        else:
+            self.cond.notify()
+
+    def _reap(self):
+        while True:
+            with self.cond:
+                entry = None
+                while entry is None:
+                    if not self.deadlines:
+                        self.reaper = None
+                        return
+                    deadline, rid = self.deadlines[0]
+                    now = time.monotonic()
+                    if deadline > now:
+                        self.cond.wait(deadline - now)
+                        continue
+                    heapq.heappop(self.deadlines)
+                    current = self.entries.get(rid)
+                    if current is None or current.deadline != deadline:
+                        continue
+                    entry = self._claim(rid, remove=True)
+                self.expired += 1
+            if not entry.future.done():
+                entry.future.set_exception(RequestTimeout(
+                    "{} got no reply within {:.2f}s".format(
+                        entry.label or rid,
+                        entry.deadline - entry.sent_at)))
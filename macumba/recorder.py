@@ -0,0 +1,100 @@
+""" Recording and replaying Juju API sessions
+
+SessionRecorder writes what a JujuClient sends and receives; the fake
+server (macumba.fakeserver --replay) answers from it with SessionReplay.
+Kept apart from the fake server so recording doesn't need ws4py's server
+side.
+"""
+
+import json
+import threading
+import time
+from collections import defaultdict, deque
+
+
+class ReplayError(Exception):
+
+    "A request the recorded session has no reply for"
+
+
+class SessionRecorder:
+    """ Writes every request sent and reply received on a connection to a
+    JSON lines file, for SessionReplay
+
+    Login credentials are not written.
+    """
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.f = open(path, 'w')
+        self.start = time.time()
+
+    def _write(self, direction, msg):
+        line = json.dumps({'t': round(time.time() - self.start, 6),
+                           'dir': direction,
+                           'msg': msg})
+        with self.lock:
+            self.f.write(line + "\n")
+            self.f.flush()
+
+    def sent(self, msg):
+        if msg.get('Type') == 'Admin':
+            msg = dict(msg, Params=dict(msg.get('Params', {}),
+                                        credentials=''))
+        self._write('send', msg)
+
+    def received(self, msg):
+        self._write('recv', msg)
+
+    def close(self):
+        with self.lock:
+            self.f.close()
+
+
+class SessionReplay:
+    """ Answers requests with the replies from a recorded session
+
+    Requests are matched on facade, request, Id and params first, then on
+    facade and request alone. Matches are used in recorded order, with the
+    last one repeated once they run out, so a status poll can be replayed
+    any number of times.
+    """
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.exact = defaultdict(deque)
+        self.loose = defaultdict(deque)
+        sent = {}
+        with open(path) as f:
+            for line in f:
+                record = json.loads(line)
+                msg = record['msg']
+                if record['dir'] == 'send':
+                    sent[msg['RequestId']] = (msg, record['t'])
+                    continue
+                if msg.get('RequestId') not in sent:
+                    continue
+                request, t = sent.pop(msg['RequestId'])
+                entry = (msg, record['t'] - t)
+                self.exact[self._exact_key(request)].append(entry)
+                self.loose[self._loose_key(request)].append(entry)
+
+    def _exact_key(self, msg):
+        return (msg.get('Type'), msg.get('Request'), msg.get('Id'),
+                json.dumps(msg.get('Params', {}), sort_keys=True))
+
+    def _loose_key(self, msg):
+        return (msg.get('Type'), msg.get('Request'))
+
+    def reply_for(self, msg):
+        """ Returns (reply message, recorded latency) for request msg """
+        with self.lock:
+            for entries in (self.exact.get(self._exact_key(msg)),
+                            self.loose.get(self._loose_key(msg))):
+                if not entries:
+                    continue
+                if len(entries) > 1:
+                    return entries.popleft()
+                return entries[0]
+        raise ReplayError("{}.{} is not in the recorded session".format(
+            msg.get('Type'), msg.get('Request')))
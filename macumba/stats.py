@@ -0,0 +1,107 @@
+import json
+import threading
+
+# upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1, 2.5, 5, 10, 30, 60)
+
+
+class _RequestStats:
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_latency = 0.0
+        self.min_latency = None
+        self.max_latency = 0.0
+        self.histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sent_bytes = 0
+        self.received_bytes = 0
+
+    def record(self, latency, sent_bytes, received_bytes, error):
+        self.count += 1
+        if error:
+            self.errors += 1
+        self.total_latency += latency
+        if self.min_latency is None or latency < self.min_latency:
+            self.min_latency = latency
+        self.max_latency = max(self.max_latency, latency)
+        for idx, bound in enumerate(LATENCY_BUCKETS):
+            if latency <= bound:
+                break
+        else:
+            idx = len(LATENCY_BUCKETS)
+        self.histogram[idx] += 1
+        self.sent_bytes += sent_bytes
+        self.received_bytes += received_bytes
+
+    def as_dict(self):
+        labels = ["<={}".format(b) for b in LATENCY_BUCKETS] + ["+inf"]
+        return {'count': self.count,
+                'errors': self.errors,
+                'latency': {
+                    'total': self.total_latency,
+                    'mean': self.total_latency / max(self.count, 1),
+                    'min': self.min_latency or 0.0,
+                    'max': self.max_latency,
+                    'histogram': dict(zip(labels, self.histogram))},
+                'sent_bytes': self.sent_bytes,
+                'received_bytes': self.received_bytes}
+
+
+class CallStats:
+    """ Counts, latency histograms and payload sizes of API calls, per
+    facade and request
+
+    Example:
+    stats.as_dict()['Client.FullStatus']['latency']['mean']
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = {}
+
+    def record(self, facade, request, latency, sent_bytes=0,
+               received_bytes=0, error=False):
+        """ Records one completed call
+
+        Params:
+        facade: Facade type, e.g. Client
+        request: Name of Juju API call, e.g. FullStatus
+        latency: seconds from send to reply
+        sent_bytes: size of the encoded request
+        received_bytes: size of the encoded reply
+        error: call failed
+        """
+        key = "{}.{}".format(facade, request)
+        with self.lock:
+            if key not in self.requests:
+                self.requests[key] = _RequestStats()
+            self.requests[key].record(latency, sent_bytes,
+                                      received_bytes, error)
+
+    def as_dict(self):
+        with self.lock:
+            return {k: v.as_dict() for k, v in self.requests.items()}
+
+    def summary(self):
+        """ Returns a human readable table, slowest (by total time) first
+        """
+        lines = ["{:<40} {:>6} {:>6} {:>9} {:>9} {:>9} {:>11}".format(
+            "request", "count", "errors", "total s", "mean ms", "max ms",
+            "recv bytes")]
+        stats = sorted(self.as_dict().items(),
+                       key=lambda kv: kv[1]['latency']['total'],
+                       reverse=True)
+        for key, s in stats:
+            lines.append(
+                "{:<40} {:>6} {:>6} {:>9.3f} {:>9.1f} {:>9.1f} {:>11}".format(
+                    key, s['count'], s['errors'], s['latency']['total'],
+                    s['latency']['mean'] * 1000, s['latency']['max'] * 1000,
+                    s['received_bytes']))
+        return "\n".join(lines)
+
+    def dump(self, path):
+        """ Writes stats as JSON to path """
+        with open(path, 'w') as f:
+            json.dump(self.as_dict(), f, indent=2, sort_keys=True)
@@ -1,6 +1,12 @@
 from .api import Base
+from .errors import UnknownFacadeError
 
+import logging
+import threading
 from functools import partial
+from urllib.parse import urlparse
+
+log = logging.getLogger('macumba')
 
 # https://github.com/juju/juju/blob/master/api/facadeversions.go
 _FACADE_VERSIONS = {
@@ -78,6 +84,43 @@ _FACADE_VERSIONS = {
     "VolumeAttachmentsWatcher":     2
 }
 
+# controller API endpoint (host:port) : {facade: version} negotiated at
+# login, shared by every client talking to that controller
+_NEGOTIATED_VERSIONS = {}
+_NEGOTIATED_LOCK = threading.Lock()
+
+
+def negotiate_versions(offered):
+    """ Picks the version to use of each facade a controller offers
+
+    Prefers the version in _FACADE_VERSIONS, which is what our requests
+    are written against, then the newest older one, then the oldest
+    newer one.
+
+    Arguments:
+    offered: 'facades' list from the Login response
+
+    Returns:
+    dict of facade name to version
+    """
+    versions = {}
+    for facade in offered:
+        name, supported = facade['name'], facade['versions']
+        if not supported:
+            continue
+        preferred = _FACADE_VERSIONS.get(name)
+        if preferred is None:
+            versions[name] = max(supported)
+            continue
+        if preferred in supported:
+            versions[name] = preferred
+            continue
+        older = [v for v in supported if v < preferred]
+        versions[name] = max(older) if older else min(supported)
+        log.debug("Controller doesn't offer {} v{}, using v{}".format(
+            name, preferred, versions[name]))
+    return versions
+
 
 class JujuClient(Base):
     """ Exposes Juju 2.0 facades
@@ -87,18 +130,77 @@ class JujuClient(Base):
         'wss://10.0.3.53:17070/model/e712da7b-6808-49ec-8c90-113b26d1650d/api',
         'f2cbbb1f163f2ed8725e973e5eeaf51a')
     jujuc.Client(request="FullStatus")
+
+    Requests can also be pipelined, sending all of them before waiting
+    on any reply:
+    fs = jujuc.submit_many([("Client", "AddCharm", {"url": url})
+                            for url in charm_urls])
+    results = [f.result() for f in fs]
     """
     API_VERSION = 2
     CREDS_VERSION = 3
 
-    def __init__(self, url, password, user='user-admin'):
-        for name, version in _FACADE_VERSIONS.items():
-            setattr(self, name, partial(self._request,
-                                        name_type=name,
-                                        version=version))
-        super().__init__(url, password, user)
+    def __init__(self, url, password, user='user-admin',
+                 auto_reconnect=False, max_reconnect_attempts=10,
+                 stats=None, recorder=None, request_timeout=None,
+                 max_pending=None):
+        self.controller = urlparse(url).netloc
+        # facades bound on this instance by __getattr__
+        self._bound = set()
+        super().__init__(url, password, user,
+                         auto_reconnect=auto_reconnect,
+                         max_reconnect_attempts=max_reconnect_attempts,
+                         stats=stats,
+                         recorder=recorder,
+                         request_timeout=request_timeout,
+                         max_pending=max_pending)
+
+    def __getattr__(self, name):
+        # Facades are bound on first use rather than all ~70 of them
+        # up front, with the version negotiated at login.
+        if name.startswith('_') or not name[:1].isupper():
+            raise AttributeError(name)
+        bound = self._bind_facade(name, self.facade_version(name))
+        self.__dict__[name] = bound
+        self._bound.add(name)
+        return bound
+
+    @property
+    def facade_versions(self):
+        """ Versions offered by this client's controller, or the built in
+        table if we haven't logged in to it yet
+        """
+        return _NEGOTIATED_VERSIONS.get(self.controller, _FACADE_VERSIONS)
+
+    def facade_version(self, name):
+        """ Returns the version of facade name to use
+
+        Raises UnknownFacadeError if the controller doesn't offer it.
+        """
+        try:
+            return self.facade_versions[name]
+        except KeyError:
+            raise UnknownFacadeError(
+                'Unknown facade type: {}'.format(name))
+
+    def _negotiate(self, login_response):
+        offered = login_response.get('facades')
+        if not offered:
+            return
+        versions = negotiate_versions(offered)
+        with _NEGOTIATED_LOCK:
+            _NEGOTIATED_VERSIONS[self.controller] = versions
+        # rebind anything used before login at the negotiated version
+        for name in list(self._bound):
+            self.__dict__.pop(name, None)
+        self._bound.clear()
 
-    def _request(self, name_type, version, request, params=None):
+    def _bind_facade(self, name, version):
+        """ Returns the callable exposed as the facade attribute """
+        return partial(self._request, name_type=name, version=version)
+
+    def _request(self, name_type, version, request, params=None,
+                 object_id=None):
         """ Performs a request
 
             Params:
@@ -106,25 +208,57 @@ class JujuClient(Base):
             version: Facade version
             request: Name of Juju API call
             params: Query options to pass to request
+            object_id: Id of the server side object to call, e.g. the
+                       watcher id for AllWatcher requests
         """
+        return self.call(self._envelope(name_type, version, request,
+                                        params, object_id))
+
+    def _envelope(self, name_type, version, request, params=None,
+                  object_id=None):
         if params is None:
             params = {}
 
         if not isinstance(params, dict):
             raise Exception("Must be a dictionary of query parameters.")
 
-        return self.call({'Type': name_type,
-                          'Version': version,
-                          'Request': request,
-                          'Params': params})
+        envelope = {'Type': name_type,
+                    'Version': version,
+                    'Request': request,
+                    'Params': params}
+        if object_id is not None:
+            envelope['Id'] = object_id
+        return envelope
 
-    def call(self, params, timeout=None):
-        """ Get json data from juju api daemon.
+    def _prepare_params(self, params):
+        return params
+
+    def submit(self, name_type, request, params=None, object_id=None,
+               timeout=None):
+        """ Sends a request without waiting for the reply
+
+            Params:
+            name_type: Facade type
+            request: Name of Juju API call
+            params: Query options to pass to request
+            object_id: Id of the server side object to call
+            timeout: seconds after which the Future raises RequestTimeout
 
-        Params:
-        params: Additional params to be passed into request
+            Returns a Future whose result is the response
         """
-        with self.connlock:
-            req_id = self.conn.do_send(params)
+        return self.send(self._envelope(name_type,
+                                        self.facade_version(name_type),
+                                        request, params, object_id),
+                         timeout)
+
+    def submit_many(self, requests):
+        """ Sends several requests back to back
 
-        return self.receive(req_id, timeout)
+            Params:
+            requests: iterable of (facade, request[, params[, object_id]])
+                      tuples
+
+            Returns a list of Futures in the same order as requests,
+            replies may complete in any order.
+        """
+        return [self.submit(*r) for r in requests]
@@ -1,8 +1,10 @@
 from ws4py.client.threadedclient import WebSocketClient
-import json
+from concurrent.futures import Future
 import threading
 import logging
+from . import codec
 from .errors import ConnectionClosedError, UnknownRequestError
+from .pending import PendingRequests
 
 log = logging.getLogger('macumba')
 
@@ -11,27 +13,37 @@ class JujuWS(WebSocketClient):
 
     def __init__(self, url, password, protocols=['https-only'],
                  extensions=None, ssl_options=None, headers=None,
-                 start_reqid=1):
+                 start_reqid=1, recorder=None, max_pending=None):
         WebSocketClient.__init__(self, url, protocols, extensions,
                                  ssl_options=ssl_options, headers=headers)
         self.open_done = threading.Event()
         self.rid_lock = threading.RLock()
-        self.msglock = threading.RLock()
-        self.messages = {}
+        # request_id : Future completed with the raw reply
+        self.pending = PendingRequests(max_pending)
         self._cur_request_id = start_reqid
+        # optional session recorder, see macumba.recorder
+        self.recorder = recorder
 
     # WebSocketClient subclass overrides, run in private thread:
     def opened(self):
         self.open_done.set()
 
     def received_message(self, m):
-        msg = json.loads(m.data.decode('utf-8'))
+        msg = codec.loads(m.data)
         msg_req_id = msg['RequestId']
-        with self.msglock:
-            self.messages[msg_req_id] = msg
+        if self.recorder is not None:
+            self.recorder.received(msg)
+        future = self.pending.get(msg_req_id)
+        if future is not None:
+            future.response_size = len(m.data)
+        if not self.pending.resolve(msg_req_id, msg):
+            log.debug("dropping reply to request {}, it timed out, was "
+                      "cancelled or is unknown".format(msg_req_id))
 
     def closed(self, code, reason=None):
         log.debug("socket closed: code:{} reason:{}".format(code, reason))
+        self.fail_pending(ConnectionClosedError(
+            "socket closed: code:{} reason:{}".format(code, reason)))
 
     # actions for users of the class:
     def get_current_request_id(self):
@@ -48,41 +60,90 @@ class JujuWS(WebSocketClient):
         rv = self.do_send(creds)
         return rv
 
-    def do_send(self, json_message):
+    def do_send(self, json_message, timeout=None):
+        return self.submit(json_message, timeout)[0]
+
+    def submit(self, json_message, timeout=None):
+        """Sends json_message.
+
+        Returns (request_id, future), the future completes with the
+        parsed reply. If timeout is given and no reply arrives within
+        that many seconds the future raises RequestTimeout, and a reply
+        arriving after that is dropped.
+
+        """
         with self.rid_lock:
             self._cur_request_id += 1
             request_id = self._cur_request_id
 
         json_message['RequestId'] = request_id
+        if self.recorder is not None:
+            self.recorder.sent(json_message)
 
-        self.send(json.dumps(json_message))
+        data = codec.dumps(json_message)
+        future = Future()
+        future.request_size = len(data)
+        future.response_size = 0
 
-        with self.msglock:
-            self.messages[request_id] = None
+        # register before sending so a fast reply can't beat us to it
+        self.pending.add(request_id, future,
+                         label="{}.{}".format(json_message.get('Type'),
+                                              json_message.get('Request')),
+                         timeout=timeout)
 
-        return request_id
+        try:
+            self.send(data)
+        except Exception:
+            self.discard(request_id)
+            raise
 
-    def do_receive(self, request_id):
-        """Checks for message matching request_id.
+        return request_id, future
 
-        Will return None if message has not arrived yet.
+    def get_future(self, request_id):
+        """Returns the Future that completes with the reply to request_id.
+
+        The future's result is the parsed reply message. If the socket
+        closes before the reply arrives the future raises
+        ConnectionClosedError.
 
         Raises UnknownRequestError if request_id hasn't been sent yet
         (or was already received).
 
         """
-        if self.terminated:
-            raise ConnectionClosedError
+        future = self.pending.get(request_id)
+        if future is None:
+            errmsg = ("{} not in messages. "
+                      "cur = {}".format(request_id,
+                                        self._cur_request_id))
+            raise UnknownRequestError(errmsg)
+        return future
+
+    def discard(self, request_id):
+        """Forgets about request_id, any late reply is dropped."""
+        self.pending.discard(request_id)
+
+    def cancel(self, request_id):
+        """Stops waiting for request_id, any late reply is dropped."""
+        self.pending.cancel(request_id)
+
+    def fail_pending(self, exc):
+        """Wakes every waiter on an outstanding request with exc."""
+        self.pending.fail_all(exc)
 
-        with self.msglock:
-            if request_id not in self.messages:
-                errmsg = ("{} not in messages. "
-                          "cur = {}".format(request_id,
-                                            self._cur_request_id))
-                raise UnknownRequestError(errmsg)
+    def do_receive(self, request_id):
+        """Checks for message matching request_id.
 
-            message = self.messages[request_id]
-            if message is not None:
-                del self.messages[request_id]
+        Will return None if message has not arrived yet.
 
-        return message
+        Raises UnknownRequestError if request_id hasn't been sent yet
+        (or was already received).
+
+        """
+        future = self.get_future(request_id)
+        if not future.done():
+            if self.terminated:
+                raise ConnectionClosedError
+            return None
+
+        self.discard(request_id)
+        return future.result()
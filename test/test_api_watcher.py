@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+#
+# tests api/watcher.py
+#
+# Copyright 2016 Canonical, Ltd.
+
+
+import os
+import subprocess
+import sys
+import time
+import unittest
+from unittest.mock import patch
+
+from conjureup import juju
+from conjureup.api import watcher
+from conjureup.api.watcher import ModelState
+from macumba.errors import ServerError
+from macumba.fakeserver import FakeJujuServer, FakeModel
+from macumba.v2 import JujuClient
+
+
+class ModelStateTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app_patcher = patch('conjureup.api.watcher.app')
+        self.mock_app = self.app_patcher.start()
+        self.juju_patcher = patch('conjureup.api.watcher.juju')
+        self.mock_juju = self.juju_patcher.start()
+        self.mock_juju.CLIENT.Client.return_value = {'watcher-id': '1'}
+        self.state = ModelState('ctrl', 'mdl')
+
+    def tearDown(self):
+        self.app_patcher.stop()
+        self.juju_patcher.stop()
+
+    def watch(self):
+        # skip logging in
+        return ModelState._watch.__wrapped__(self.state)
+
+    def test_stop_ends_watch_quietly(self):
+        "the error stopping the AllWatcher gives its Next isn't logged"
+        def next_(**kwargs):
+            self.state.stopped.set()
+            raise ServerError('watcher was stopped', {})
+        self.mock_juju.CLIENT.AllWatcher.side_effect = next_
+
+        self.watch()
+        self.assertFalse(self.mock_app.log.exception.called)
+
+    def test_error_while_running_raised(self):
+        "an error while the watcher is meant to be running is raised"
+        self.mock_juju.CLIENT.AllWatcher.side_effect = ServerError('boom', {})
+        with self.assertRaises(ServerError):
+            self.watch()
+
+    def test_handle_exception_after_stop(self):
+        "errors once stopped are only logged at debug level"
+        self.state.stopped.set()
+        self.state._handle_exception(Exception('gone'))
+        self.assertFalse(self.mock_app.log.exception.called)
+
+        self.state.stopped.clear()
+        self.state._handle_exception(Exception('boom'))
+        self.assertTrue(self.mock_app.log.exception.called)
+
+    def test_status_unit_before_application(self):
+        "a unit whose application hasn't been seen yet still gives a " \
+            "FullStatus shaped application"
+        self.state.apply([['unit', 'change',
+                           {'name': 'mysql/0', 'application': 'mysql',
+                            'machine-id': '0',
+                            'workload-status': {'current': 'waiting'}}]])
+        mysql = self.state.status()['applications']['mysql']
+        self.assertEqual({'charm': '', 'exposed': False,
+                          'status': {'status': '', 'info': '',
+                                     'since': None}},
+                         {k: v for k, v in mysql.items() if k != 'units'})
+        self.assertEqual('waiting', mysql['units']['mysql/0'][
+            'workload-status']['status'])
+
+    def test_status_application(self):
+        "applications are in the FullStatus layout"
+        self.state.apply([['application', 'change',
+                           {'name': 'mysql', 'charm-url': 'cs:mysql-1',
+                            'exposed': True,
+                            'status': {'current': 'active',
+                                       'message': 'ready'}}]])
+        mysql = self.state.status()['applications']['mysql']
+        self.assertEqual('cs:mysql-1', mysql['charm'])
+        self.assertTrue(mysql['exposed'])
+        self.assertEqual('active', mysql['status']['status'])
+        self.assertEqual({}, mysql['units'])
+
+
+# Follows the model served at argv[1], then exits without stopping the
+# watcher, as any exit path that doesn't go through the quit key does.
+EXIT_SCRIPT = """
+import logging
+import sys
+from conjureup import juju
+from conjureup.api import watcher
+from conjureup.app_config import app
+from macumba.v2 import JujuClient
+
+app.log = logging.getLogger()
+app.current_controller, app.current_model = 'ctrl', 'mdl'
+juju.CLIENT = JujuClient(sys.argv[1], 'secret')
+juju.CLIENT.login()
+juju.IS_AUTHENTICATED = True
+juju.SESSION_KEY = ('ctrl', 'mdl')
+assert watcher.model_state().synced.wait(5)
+"""
+
+
+class WatcherShutdownTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.model = FakeModel(num_applications=1)
+        self.server = FakeJujuServer(self.model).start()
+        self.client = JujuClient(self.server.url, 'secret')
+        self.client.login()
+
+        self.app_patcher = patch('conjureup.api.watcher.app')
+        self.mock_app = self.app_patcher.start()
+        self.mock_app.current_controller = 'ctrl'
+        self.mock_app.current_model = 'mdl'
+        self.juju_app_patcher = patch('conjureup.juju.app',
+                                      self.mock_app)
+        self.juju_app_patcher.start()
+        self.patchers = [
+            patch.object(juju, 'CLIENT', self.client),
+            patch.object(juju, 'IS_AUTHENTICATED', True),
+            patch.object(juju, 'SESSION_KEY', ('ctrl', 'mdl')),
+            patch.object(watcher, 'MODEL_STATE', None),
+        ]
+        for p in self.patchers:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patchers:
+            p.stop()
+        self.juju_app_patcher.stop()
+        self.app_patcher.stop()
+        self.client.close()
+        self.server.stop()
+
+    def test_shutdown_unblocks_next(self):
+        "shutting down ends a watcher blocked waiting on an idle model"
+        state = watcher.model_state()
+        self.assertTrue(state.synced.wait(5))
+        # give it time to block in the next Next
+        time.sleep(0.2)
+        self.assertTrue(state.running)
+
+        watcher.shutdown()
+        state.future.result(5)
+        self.assertFalse(state.running)
+        self.assertFalse(self.mock_app.log.exception.called)
+
+    def test_exit_with_watcher_running(self):
+        "the process exits while the watcher is blocked in Next"
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        proc = subprocess.run(
+            [sys.executable, '-c', EXIT_SCRIPT, self.server.url], cwd=root,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=20)
+        self.assertEqual(0, proc.returncode, proc.stderr)
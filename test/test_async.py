@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+#
+# tests async.py
+#
+# Copyright 2016 Canonical, Ltd.
+
+
+import unittest
+from threading import Event
+from unittest.mock import MagicMock
+
+from conjureup import async
+
+
+class AsyncLimitTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.release = Event()
+
+    def tearDown(self):
+        self.release.set()
+
+    def blocked(self):
+        self.release.wait(10)
+        return 'blocked'
+
+    def test_waiting_job_holds_no_worker(self):
+        "a job waiting on its limit leaves the worker to other jobs"
+        async.configure_queue('test-limit-workers', 2)
+        async.set_limit('test-limit', 1)
+        first = async.submit(self.blocked, MagicMock(),
+                             queue_name='test-limit-workers',
+                             limit='test-limit')
+        second = async.submit(lambda: 'second', MagicMock(),
+                              queue_name='test-limit-workers',
+                              limit='test-limit')
+        other = async.submit(lambda: 'other', MagicMock(),
+                             queue_name='test-limit-workers')
+
+        self.assertEqual('other', other.result(5))
+        self.assertFalse(second.done())
+        self.release.set()
+        self.assertEqual('blocked', first.result(5))
+        self.assertEqual('second', second.result(5))
+
+    def test_raised_limit_starts_waiting_jobs(self):
+        "raising a limit starts the jobs it held back"
+        async.configure_queue('test-limit-raised', 2)
+        async.set_limit('test-limit-raised', 1)
+        first = async.submit(self.blocked, MagicMock(),
+                             queue_name='test-limit-raised',
+                             limit='test-limit-raised')
+        second = async.submit(lambda: 'second', MagicMock(),
+                              queue_name='test-limit-raised',
+                              limit='test-limit-raised')
+        self.assertFalse(second.done())
+        async.set_limit('test-limit-raised', 2)
+        self.assertEqual('second', second.result(5))
+        self.assertFalse(first.done())
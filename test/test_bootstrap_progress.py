@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+#
+# tests bootstrap_progress.py
+#
+# Copyright 2016 Canonical, Ltd.
+
+
+import unittest
+
+from conjureup.bootstrap_progress import BootstrapProgress
+
+# `juju bootstrap localhost` stderr from juju 2.0.2, with the seconds
+# after the start each line was written
+LXD_BOOTSTRAP = [
+    (0, 'Creating Juju controller "localhost-localhost" on '
+        'localhost/localhost'),
+    (1, 'Looking for packaged Juju agent version 2.0.2 for amd64'),
+    (2, 'To configure your system to better support LXD containers, '
+        'please see: https://github.com/lxc/lxd/blob/master/doc/'
+        'production-setup.md'),
+    (3, 'Launching controller instance(s) on localhost/localhost...'),
+    (5, ' - juju-8b1d59-0 (arch=amd64)'),
+    (6, 'Fetching Juju GUI 2.3.0'),
+    (12, 'Waiting for address'),
+    (15, 'Attempting to connect to 10.0.8.208:22'),
+    (20, 'Logging to /var/log/cloud-init-output.log on the bootstrap '
+         'machine'),
+    (21, 'Running apt-get update'),
+    (40, 'Running apt-get upgrade'),
+    (90, 'Installing curl, cpu-checker, bridge-utils, cloud-utils, tmux'),
+    (100, 'Fetching Juju agent version 2.0.2 for amd64'),
+    (110, 'Installing Juju machine agent'),
+    (111, 'Starting Juju machine agent (service jujud-machine-0)'),
+    (115, 'Bootstrap agent now started'),
+    (116, 'Contacting Juju controller at 10.0.8.208 to verify '
+          'accessibility...'),
+    (130, 'Bootstrap complete, "localhost" controller now available.'),
+    (130, 'Controller machines are in the "controller" model.'),
+    (131, 'Initial model "default" added.'),
+]
+
+
+class FakeClock:
+
+    def __init__(self, t=1000.0):
+        self.t = t
+
+    def __call__(self):
+        return self.t
+
+
+class BootstrapProgressTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.progress = BootstrapProgress(clock=self.clock)
+        self.changes = []
+        self.progress.add_listener(
+            lambda phase, previous: self.changes.append(
+                (phase.name,
+                 previous and (previous[0].name, previous[1]))))
+
+    def feed(self, lines, until=None):
+        for t, line in lines:
+            if until is not None and t > until:
+                break
+            self.clock.t = 1000.0 + t
+            self.progress.feed(line + "\n")
+
+    def test_phases(self):
+        "each phase is picked up from the first line juju prints for it"
+        self.feed(LXD_BOOTSTRAP)
+        self.assertEqual(
+            ['prepare', 'launch', 'connect', 'provision', 'tools', 'agent',
+             'api', 'done'],
+            [phase.name for phase, _ in self.progress.durations()])
+
+    def test_durations(self):
+        "each phase lasts until the next starts"
+        self.feed(LXD_BOOTSTRAP)
+        self.progress.finish()
+        self.assertEqual(
+            [('prepare', 3), ('launch', 9), ('connect', 8),
+             ('provision', 80), ('tools', 11), ('agent', 5), ('api', 14),
+             ('done', 1)],
+            [(phase.name, seconds)
+             for phase, seconds in self.progress.durations()])
+        self.assertEqual(131, self.progress.elapsed())
+
+    def test_current_phase_runs_on(self):
+        "the phase under way lasts until now"
+        self.feed(LXD_BOOTSTRAP, until=40)
+        self.clock.t = 1050.0
+        phase, seconds = self.progress.durations()[-1]
+        self.assertEqual('provision', phase.name)
+        self.assertEqual(30, seconds)
+        self.assertEqual('provision', self.progress.current.name)
+
+    def test_phases_only_move_forward(self):
+        "a line matching an earlier phase is more of the current one"
+        self.feed(LXD_BOOTSTRAP, until=100)
+        self.clock.t = 1110.0
+        self.assertIsNone(self.progress.feed('Installing Juju machine agent'))
+        self.assertEqual('tools', self.progress.current.name)
+
+    def test_listeners(self):
+        "listeners hear of each phase with how long the last one took"
+        self.feed(LXD_BOOTSTRAP, until=15)
+        self.assertEqual([('prepare', None),
+                          ('launch', ('prepare', 3)),
+                          ('connect', ('launch', 9))],
+                         self.changes)
+
+    def test_summary(self):
+        "the summary lists every phase but the last"
+        self.feed(LXD_BOOTSTRAP)
+        self.progress.finish()
+        lines = self.progress.summary().splitlines()
+        self.assertEqual("Bootstrap took 131s", lines[0])
+        self.assertEqual(8, len(lines))
+        self.assertEqual(
+            "Installing packages on the instance", lines[4].split('  ')[1])
+        self.assertTrue(lines[4].endswith(" 80s"))
+
+    def test_output_tail(self):
+        "the last lines of output are kept, blank ones skipped"
+        progress = BootstrapProgress(tail_lines=2, clock=self.clock)
+        for _, line in LXD_BOOTSTRAP[:3]:
+            progress.feed(line)
+            progress.feed("\n")
+        self.assertEqual([LXD_BOOTSTRAP[1][1], LXD_BOOTSTRAP[2][1]],
+                         progress.output())
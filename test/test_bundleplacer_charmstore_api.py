@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+#
+# tests bundleplacer/charmstore_api.py charm resources
+#
+# Copyright 2016 Canonical, Ltd.
+
+
+import unittest
+from unittest.mock import MagicMock, patch
+from urllib.parse import parse_qs, urlparse
+
+from bundleplacer.charmstore_api import MetadataController
+
+CHARMS = {
+    'cs:xenial/mysql-57': {'db': {'Interface': 'mysql'}},
+    'cs:xenial/mysql-58': {'db': {'Interface': 'mysql'}},
+    'cs:xenial/wordpress-5': {},
+}
+
+
+def resources(charm):
+    return [{'Name': 'bin', 'Type': 'file', 'Path': 'bin.tgz',
+             'Revision': int(charm.rsplit('-', 1)[1])}]
+
+
+class FakeCharmStore:
+    """ Answers charm store requests for CHARMS, recording them
+    """
+
+    def __init__(self):
+        # (path, ids) of each request
+        self.requests = []
+        self.fail_resources = False
+
+    def get(self, url):
+        u = urlparse(url)
+        ids = parse_qs(u.query).get('id', [])
+        self.requests.append((u.path, ids))
+        r = MagicMock(ok=True)
+        if u.path.endswith('/readme'):
+            r.text = "readme"
+        elif 'charm-metadata' in u.query:
+            metas = {}
+            for i in ids:
+                latest = max(c for c in CHARMS if c.startswith(i + '-'))
+                metas[i] = {'Id': latest,
+                            'Meta': {'charm-metadata': {
+                                'Provides': CHARMS[latest]},
+                                'charm-config': {}}}
+            r.json.return_value = metas
+        elif u.path == '/charmstore/v5/meta/any':
+            r.ok = not self.fail_resources
+            r.json.return_value = {
+                i: {'Id': i, 'Meta': {'resources': resources(i)}}
+                for i in ids if i in CHARMS}
+        return r
+
+    def resource_requests(self):
+        return [ids for path, ids in self.requests
+                if path == '/charmstore/v5/meta/any']
+
+
+class ResourcesTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.store = FakeCharmStore()
+        self.requests_patcher = patch(
+            'bundleplacer.charmstore_api.requests')
+        mock_requests = self.requests_patcher.start()
+        mock_requests.get.side_effect = self.store.get
+        # readmes are fetched in the background, not needed here
+        self.submit_patcher = patch('bundleplacer.charmstore_api.submit')
+        self.submit_patcher.start()
+
+        config = MagicMock()
+        config.getopt.return_value = None
+        self.mc = MetadataController(MagicMock(charm_ids=[]), config)
+
+    def tearDown(self):
+        self.requests_patcher.stop()
+        self.submit_patcher.stop()
+
+    def test_prefetch(self):
+        "loading metadata fetches the resources of all its charms at once"
+        self.mc._do_load(['cs:xenial/mysql-57', 'cs:xenial/wordpress'])
+        # the charm without a revision gets the latest one's
+        self.assertEqual([['cs:xenial/mysql-57', 'cs:xenial/wordpress-5']],
+                         self.store.resource_requests())
+
+        self.assertEqual([dict(resources('cs:xenial/mysql-57')[0],
+                               Origin='store')],
+                         self.mc.get_resources('cs:xenial/mysql-57'))
+        self.mc.get_resources('cs:xenial/wordpress-5')
+        self.assertEqual(1, len(self.store.resource_requests()))
+
+    def test_cache_by_revision(self):
+        "another revision of a cached charm is fetched, then cached too"
+        self.mc._do_load(['cs:xenial/mysql-57'])
+        mysql_58 = self.mc.get_resources('cs:xenial/mysql-58')
+        self.assertEqual(58, mysql_58[0]['Revision'])
+        self.assertEqual(57, self.mc.get_resources(
+            'cs:xenial/mysql-57')[0]['Revision'])
+        self.mc.get_resources('cs:xenial/mysql-58')
+        self.assertEqual([['cs:xenial/mysql-57'], ['cs:xenial/mysql-58']],
+                         self.store.resource_requests())
+
+    def test_returns_copy(self):
+        "changing returned resources doesn't change the cache"
+        self.mc.get_resources('cs:xenial/mysql-57')[0]['Revision'] = 0
+        self.assertEqual(57, self.mc.get_resources(
+            'cs:xenial/mysql-57')[0]['Revision'])
+
+    def test_load_only_missing(self):
+        "load_resources only asks for the charms not cached yet"
+        self.mc.load_resources(['cs:xenial/mysql-57'])
+        self.mc.load_resources(['cs:xenial/mysql-57',
+                                'cs:xenial/wordpress-5'])
+        self.mc.load_resources(['cs:xenial/wordpress-5'])
+        self.assertEqual([['cs:xenial/mysql-57'], ['cs:xenial/wordpress-5']],
+                         self.store.resource_requests())
+
+    def test_fallback_after_failed_prefetch(self):
+        "when the bulk request fails each charm is fetched on its own"
+        self.store.fail_resources = True
+        self.mc._do_load(['cs:xenial/mysql-57', 'cs:xenial/wordpress-5'])
+        self.assertIn('cs:xenial/mysql', self.mc.charm_info)
+
+        self.store.fail_resources = False
+        self.assertEqual(57, self.mc.get_resources(
+            'cs:xenial/mysql-57')[0]['Revision'])
+        self.assertEqual(5, self.mc.get_resources(
+            'cs:xenial/wordpress-5')[0]['Revision'])
+        self.assertEqual([['cs:xenial/mysql-57', 'cs:xenial/wordpress-5'],
+                          ['cs:xenial/mysql-57'],
+                          ['cs:xenial/wordpress-5']],
+                         self.store.resource_requests())
+
+    def test_unknown_charm(self):
+        "a charm the store has no resources for raises"
+        with self.assertRaises(Exception):
+            self.mc.get_resources('cs:xenial/unknown-1')
+        self.store.fail_resources = True
+        with self.assertRaises(Exception):
+            self.mc.get_resources('cs:xenial/mysql-57')
@@ -73,6 +73,7 @@ class CloudsTUIFinishTestCase(unittest.TestCase):
             'conjureup.controllers.clouds.tui.app')
         self.mock_app = self.app_patcher.start()
         self.mock_app.ui = MagicMock(name="app.ui")
+        self.mock_app.argv.model = None
         self.juju_patcher = patch(
             'conjureup.controllers.clouds.tui.juju')
         self.mock_juju = self.juju_patcher.start()
@@ -97,6 +98,18 @@ class CloudsTUIFinishTestCase(unittest.TestCase):
         self.mock_juju.assert_has_calls([
             call.add_model(ANY, 'testcontroller')])
 
+    def test_finish_w_model(self):
+        "clouds.finish with an existing model deploys into it"
+        self.mock_gcc.return_value = 'testcontroller'
+        self.mock_app.argv.controller = None
+        self.mock_app.argv.model = 'testmodel'
+        self.controller.finish()
+        self.assertEqual(self.mock_app.current_model, 'testmodel')
+        self.assertTrue(self.mock_app.reconcile)
+        self.assertFalse(self.mock_juju.add_model.called)
+        self.mock_controllers.use.assert_has_calls([
+            call('deploy'), call().render()])
+
     def test_finish_no_controller(self):
         "clouds.finish without existing controller"
         self.mock_gcc.return_value = None
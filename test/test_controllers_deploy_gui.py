@@ -28,21 +28,18 @@ class DeployGUIRenderTestCase(unittest.TestCase):
             'conjureup.controllers.deploy.gui.DeployController.finish')
         self.mock_finish = self.finish_patcher.start()
 
-        self.submit_patcher = patch(
-            'conjureup.controllers.deploy.gui.async.submit')
-        self.mock_submit = self.submit_patcher.start()
-
         self.predeploy_call = call(self.controller._pre_deploy_exec, ANY,
-                                   queue_name=sentinel.JUJU_ASYNC_QUEUE)
+                                   setup=True)
 
         self.view_patcher = patch(
             'conjureup.controllers.deploy.gui.ApplicationListView')
         self.view_patcher.start()
         self.app_patcher = patch(
             'conjureup.controllers.deploy.gui.app')
-        mock_app = self.app_patcher.start()
-        mock_app.ui = MagicMock(name="app.ui")
-        mock_app.metadata_controller.bundle = self.mock_bundle
+        self.mock_app = self.app_patcher.start()
+        self.mock_app.ui = MagicMock(name="app.ui")
+        self.mock_app.metadata_controller.bundle = self.mock_bundle
+        self.mock_app.reconcile = False
 
         self.juju_patcher = patch(
             'conjureup.controllers.deploy.gui.juju')
@@ -53,29 +50,49 @@ class DeployGUIRenderTestCase(unittest.TestCase):
             'conjureup.controllers.deploy.gui.track_screen')
         self.mock_track_screen = self.track_screen_patcher.start()
 
+        self.journal_patcher = patch(
+            'conjureup.controllers.deploy.gui.journal')
+        self.mock_journal = self.journal_patcher.start()
+
     def tearDown(self):
         self.utils_patcher.stop()
         self.finish_patcher.stop()
-        self.submit_patcher.stop()
         self.view_patcher.stop()
         self.app_patcher.stop()
         self.juju_patcher.stop()
         self.track_screen_patcher.stop()
+        self.journal_patcher.stop()
 
     def test_queue_predeploy_once(self):
         "Call submit to schedule predeploy if we haven't yet"
         self.controller.render()
-        self.mock_submit.assert_has_calls([self.predeploy_call],
-                                          any_order=True)
+        self.mock_juju.submit.assert_has_calls([self.predeploy_call],
+                                               any_order=True)
 
     def test_call_add_machines_once_only(self):
         "Call add_machines once"
         self.controller.render()
-        self.mock_submit.assert_has_calls([self.predeploy_call],
-                                          any_order=True)
+        self.mock_juju.submit.assert_has_calls([self.predeploy_call],
+                                               any_order=True)
         self.mock_juju.add_machines.assert_called_once_with(
             [sentinel.machine_1], exc_cb=ANY)
 
+    def test_render_starts_journal(self):
+        "Rendering journals the deployment to the current model"
+        self.controller.render()
+        self.mock_journal.begin.assert_called_once_with(
+            self.mock_app.current_controller, self.mock_app.current_model)
+
+    def test_render_reconcile(self):
+        "Existing models get what they lack without the application list"
+        self.mock_app.reconcile = True
+        with patch('conjureup.controllers.deploy.gui.reconcile') as \
+                mock_reconcile:
+            self.controller.render()
+            mock_reconcile.reconcile.assert_called_once_with(
+                [self.mock_service_1], [sentinel.machine_1], ANY, ANY)
+        self.assertFalse(self.mock_juju.add_machines.called)
+
 
 class DeployGUIFinishTestCase(unittest.TestCase):
 
@@ -120,6 +137,22 @@ class DeployGUIFinishTestCase(unittest.TestCase):
                          [call.use('bootstrapwait'),
                           call.use().render()])
 
+    def test_deploy_remaining_in_bulk(self):
+        "Deploy all remaining applications with one deploy_services call"
+        self.controller.undeployed_applications = [sentinel.app_1,
+                                                   sentinel.app_2]
+        self.controller.do_deploy_remaining()
+        self.mock_juju.deploy_services.assert_called_once_with(
+            [sentinel.app_1, sentinel.app_2], ANY, ANY, ANY)
+        self.assertEqual(self.controller.undeployed_applications, [])
+
+    def test_deploy_sets_ready_relations(self):
+        "Deploying an application sets relations with deployed ones"
+        self.controller.undeployed_applications = [sentinel.app_1]
+        self.controller.do_deploy(sentinel.app_1, MagicMock())
+        self.mock_juju.set_relations.assert_called_once_with(
+            [sentinel.app_1], exc_cb=ANY, ready_only=True)
+
     def test_skip_bootstrap_wait(self):
         "Go directly to deploystatus if bootstrap is done"
         self.controller.finish()
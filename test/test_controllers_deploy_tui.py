@@ -28,6 +28,7 @@ class DeployTUIRenderTestCase(unittest.TestCase):
             'conjureup.controllers.deploy.tui.app')
         mock_app = self.app_patcher.start()
         mock_app.ui = MagicMock(name="app.ui")
+        mock_app.reconcile = False
 
         self.mock_bundle = MagicMock(name="bundle")
         self.mock_bundle.machines = {"1": sentinel.machine_1}
@@ -40,11 +41,16 @@ class DeployTUIRenderTestCase(unittest.TestCase):
         self.mock_juju = self.juju_patcher.start()
         self.mock_juju.JUJU_ASYNC_QUEUE = sentinel.JUJU_ASYNC_QUEUE
 
+        self.journal_patcher = patch(
+            'conjureup.controllers.deploy.tui.journal')
+        self.mock_journal = self.journal_patcher.start()
+
     def tearDown(self):
         self.utils_patcher.stop()
         self.finish_patcher.stop()
         self.app_patcher.stop()
         self.juju_patcher.stop()
+        self.journal_patcher.stop()
 
     def test_render(self):
         "call render"
@@ -74,6 +80,7 @@ class DeployTUIFinishTestCase(unittest.TestCase):
             'conjureup.controllers.deploy.tui.app')
         self.mock_app = self.app_patcher.start()
         self.mock_app.ui = MagicMock(name="app.ui")
+        self.mock_app.reconcile = False
         self.juju_patcher = patch(
             'conjureup.controllers.deploy.tui.juju')
         self.mock_juju = self.juju_patcher.start()
@@ -83,6 +90,10 @@ class DeployTUIFinishTestCase(unittest.TestCase):
             'conjureup.controllers.deploy.tui.concurrent')
         self.mock_concurrent = self.concurrent_patcher.start()
 
+        self.reconcile_patcher = patch(
+            'conjureup.controllers.deploy.tui.reconcile')
+        self.mock_reconcile = self.reconcile_patcher.start()
+
     def tearDown(self):
         self.controllers_patcher.stop()
         self.utils_patcher.stop()
@@ -90,7 +101,27 @@ class DeployTUIFinishTestCase(unittest.TestCase):
         self.app_patcher.stop()
         self.juju_patcher.stop()
         self.concurrent_patcher.stop()
+        self.reconcile_patcher.stop()
 
     def test_finish(self):
         "call finish"
         self.controller.finish()
+
+    def test_finish_deploys_in_bulk(self):
+        "finish deploys every application with one deploy_services call"
+        self.controller.applications = [sentinel.app_1, sentinel.app_2]
+        self.controller.finish()
+        self.mock_juju.deploy_services.assert_called_once_with(
+            [sentinel.app_1, sentinel.app_2], ANY, ANY, ANY)
+        self.assertFalse(self.mock_juju.deploy_service.called)
+
+    def test_finish_reconcile(self):
+        "finish into an existing model only deploys what it lacks"
+        self.mock_app.reconcile = True
+        self.controller.applications = [sentinel.app_1, sentinel.app_2]
+        self.controller.finish()
+        self.mock_reconcile.reconcile.assert_called_once_with(
+            [sentinel.app_1, sentinel.app_2], ANY, ANY, ANY)
+        self.assertFalse(self.mock_juju.deploy_services.called)
+        self.mock_juju.set_relations.assert_called_once_with(
+            [sentinel.app_1, sentinel.app_2], ANY, ANY)
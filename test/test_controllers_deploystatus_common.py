@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+#
+# tests controllers/deploystatus/common.py
+#
+# Copyright 2016 Canonical, Ltd.
+
+
+import json
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from conjureup.controllers.deploystatus import common
+
+
+def deploy_done(complete):
+    sh = MagicMock(returncode=0)
+    sh.stdout = json.dumps({'returnCode': 0,
+                            'isComplete': complete,
+                            'message': 'waiting'}).encode('utf8')
+    return sh
+
+
+class FakeModelState:
+    """ Stands in for the watcher's ModelState, changes are emitted by hand
+    """
+
+    def __init__(self):
+        self.subscribers = []
+
+    def subscribe(self, cb):
+        self.subscribers.append(cb)
+
+    def unsubscribe(self, cb):
+        self.subscribers.remove(cb)
+
+    def emit(self, changes=(('unit', 'change', 'mysql/0'),)):
+        for cb in list(self.subscribers):
+            cb(list(changes))
+
+    def emit_later(self, delay):
+        t = threading.Timer(delay, self.emit)
+        t.daemon = True
+        t.start()
+
+
+class ModelChangesTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.settle_patcher = patch.object(common, 'SETTLE', 0.05)
+        self.settle_patcher.start()
+        self.settle_max_patcher = patch.object(common, 'SETTLE_MAX', 0.3)
+        self.settle_max_patcher.start()
+        self.model = FakeModelState()
+        self.changes = common.ModelChanges()
+        self.model.subscribe(self.changes)
+
+    def tearDown(self):
+        self.settle_patcher.stop()
+        self.settle_max_patcher.stop()
+
+    def test_no_change(self):
+        "waiting on a quiet model times out"
+        started = time.time()
+        self.assertFalse(self.changes.wait(0.1))
+        self.assertGreaterEqual(time.time() - started, 0.1)
+
+    def test_change_settles(self):
+        "a change is reported once the model has been quiet for a while"
+        self.model.emit_later(0.05)
+        started = time.time()
+        self.assertTrue(self.changes.wait(5))
+        self.assertAlmostEqual(0.1, time.time() - started, delta=0.05)
+
+    def test_stream_of_changes(self):
+        "a model that keeps changing is reported after SETTLE_MAX"
+        stop = threading.Event()
+
+        def keep_changing():
+            while not stop.wait(0.01):
+                self.model.emit()
+        threading.Thread(target=keep_changing, daemon=True).start()
+        try:
+            started = time.time()
+            self.assertTrue(self.changes.wait(5))
+            self.assertAlmostEqual(0.3, time.time() - started, delta=0.1)
+        finally:
+            stop.set()
+
+
+class WaitForApplicationsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.os_patcher = patch(
+            'conjureup.controllers.deploystatus.common.os')
+        mock_os = self.os_patcher.start()
+        mock_os.path.isfile.return_value = True
+        mock_os.access.return_value = True
+
+        self.utils_patcher = patch(
+            'conjureup.controllers.deploystatus.common.utils')
+        self.mock_utils = self.utils_patcher.start()
+        self.mock_utils.run_script.side_effect = \
+            [deploy_done(False)] * 5 + [deploy_done(True)]
+
+        self.app_patcher = patch(
+            'conjureup.controllers.deploystatus.common.app')
+        self.mock_app = self.app_patcher.start()
+        self.mock_app.argv.deploy_wait_ceiling = None
+
+        self.model = FakeModelState()
+        self.watcher_patcher = patch(
+            'conjureup.controllers.deploystatus.common.watcher')
+        mock_watcher = self.watcher_patcher.start()
+        mock_watcher.model_state.return_value = self.model
+
+        self.report_patcher = patch(
+            'conjureup.controllers.deploystatus.common._report')
+        self.mock_report = self.report_patcher.start()
+
+        self.patchers = [patch.object(common, 'GAP_INITIAL', 0.1),
+                         patch.object(common, 'WAIT_CEILING', 0.8),
+                         patch.object(common, 'SETTLE', 0.05)]
+        for p in self.patchers:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patchers:
+            p.stop()
+        self.os_patcher.stop()
+        self.utils_patcher.stop()
+        self.app_patcher.stop()
+        self.watcher_patcher.stop()
+        self.report_patcher.stop()
+
+    def checks(self):
+        "(seconds waited, why) before each run"
+        return [c[:2] for c in self.mock_report.call_args[0][1]]
+
+    def test_quiet_model_backs_off(self):
+        "on a model that doesn't change the wait doubles up to the ceiling"
+        common.wait_for_applications('00_deploy-done', MagicMock())
+        checks = self.checks()
+        self.assertEqual(['start'] + ['timeout'] * 5,
+                         [why for _, why in checks])
+        for expected, (waited, _) in zip([0, .1, .2, .4, .8, .8], checks):
+            self.assertAlmostEqual(expected, waited, delta=0.05)
+        self.assertEqual([], self.model.subscribers)
+
+    def test_change_runs_again(self):
+        "a change is acted on once settled, without waiting out the gap"
+        self.mock_app.argv.deploy_wait_ceiling = 5
+        runs = [deploy_done(False)] * 3 + [deploy_done(True)]
+
+        def run(script):
+            if len(runs) > 1:
+                self.model.emit_later(0.05)
+            return runs.pop(0)
+        self.mock_utils.run_script.side_effect = run
+
+        started = time.time()
+        common.wait_for_applications('00_deploy-done', MagicMock())
+        checks = self.checks()
+        self.assertEqual(['start', 'change', 'change', 'change'],
+                         [why for _, why in checks])
+        # each rerun waits out the change settling, at least GAP_INITIAL
+        # after the last run, well short of a backed off gap
+        for waited, _ in checks[1:]:
+            self.assertAlmostEqual(0.1, waited, delta=0.05)
+        self.assertLess(time.time() - started, 1)
+
+    def test_change_resets_backoff(self):
+        "the wait goes back to the start once the model changes"
+        calls = []
+
+        def run(script):
+            calls.append(script)
+            if len(calls) == 4:
+                # during the fourth, 0.4s wait
+                self.model.emit_later(0.05)
+            return deploy_done(len(calls) == 6)
+        self.mock_utils.run_script.side_effect = run
+
+        common.wait_for_applications('00_deploy-done', MagicMock())
+        checks = self.checks()
+        self.assertEqual(['start', 'timeout', 'timeout', 'timeout', 'change',
+                          'timeout'],
+                         [why for _, why in checks])
+        self.assertAlmostEqual(0.1, checks[4][0], delta=0.05)
+        self.assertAlmostEqual(0.1, checks[5][0], delta=0.05)
+
+
+class PollTestCase(unittest.TestCase):
+    "without a live model state"
+
+    def setUp(self):
+        self.os_patcher = patch(
+            'conjureup.controllers.deploystatus.common.os')
+        mock_os = self.os_patcher.start()
+        mock_os.path.isfile.return_value = True
+        mock_os.access.return_value = True
+
+        self.utils_patcher = patch(
+            'conjureup.controllers.deploystatus.common.utils')
+        self.mock_utils = self.utils_patcher.start()
+        self.mock_utils.run_script.side_effect = \
+            [deploy_done(False)] * 5 + [deploy_done(True)]
+
+        self.app_patcher = patch(
+            'conjureup.controllers.deploystatus.common.app')
+        self.mock_app = self.app_patcher.start()
+        self.mock_app.argv.deploy_wait_ceiling = None
+
+        self.sleep_patcher = patch('conjureup.async.sleep_until')
+        self.mock_sleep = self.sleep_patcher.start()
+
+        self.subscribe_patcher = patch(
+            'conjureup.controllers.deploystatus.common._subscribe')
+        self.subscribe_patcher.start().return_value = None
+
+    def tearDown(self):
+        self.os_patcher.stop()
+        self.utils_patcher.stop()
+        self.app_patcher.stop()
+        self.sleep_patcher.stop()
+        self.subscribe_patcher.stop()
+
+    def gaps(self):
+        return [round(c[0][0]) for c in self.mock_sleep.call_args_list]
+
+    def test_poll(self):
+        "the gap backs off to no more than the old fixed interval"
+        common.wait_for_applications('00_deploy-done', MagicMock())
+        self.assertEqual(6, self.mock_utils.run_script.call_count)
+        self.assertEqual([1, 2, 4, 5, 5], self.gaps())
+
+    def test_ceiling(self):
+        "--deploy-wait-ceiling caps the gap between runs"
+        self.mock_app.argv.deploy_wait_ceiling = 3
+        common.wait_for_applications('00_deploy-done', MagicMock())
+        self.assertEqual([1, 2, 3, 3, 3], self.gaps())
@@ -31,6 +31,12 @@ class DeployStatusGUIRenderTestCase(unittest.TestCase):
         self.eventloop_patcher = patch(
             'conjureup.controllers.deploystatus.gui.EventLoop')
         self.mock_eventloop = self.eventloop_patcher.start()
+        self.model_state_patcher = patch(
+            'conjureup.controllers.deploystatus.gui.model_state')
+        self.mock_model_state = self.model_state_patcher.start()
+        self.unithistory_patcher = patch(
+            'conjureup.controllers.deploystatus.gui.unithistory')
+        self.mock_unithistory = self.unithistory_patcher.start()
 
         self.controller = DeployStatusController()
         self.track_screen_patcher = patch(
@@ -42,12 +48,24 @@ class DeployStatusGUIRenderTestCase(unittest.TestCase):
         self.view_patcher.stop()
         self.app_patcher.stop()
         self.eventloop_patcher.stop()
+        self.model_state_patcher.stop()
+        self.unithistory_patcher.stop()
         self.track_screen_patcher.stop()
 
     def test_render(self):
         "call render"
         self.controller.render()
 
+    def test_render_subscribes_to_model_state(self):
+        "render follows the live model state"
+        self.controller.render()
+        self.assertTrue(self.mock_model_state().subscribe.called)
+
+    def test_render_records_unit_history(self):
+        "render starts recording unit status history"
+        self.controller.render()
+        self.assertTrue(self.mock_unithistory.start.called)
+
 
 class DeployStatusGUIFinishTestCase(unittest.TestCase):
 
@@ -65,6 +83,9 @@ class DeployStatusGUIFinishTestCase(unittest.TestCase):
             'conjureup.controllers.deploystatus.gui.app')
         self.mock_app = self.app_patcher.start()
         self.mock_app.ui = MagicMock(name="app.ui")
+        self.unithistory_patcher = patch(
+            'conjureup.controllers.deploystatus.gui.unithistory')
+        self.mock_unithistory = self.unithistory_patcher.start()
 
         self.controller = DeployStatusController()
 
@@ -76,6 +97,7 @@ class DeployStatusGUIFinishTestCase(unittest.TestCase):
         self.controllers_patcher.stop()
         self.render_patcher.stop()
         self.app_patcher.stop()
+        self.unithistory_patcher.stop()
         self.track_screen_patcher.stop()
 
     def test_finish_ok(self):
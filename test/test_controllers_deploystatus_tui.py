@@ -5,10 +5,13 @@
 # Copyright 2016 Canonical, Ltd.
 
 
+import time
 import unittest
+from concurrent.futures import Future
 #  from unittest.mock import ANY, call, MagicMock, patch, sentinel
 from unittest.mock import MagicMock, patch
 
+from conjureup import juju
 from conjureup.controllers.deploystatus.tui import DeployStatusController
 
 
@@ -27,8 +30,13 @@ class DeployStatusTUIRenderTestCase(unittest.TestCase):
 
         self.app_patcher = patch(
             'conjureup.controllers.deploystatus.tui.app')
-        mock_app = self.app_patcher.start()
-        mock_app.ui = MagicMock(name="app.ui")
+        self.mock_app = self.app_patcher.start()
+        self.mock_app.ui = MagicMock(name="app.ui")
+        self.mock_app.argv.status_stream = None
+
+        self.statusstream_patcher = patch(
+            'conjureup.controllers.deploystatus.tui.statusstream')
+        self.mock_statusstream = self.statusstream_patcher.start()
 
         self.controller = DeployStatusController()
 
@@ -36,10 +44,39 @@ class DeployStatusTUIRenderTestCase(unittest.TestCase):
         self.utils_patcher.stop()
         self.finish_patcher.stop()
         self.app_patcher.stop()
+        self.statusstream_patcher.stop()
 
     def test_render(self):
         "call render"
         self.controller.render()
+        self.assertFalse(self.mock_statusstream.start.called)
+
+    def test_render_waits_for_deploys(self):
+        "deploy-done isn't run before the deploys and relations are done"
+        deployed, related = Future(), Future()
+        with patch.object(juju, 'DEPLOY_FUTURES', {'mysql': deployed}), \
+                patch.object(juju, 'RELATION_FUTURES',
+                             {frozenset(('a:db', 'b:db')): related}), \
+                patch('conjureup.controllers.deploystatus.common.'
+                      'wait_for_applications') as mock_wait:
+            self.controller.render()
+            deployed.set_result('mysql')
+            time.sleep(0.1)
+            self.assertFalse(mock_wait.called)
+            related.set_result(None)
+            for _ in range(50):
+                if self.mock_finish.called:
+                    break
+                time.sleep(0.1)
+            self.assertTrue(mock_wait.called)
+
+    def test_render_status_stream(self):
+        "render streams unit status changes when asked to"
+        self.mock_app.argv.status_stream = '-'
+        self.mock_app.argv.status_stream_throttle = 0
+        self.mock_app.argv.status_stream_detail = 'status'
+        self.controller.render()
+        self.mock_statusstream.start.assert_called_once_with('-', 0, 'status')
 
 
 class DeployStatusTUIFinishTestCase(unittest.TestCase):
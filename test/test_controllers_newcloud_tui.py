@@ -7,7 +7,7 @@
 
 import unittest
 #  from unittest.mock import ANY, call, MagicMock, patch
-from unittest.mock import MagicMock, patch, sentinel
+from unittest.mock import ANY, MagicMock, call, patch, sentinel
 
 from conjureup.controllers.newcloud.tui import NewCloudController
 
@@ -72,6 +72,18 @@ class NewCloudTUIRenderTestCase(unittest.TestCase):
         self.controller.do_post_bootstrap.assert_called_once_with()
         self.mock_finish.assert_called_once_with()
 
+    def test_render_prepares_deploys(self):
+        "Deploys are prepared before bootstrapping"
+        self.mock_common.try_get_creds.return_value = True
+        self.mock_juju.bootstrap.return_value.returncode = 0
+        self.controller.render('localhost')
+        services = self.mock_app.metadata_controller.bundle.services
+        self.assertEqual(self.mock_juju.mock_calls[:2],
+                         [call.prepare_deploys(services),
+                          call.bootstrap(controller=ANY,
+                                         cloud='localhost',
+                                         credential=True)])
+
 
 class NewCloudTUIFinishTestCase(unittest.TestCase):
 
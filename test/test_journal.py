@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+#
+# tests journal.py
+#
+# Copyright 2016 Canonical, Ltd.
+
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from conjureup import journal
+from conjureup.controllers.steps.common import do_step
+
+
+class JournalResumeTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        # the spell dir is replaced on every start, the journal must not
+        # live there
+        self.spell_dir = tempfile.mkdtemp()
+
+        self.app_patcher = patch('conjureup.journal.app')
+        self.mock_app = self.app_patcher.start()
+        self.mock_app.argv.cache_dir = self.cache_dir
+        self.mock_app.config = {'spell': 'me/my-spell',
+                                'spell-dir': self.spell_dir}
+
+        self.common_app_patcher = patch(
+            'conjureup.controllers.steps.common.app')
+        self.mock_common_app = self.common_app_patcher.start()
+        self.model_info_patcher = patch(
+            'conjureup.controllers.steps.common.model_info')
+        self.model_info_patcher.start()
+        self.utils_patcher = patch(
+            'conjureup.controllers.steps.common.utils')
+        self.mock_utils = self.utils_patcher.start()
+
+        self.path_patcher = patch.object(journal, 'PATH', None)
+        self.path_patcher.start()
+        self.resumed_patcher = patch.object(journal, 'RESUMED', [])
+        self.resumed_patcher.start()
+
+    def tearDown(self):
+        self.app_patcher.stop()
+        self.common_app_patcher.stop()
+        self.model_info_patcher.stop()
+        self.utils_patcher.stop()
+        self.path_patcher.stop()
+        self.resumed_patcher.stop()
+        shutil.rmtree(self.cache_dir)
+        shutil.rmtree(self.spell_dir)
+
+    def restart(self):
+        "what a new conjure-up process starts with"
+        journal.PATH = None
+        journal.RESUMED = []
+        shutil.rmtree(self.spell_dir)
+        os.mkdir(self.spell_dir)
+
+    def test_journal_survives_restart(self):
+        "the journal is read back after the spell dir is replaced"
+        journal.start('ctrl', 'mdl')
+        journal.record('step', name='step-01_configure', result='Done')
+        self.restart()
+
+        entries = journal.load()
+        self.assertEqual(('ctrl', 'mdl'), journal.session(entries))
+        journal.start('ctrl', 'mdl', resumed=entries)
+        self.assertEqual('Done', journal.step_result('step-01_configure'))
+        self.assertEqual(None, journal.step_result('step-02_finish'))
+
+    def test_damaged_line_skipped(self):
+        "a last line cut short by a crash doesn't hide later entries"
+        journal.start('ctrl', 'mdl')
+        with open(journal.journal_path(), 'a') as f:
+            f.write('{"op": "st')
+        self.restart()
+
+        journal.start('ctrl', 'mdl', resumed=journal.load())
+        journal.record('step', name='step-01_configure', result='Done')
+        ops = [e['op'] for e in journal.load()]
+        self.assertEqual(['start', 'start', 'step'], ops)
+
+    def test_do_step_skips_finished_step(self):
+        "a step the resumed run finished isn't run again"
+        journal.start('ctrl', 'mdl')
+        journal.record('step', name='step-01_configure', result='Done')
+        self.restart()
+        journal.start('ctrl', 'mdl', resumed=journal.load())
+
+        step_model = MagicMock(path='/spell/steps/step-01_configure',
+                               additional_input=[])
+        step_model.title = "Configure"
+        message_cb = MagicMock()
+        do_step(step_model, None, message_cb)
+
+        self.assertFalse(self.mock_utils.run_script.called)
+        self.assertEqual('Done', step_model.result)
+        message_cb.assert_called_once_with("Configure already completed.")
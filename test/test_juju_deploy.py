@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+#
+# tests juju.py deploys and relations against the fake Juju server
+#
+# Copyright 2016 Canonical, Ltd.
+
+
+import unittest
+from collections import defaultdict
+from concurrent.futures import Future
+from unittest.mock import MagicMock, patch
+
+from conjureup import juju
+from macumba.fakeserver import FakeJujuServer, FakeModel
+from macumba.v2 import JujuClient
+
+
+def service(name, relations=()):
+    s = MagicMock(name=name)
+    s.service_name = name
+    s.expose = False
+    s.relations = list(relations)
+    return s
+
+
+def plan_future(s):
+    f = Future()
+    f.set_result(juju.DeployPlan(s, 'cs:xenial/{}-1'.format(s.service_name),
+                                 []))
+    return f
+
+
+def deploy_args(s):
+    return {'application': s.service_name,
+            'charm-url': 'cs:xenial/{}-1'.format(s.service_name),
+            'num-units': 1}
+
+
+class JujuDeployRelationsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.model = FakeModel()
+        # deploying "bad" fails, it's already there
+        self.model.deploy({'application': 'bad'})
+        self.server = FakeJujuServer(self.model).start()
+        self.client = JujuClient(self.server.url, 'secret')
+        self.client.login()
+
+        self.app_patcher = patch('conjureup.juju.app')
+        mock_app = self.app_patcher.start()
+        mock_app.current_controller = 'ctrl'
+        mock_app.current_model = 'mdl'
+
+        self.patchers = [
+            patch.object(juju, 'CLIENT', self.client),
+            patch.object(juju, 'IS_AUTHENTICATED', True),
+            patch.object(juju, 'SESSION_KEY', ('ctrl', 'mdl')),
+            patch.object(juju, 'SETUP_FUTURES', defaultdict(list)),
+            patch.object(juju, 'DEPLOY_FUTURES', {}),
+            patch.object(juju, 'RELATION_FUTURES', {}),
+            patch.object(juju, 'prepare_deploys',
+                         lambda services: [plan_future(s)
+                                           for s in services]),
+            patch.object(juju, '_deploy_args', deploy_args),
+        ]
+        for p in self.patchers:
+            p.start()
+
+        self.services = [service('a', [('a:db', 'b:db'),
+                                       ('a:log', 'bad:log')]),
+                         service('b', [('b:db', 'a:db')]),
+                         service('bad')]
+
+    def tearDown(self):
+        for p in self.patchers:
+            p.stop()
+        self.app_patcher.stop()
+        self.client.close()
+        self.server.stop()
+
+    def test_failed_application_only_fails_its_relations(self):
+        "a failed deploy doesn't stop relations between the others"
+        deploy_exc_cb = MagicMock()
+        deployed = juju.deploy_services(self.services, 'xenial',
+                                        exc_cb=deploy_exc_cb)
+        relations = juju.set_relations(self.services, exc_cb=MagicMock())
+
+        with self.assertRaises(juju.DeploymentError):
+            deployed.result(10)
+        with self.assertRaises(juju.RelationError) as cm:
+            relations.result(10)
+
+        self.assertEqual([('a:log', 'bad:log')], list(cm.exception.errors))
+        self.assertIn('a:db b:db', self.model.relations)
+        self.assertEqual('a', juju.DEPLOY_FUTURES['a'].result())
+        self.assertIsNotNone(juju.DEPLOY_FUTURES['bad'].exception())
+
+    def test_failed_relation_retried(self):
+        "a relation that failed is tried again by a later set_relations"
+        juju.deploy_services(self.services, 'xenial', exc_cb=MagicMock())
+        first = juju.set_relations(self.services, exc_cb=MagicMock())
+        self.assertIsNotNone(first.exception(10))
+        failed = frozenset(('a:log', 'bad:log'))
+        self.assertNotIn(failed, juju.RELATION_FUTURES)
+        self.assertIn(frozenset(('a:db', 'b:db')), juju.RELATION_FUTURES)
+
+        # "bad" gets deployed by another run
+        juju.mark_deployed('bad')
+        self.model.add_unit('bad')
+        second = juju.set_relations(self.services, exc_cb=MagicMock())
+        self.assertEqual([('a:db', 'b:db'), ('a:log', 'bad:log')],
+                         second.result(10))
+        self.assertIn('a:log bad:log', self.model.relations)
+
+    def test_short_deploy_results(self):
+        "applications Deploy returns no result for are failed, not " \
+            "taken as deployed"
+        application = self.client.Application
+
+        def short_results(request, params=None):
+            rv = application(request=request, params=params)
+            if request == "Deploy":
+                rv['results'] = rv['results'][:1]
+            return rv
+
+        services = self.services[:2]
+        with patch.object(self.client, 'Application', short_results):
+            deployed = juju.deploy_services(services, 'xenial',
+                                            exc_cb=MagicMock())
+            with self.assertRaises(juju.DeploymentError) as cm:
+                deployed.result(10)
+
+        self.assertEqual(['b'], list(cm.exception.errors))
+        self.assertEqual('a', juju.DEPLOY_FUTURES['a'].result())
+        self.assertIsInstance(juju.DEPLOY_FUTURES['b'].exception(),
+                              juju.DeploymentError)
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+#
+# tests jujudata.py
+#
+# Copyright 2016 Canonical, Ltd.
+
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import yaml
+
+from conjureup import jujudata
+
+MODELS = """
+controllers:
+  ctrl:
+    models:
+      admin/controller:
+        uuid: 1111
+      admin/default:
+        uuid: 2222
+      bob/shared:
+        uuid: 3333
+    current-model: admin/default
+  old:
+    models:
+      default:
+        uuid: 4444
+    current-model: default
+  idle:
+    models: {}
+"""
+
+
+class JujuDataTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.juju_data = tempfile.mkdtemp()
+        self.env_patcher = patch.dict(os.environ,
+                                      {'JUJU_DATA': self.juju_data})
+        self.env_patcher.start()
+        self.cache_patcher = patch.object(jujudata, 'CACHE', {})
+        self.cache_patcher.start()
+        self.load_patcher = patch('conjureup.jujudata.yaml.safe_load',
+                                  side_effect=yaml.safe_load)
+        self.mock_load = self.load_patcher.start()
+
+    def tearDown(self):
+        self.env_patcher.stop()
+        self.cache_patcher.stop()
+        self.load_patcher.stop()
+        shutil.rmtree(self.juju_data)
+
+    def write(self, name, content, mtime=None):
+        path = os.path.join(self.juju_data, "{}.yaml".format(name))
+        with open(path, 'w') as f:
+            f.write(content)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+
+    def test_missing_file(self):
+        "no file is None, so callers ask the juju CLI"
+        self.assertIsNone(jujudata.read('models'))
+        self.assertIsNone(jujudata.models('ctrl'))
+
+    def test_models_owner_qualified(self):
+        "owner-qualified model names are split into name and owner"
+        self.write('models', MODELS)
+        self.assertEqual(
+            {'models': [{'name': 'controller', 'owner': 'admin',
+                         'model-uuid': 1111},
+                        {'name': 'default', 'owner': 'admin',
+                         'model-uuid': 2222},
+                        {'name': 'shared', 'owner': 'bob',
+                         'model-uuid': 3333}],
+             'current-model': 'default'},
+            jujudata.models('ctrl'))
+
+    def test_models_unqualified(self):
+        "model names from older juju have no owner"
+        self.write('models', MODELS)
+        self.assertEqual(
+            {'models': [{'name': 'default', 'model-uuid': 4444}],
+             'current-model': 'default'},
+            jujudata.models('old'))
+
+    def test_models_no_current_model(self):
+        "a controller without a current model has None"
+        self.write('models', MODELS)
+        self.assertEqual({'models': [], 'current-model': None},
+                         jujudata.models('idle'))
+
+    def test_models_unknown_controller(self):
+        "a controller models.yaml doesn't know is None"
+        self.write('models', MODELS)
+        self.assertIsNone(jujudata.models('other'))
+
+    def test_cached(self):
+        "an unchanged file is parsed once"
+        self.write('models', MODELS)
+        jujudata.models('ctrl')
+        jujudata.models('ctrl')
+        self.assertEqual(1, self.mock_load.call_count)
+
+    def test_cached_copy(self):
+        "changing what's returned doesn't change the cache"
+        self.write('models', MODELS)
+        jujudata.read('models')['controllers'].clear()
+        self.assertIn('ctrl', jujudata.read('models')['controllers'])
+
+    def test_size_change_rereads(self):
+        "a file that changes size is parsed again"
+        self.write('models', MODELS, mtime=1000)
+        self.assertEqual('default', jujudata.models('ctrl')['current-model'])
+        self.write('models', MODELS.replace('current-model: admin/default',
+                                            'current-model: bob/shared'),
+                   mtime=1000)
+        self.assertEqual('shared', jujudata.models('ctrl')['current-model'])
+        self.assertEqual(2, self.mock_load.call_count)
+
+    def test_mtime_change_rereads(self):
+        "a file rewritten to the same size is parsed again once its " \
+            "mtime changes"
+        self.write('models', MODELS, mtime=1000)
+        jujudata.models('ctrl')
+        self.write('models', MODELS.replace('uuid: 1111', 'uuid: 9999'),
+                   mtime=1000)
+        self.assertEqual(1111, jujudata.models('ctrl')['models'][0][
+            'model-uuid'])
+
+        self.write('models', MODELS.replace('uuid: 1111', 'uuid: 9999'),
+                   mtime=1001)
+        self.assertEqual(9999, jujudata.models('ctrl')['models'][0][
+            'model-uuid'])
+        self.assertEqual(2, self.mock_load.call_count)
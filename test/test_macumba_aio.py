@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+#
+# tests macumba's asyncio client against the fake Juju server
+#
+# Copyright 2016 Canonical, Ltd.
+
+
+import asyncio
+import time
+import unittest
+
+from macumba.aio import AsyncJujuClient
+from macumba.errors import ServerError
+from macumba.fakeserver import FakeJujuServer, FakeModel
+
+
+class AsyncJujuClientTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.model = FakeModel()
+        self.model.deploy({'application': 'mysql'})
+        self.server = FakeJujuServer(self.model).start()
+        self.loop = asyncio.new_event_loop()
+        self.client = AsyncJujuClient(self.server.url, 'secret',
+                                      loop=self.loop)
+        self.await_(self.client.login())
+
+    def tearDown(self):
+        self.await_(self.client.close())
+        self.loop.close()
+        self.server.stop()
+
+    def await_(self, coro):
+        return self.loop.run_until_complete(asyncio.wait_for(coro, 10))
+
+    def test_call(self):
+        "facade calls are coroutines returning the response"
+        status = self.await_(self.client.Client(request="FullStatus"))
+        self.assertIn('mysql', status['applications'])
+
+    def test_concurrent_calls(self):
+        "calls awaited together are in flight together"
+        self.server.latency = 0.2
+
+        async def both():
+            return await asyncio.gather(
+                self.client.Client(request="FullStatus"),
+                self.client.Client(request="ModelInfo"))
+        started = time.time()
+        status, info = self.await_(both())
+        self.assertLess(time.time() - started, 0.35)
+        self.assertIn('mysql', status['applications'])
+        self.assertEqual(self.model.uuid, info['uuid'])
+
+    def test_gather_pipelines(self):
+        "gather() sends every request before waiting on any reply"
+        self.server.latency = 0.2
+        started = time.time()
+        results = self.await_(self.client.gather(
+            [("Application", "Expose", {'application': 'mysql'}),
+             ("Client", "AddCharm", {'url': 'cs:xenial/wordpress-1'}),
+             ("Client", "FullStatus")]))
+        self.assertLess(time.time() - started, 0.35)
+        self.assertEqual(3, len(results))
+        self.assertTrue(results[2]['applications']['mysql']['exposed'])
+
+    def test_error(self):
+        "an error reply is raised from the awaited call"
+        with self.assertRaises(ServerError):
+            self.await_(self.client.Client(request="NoSuchRequest"))
+
+    def test_gather_errors(self):
+        "gather() raises the first error, or returns errors in place"
+        requests = [("Client", "FullStatus"),
+                    ("Client", "NoSuchRequest")]
+        with self.assertRaises(ServerError):
+            self.await_(self.client.gather(requests))
+
+        status, error = self.await_(self.client.gather(
+            requests, return_exceptions=True))
+        self.assertIn('mysql', status['applications'])
+        self.assertIsInstance(error, ServerError)
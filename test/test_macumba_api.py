@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+#
+# tests macumba's client against the fake Juju server
+#
+# Copyright 2016 Canonical, Ltd.
+
+
+import time
+import unittest
+from unittest.mock import patch
+
+from macumba.errors import RequestAbortedError, RequestTimeout
+from macumba.fakeserver import FakeJujuServer, FakeModel
+from macumba.v2 import JujuClient, negotiate_versions
+
+
+def wait_until(check, timeout=5):
+    deadline = time.time() + timeout
+    while not check():
+        if time.time() > deadline:
+            raise AssertionError("timed out waiting")
+        time.sleep(0.01)
+
+
+class JujuClientTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.model = FakeModel()
+        self.model.deploy({'application': 'mysql'})
+        self.server = FakeJujuServer(self.model).start()
+        self.client = JujuClient(self.server.url, 'secret',
+                                 auto_reconnect=True)
+        self.client.login()
+        # replies from here on take long enough to be cut off
+        self.server.latency = 0.5
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+
+    def test_late_reply_evicted(self):
+        "a request that times out fails, and its late reply is dropped"
+        f = self.client.submit('Client', 'FullStatus', timeout=0.1)
+        with self.assertRaises(RequestTimeout):
+            f.result(5)
+        pending = self.client.conn.pending
+        self.assertEqual(1, pending.expired)
+        wait_until(lambda: pending.evicted == 1)
+        self.assertEqual([], self.client.outstanding())
+
+    def test_idempotent_request_replayed(self):
+        "a read in flight when the connection drops is sent again once " \
+            "reconnected"
+        f = self.client.submit('Client', 'FullStatus')
+        time.sleep(0.1)
+        self.server.drop_connections()
+        self.assertIn('mysql', f.result(10)['applications'])
+        self.assertEqual(1, self.client.reconnect_count)
+
+    def test_non_idempotent_request_aborted(self):
+        "a change in flight when the connection drops isn't resent"
+        f = self.client.submit('Application', 'Expose',
+                               {'application': 'mysql'})
+        time.sleep(0.1)
+        self.server.drop_connections()
+        with self.assertRaises(RequestAbortedError):
+            f.result(10)
+
+        # the client still reconnects for what comes next
+        wait_until(lambda: self.client.reconnect_count == 1)
+        self.server.latency = 0
+        self.assertIn('mysql', self.client.Client(
+            request='FullStatus')['applications'])
+
+
+class NegotiateVersionsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.versions_patcher = patch.dict(
+            'macumba.v2._FACADE_VERSIONS', {'Client': 3, 'Application': 3})
+        self.versions_patcher.start()
+
+    def tearDown(self):
+        self.versions_patcher.stop()
+
+    def test_preferred_version(self):
+        "the version requests are written against is used when offered"
+        versions = negotiate_versions([
+            {'name': 'Client', 'versions': [2, 3, 4]}])
+        self.assertEqual({'Client': 3}, versions)
+
+    def test_older_then_newer(self):
+        "without it the newest older version is used, then the oldest " \
+            "newer one"
+        versions = negotiate_versions([
+            {'name': 'Application', 'versions': [1, 2, 4]},
+            {'name': 'Client', 'versions': [5, 4]}])
+        self.assertEqual({'Application': 2, 'Client': 4}, versions)
+
+    def test_unknown_and_empty_facades(self):
+        "unknown facades get their newest version, ones with no versions " \
+            "are left out"
+        versions = negotiate_versions([
+            {'name': 'NewFacade', 'versions': [1, 3, 2]},
+            {'name': 'Client', 'versions': []}])
+        self.assertEqual({'NewFacade': 3}, versions)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+#
+# tests macumba/pending.py
+#
+# Copyright 2016 Canonical, Ltd.
+
+
+import unittest
+from concurrent.futures import Future
+
+from macumba.errors import PendingLimitError, RequestTimeout
+from macumba.pending import PendingRequests
+
+
+class PendingRequestsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.pending = PendingRequests()
+
+    def test_resolve(self):
+        "a reply completes its future and is no longer outstanding"
+        f = Future()
+        self.pending.add(7, f, label='Client.FullStatus')
+        self.assertEqual(1, len(self.pending))
+        self.assertEqual([7], [r[0] for r in self.pending.outstanding()])
+
+        self.assertTrue(self.pending.resolve(7, {'Response': {}}))
+        self.assertEqual({'Response': {}}, f.result(0))
+        self.assertEqual(0, len(self.pending))
+        self.assertEqual([], self.pending.outstanding())
+        # kept until discarded so the reply can be picked up by id
+        self.assertIs(f, self.pending.get(7))
+        self.pending.discard(7)
+        self.assertIsNone(self.pending.get(7))
+
+    def test_second_reply_dropped(self):
+        "only the first reply to a request completes it"
+        f = Future()
+        self.pending.add(7, f)
+        self.pending.resolve(7, 'first')
+        self.assertFalse(self.pending.resolve(7, 'second'))
+        self.assertEqual('first', f.result(0))
+        self.assertEqual(1, self.pending.evicted)
+
+    def test_unknown_reply_evicted(self):
+        "a reply nothing is waiting on is counted and dropped"
+        self.assertFalse(self.pending.resolve(99, 'reply'))
+        self.assertEqual(1, self.pending.evicted)
+
+    def test_deadline_fails_request(self):
+        "a request not answered in time fails, and its late reply is " \
+            "dropped"
+        f = Future()
+        self.pending.add(7, f, label='Client.FullStatus', timeout=0.05)
+        with self.assertRaises(RequestTimeout):
+            f.result(5)
+        self.assertEqual(1, self.pending.expired)
+        self.assertIsNone(self.pending.get(7))
+        self.assertEqual(0, len(self.pending))
+
+        self.assertFalse(self.pending.resolve(7, 'late'))
+        self.assertEqual(1, self.pending.evicted)
+
+    def test_deadlines_in_order(self):
+        "the reaper expires the soonest deadline first, whatever order " \
+            "the requests were added in"
+        late, soon = Future(), Future()
+        expired = []
+        late.add_done_callback(lambda f: expired.append('late'))
+        soon.add_done_callback(lambda f: expired.append('soon'))
+        self.pending.add(1, late, timeout=0.3)
+        self.pending.add(2, soon, timeout=0.05)
+
+        self.assertRaises(RequestTimeout, soon.result, 5)
+        self.assertFalse(late.done())
+        self.assertRaises(RequestTimeout, late.result, 5)
+        self.assertEqual(['soon', 'late'], expired)
+        self.assertEqual(2, self.pending.expired)
+
+    def test_answered_request_not_expired(self):
+        "a request resolved before its deadline isn't failed by it"
+        f = Future()
+        self.pending.add(7, f, timeout=0.05)
+        self.pending.resolve(7, 'reply')
+        other = Future()
+        self.pending.add(8, other, timeout=0.1)
+        self.assertRaises(RequestTimeout, other.result, 5)
+        self.assertEqual('reply', f.result(0))
+        self.assertEqual(1, self.pending.expired)
+
+    def test_cancelled_future_dropped(self):
+        "cancelling the future stops waiting on the reply"
+        f = Future()
+        self.pending.add(7, f, timeout=10)
+        f.cancel()
+        self.assertIsNone(self.pending.get(7))
+        self.assertEqual(0, len(self.pending))
+        self.assertFalse(self.pending.resolve(7, 'late'))
+
+    def test_cancel(self):
+        "cancel() drops the request and cancels its future"
+        f = Future()
+        self.pending.add(7, f)
+        self.pending.cancel(7)
+        self.assertTrue(f.cancelled())
+        self.assertEqual(0, len(self.pending))
+
+    def test_max_pending(self):
+        "no more than max_pending requests wait on a reply at once"
+        pending = PendingRequests(max_pending=2)
+        pending.add(1, Future())
+        pending.add(2, Future())
+        with self.assertRaises(PendingLimitError):
+            pending.add(3, Future())
+
+        pending.resolve(1, 'reply')
+        pending.add(3, Future())
+        self.assertEqual(2, len(pending))
+
+    def test_fail_all(self):
+        "fail_all() fails what's waiting and leaves answered requests be"
+        answered, waiting = Future(), Future()
+        self.pending.add(1, answered)
+        self.pending.add(2, waiting)
+        self.pending.resolve(1, 'reply')
+        self.pending.fail_all(RuntimeError('closed'))
+        self.assertEqual('reply', answered.result(0))
+        self.assertRaises(RuntimeError, waiting.result, 0)
+        self.assertEqual(0, len(self.pending))
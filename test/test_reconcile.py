@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+#
+# tests reconcile.py
+#
+# Copyright 2016 Canonical, Ltd.
+
+
+import unittest
+from unittest.mock import MagicMock
+
+from conjureup.reconcile import diff
+
+
+def service(name, num_units=1, expose=False, relations=()):
+    s = MagicMock(name=name)
+    s.service_name = name
+    s.num_units = num_units
+    s.expose = expose
+    s.relations = list(relations)
+    return s
+
+
+def application(units, exposed=False):
+    return {'charm': 'cs:xenial/app-1',
+            'exposed': exposed,
+            'status': {'status': 'active', 'info': '', 'since': ''},
+            'units': {'{}/{}'.format('app', n): {'machine': str(n)}
+                      for n in range(units)}}
+
+
+def relation(a, b):
+    "a FullStatus relation between endpoints a and b"
+    endpoints = []
+    for ep in (a, b):
+        name, _, relname = ep.partition(':')
+        endpoints.append({'application': name, 'name': relname,
+                          'role': 'peer', 'subordinate': False})
+    return {'id': 0, 'key': "{} {}".format(a, b), 'interface': 'x',
+            'endpoints': endpoints}
+
+
+class DiffTestCase(unittest.TestCase):
+
+    def status(self, applications=None, relations=None, machines=None):
+        return {'model': {'name': 'mdl'},
+                'machines': machines or {},
+                'applications': applications or {},
+                'relations': relations or []}
+
+    def test_empty_model(self):
+        "everything is missing from an empty model"
+        services = [service('mysql'),
+                    service('wordpress', relations=[('wordpress:db',
+                                                     'mysql:db')])]
+        machines = [{'series': 'xenial'}]
+        d = diff(services, machines, self.status())
+        self.assertEqual(services, d.applications)
+        self.assertEqual([('wordpress:db', 'mysql:db')], d.relations)
+        self.assertEqual(machines, d.machines)
+        self.assertEqual([], d.deployed)
+
+    def test_whole_bundle_deployed(self):
+        "nothing is missing once the model has it all"
+        services = [service('mysql', num_units=2),
+                    service('wordpress', expose=True,
+                            relations=[('wordpress:db', 'mysql:db')])]
+        d = diff(services, [{'series': 'xenial'}], self.status(
+            applications={'mysql': application(2),
+                          'wordpress': application(1, exposed=True)},
+            relations=[relation('mysql:db', 'wordpress:db')],
+            machines={'0': {}}))
+        self.assertFalse(d)
+        self.assertEqual(['mysql', 'wordpress'], d.deployed)
+        self.assertEqual([('wordpress:db', 'mysql:db')], d.related)
+        self.assertEqual([], d.machines)
+
+    def test_missing_application(self):
+        "an application the model lacks is deployed"
+        mysql, wordpress = service('mysql'), service('wordpress')
+        d = diff([mysql, wordpress], [],
+                 self.status(applications={'mysql': application(1)}))
+        self.assertEqual([wordpress], d.applications)
+        self.assertEqual(['mysql'], d.deployed)
+
+    def test_missing_units(self):
+        "an application short of units gets the missing ones added"
+        mysql = service('mysql', num_units=3)
+        d = diff([mysql], [],
+                 self.status(applications={'mysql': application(1)}))
+        self.assertEqual([(mysql, 2)], d.units)
+        self.assertEqual([], d.applications)
+
+    def test_extra_units(self):
+        "units beyond the bundle's are left be"
+        d = diff([service('mysql', num_units=1)], [],
+                 self.status(applications={'mysql': application(3)}))
+        self.assertEqual([], d.units)
+
+    def test_unexposed_application(self):
+        "a deployed application the bundle exposes is exposed"
+        wordpress = service('wordpress', expose=True)
+        d = diff([wordpress, service('mysql')], [], self.status(
+            applications={'wordpress': application(1),
+                          'mysql': application(1)}))
+        self.assertEqual([wordpress], d.expose)
+
+    def test_relation_names_either_order(self):
+        "a relation matches whichever way round the model lists it"
+        services = [service('wordpress', relations=[('wordpress:db',
+                                                     'mysql:db')])]
+        for live in (relation('wordpress:db', 'mysql:db'),
+                     relation('mysql:db', 'wordpress:db')):
+            d = diff(services, [], self.status(relations=[live]))
+            self.assertEqual([('wordpress:db', 'mysql:db')], d.related)
+            self.assertEqual([], d.relations)
+
+    def test_relation_without_names_either_order(self):
+        "a bundle relation without relation names matches any between " \
+            "the two applications"
+        services = [service('wordpress', relations=[('wordpress',
+                                                     'mysql')])]
+        for live in (relation('wordpress:db', 'mysql:db'),
+                     relation('mysql:db', 'wordpress:db')):
+            d = diff(services, [], self.status(relations=[live]))
+            self.assertEqual([('wordpress', 'mysql')], d.related)
+            self.assertEqual([], d.relations)
+
+    def test_relation_with_other_name_missing(self):
+        "a relation on other endpoints of the same applications doesn't " \
+            "count"
+        services = [service('wordpress', relations=[('wordpress:db',
+                                                     'mysql:db')])]
+        d = diff(services, [], self.status(
+            relations=[relation('wordpress:cache', 'mysql:cache')]))
+        self.assertEqual([('wordpress:db', 'mysql:db')], d.relations)
+
+    def test_relation_listed_twice(self):
+        "a relation both sides of the bundle list is only added once"
+        services = [service('wordpress', relations=[('wordpress:db',
+                                                     'mysql:db')]),
+                    service('mysql', relations=[('mysql:db',
+                                                 'wordpress:db')])]
+        d = diff(services, [], self.status())
+        self.assertEqual([('wordpress:db', 'mysql:db')], d.relations)
+
+    def test_watcher_relations(self):
+        "relations in the watcher's layout match too"
+        services = [service('wordpress', relations=[('wordpress:db',
+                                                     'mysql:db')])]
+        live = {'key': 'mysql:db wordpress:db', 'id': 0,
+                'endpoints': [{'application-name': 'mysql',
+                               'relation': {'name': 'db'}},
+                              {'application-name': 'wordpress',
+                               'relation': {'name': 'db'}}]}
+        d = diff(services, [], self.status(relations=[live]))
+        self.assertEqual([('wordpress:db', 'mysql:db')], d.related)
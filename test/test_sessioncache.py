@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+#
+# tests sessioncache.py and logging in to Juju with it
+#
+# Copyright 2016 Canonical, Ltd.
+
+
+import json
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from conjureup import juju, sessioncache
+from macumba.errors import LoginError
+
+DETAILS = {'endpoints': ['10.0.0.1:17070'],
+           'uuid': 'uuid-mdl',
+           'ca-cert': 'CERT',
+           'user': 'user-admin'}
+
+
+class CacheDirTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.app_patcher = patch('conjureup.sessioncache.app')
+        mock_app = self.app_patcher.start()
+        mock_app.argv = MagicMock(cache_dir=self.cache_dir)
+        self.sessions_patcher = patch.object(sessioncache, 'SESSIONS', None)
+        self.sessions_patcher.start()
+
+    def tearDown(self):
+        self.sessions_patcher.stop()
+        self.app_patcher.stop()
+        shutil.rmtree(self.cache_dir)
+
+    def next_run(self):
+        "drops what's been read so the cache file is read again"
+        sessioncache.SESSIONS = None
+
+
+class SessionCacheTestCase(CacheDirTestCase):
+
+    def test_round_trip(self):
+        "details put are there on the next run"
+        sessioncache.put('ctrl', 'mdl', DETAILS)
+        self.next_run()
+        self.assertEqual(DETAILS, sessioncache.get('ctrl', 'mdl'))
+        self.assertIsNone(sessioncache.get('ctrl', 'other'))
+        path = os.path.join(self.cache_dir, sessioncache.SESSIONS_FILE)
+        self.assertEqual(0o600, stat.S_IMODE(os.stat(path).st_mode))
+
+    def test_get_returns_copy(self):
+        "changing what get() returns doesn't change the cache"
+        sessioncache.put('ctrl', 'mdl', DETAILS)
+        sessioncache.get('ctrl', 'mdl')['uuid'] = 'changed'
+        self.assertEqual('uuid-mdl', sessioncache.get('ctrl', 'mdl')['uuid'])
+
+    def test_forget(self):
+        "a forgotten entry is gone on the next run too"
+        sessioncache.put('ctrl', 'mdl', DETAILS)
+        sessioncache.put('ctrl', 'other', DETAILS)
+        sessioncache.forget('ctrl', 'mdl')
+        self.next_run()
+        self.assertIsNone(sessioncache.get('ctrl', 'mdl'))
+        self.assertEqual(DETAILS, sessioncache.get('ctrl', 'other'))
+
+    def test_corrupt_file(self):
+        "an unreadable cache file is ignored"
+        path = os.path.join(self.cache_dir, sessioncache.SESSIONS_FILE)
+        with open(path, 'w') as f:
+            f.write("{not json")
+        self.assertIsNone(sessioncache.get('ctrl', 'mdl'))
+        sessioncache.put('ctrl', 'mdl', DETAILS)
+        with open(path) as f:
+            self.assertEqual({'ctrl/mdl': DETAILS}, json.load(f))
+
+
+class FakeJujuClient:
+    """ Stands in for JujuClient, logging in to the models in UUIDS
+    """
+
+    UUIDS = {'uuid-mdl', 'uuid-other'}
+    # UUIDs of the models logged in to, in order
+    LOGINS = []
+
+    def __init__(self, user, url, password, **kwargs):
+        self.user = user
+        self.url = url
+        self.password = password
+        self.uuid = url.split('/model/')[1].split('/')[0]
+
+    def login(self):
+        FakeJujuClient.LOGINS.append(self.uuid)
+        if self.uuid not in self.UUIDS or self.password != 'pw':
+            raise LoginError("unknown model {}".format(self.uuid))
+
+
+class JujuLoginTestCase(CacheDirTestCase):
+
+    def setUp(self):
+        super().setUp()
+        FakeJujuClient.LOGINS = []
+        self.juju_app_patcher = patch('conjureup.juju.app')
+        self.mock_app = self.juju_app_patcher.start()
+        self.mock_app.current_controller = 'ctrl'
+        self.mock_app.current_model = 'mdl'
+
+        self.patchers = [
+            patch.object(juju, 'JujuClient', FakeJujuClient),
+            patch.object(juju, 'CLIENT', None),
+            patch.object(juju, 'USER_TAG', None),
+            patch.object(juju, 'IS_AUTHENTICATED', False),
+            patch.object(juju, 'SESSION_KEY', None),
+            patch.object(juju, 'SESSIONS', {}),
+            patch.object(juju, 'RECORD_PATH', None),
+            patch.object(juju, 'get_account', return_value={
+                'user': 'admin@local', 'password': 'pw'}),
+            patch.object(juju, 'get_controller', return_value={
+                'api-endpoints': ['10.0.0.1:17070'], 'ca-cert': 'CERT'}),
+            patch.object(juju, 'get_model'),
+        ]
+        for p in self.patchers:
+            p.start()
+
+        self.jujudata_patcher = patch('conjureup.juju.jujudata')
+        self.mock_jujudata = self.jujudata_patcher.start()
+        self.mock_jujudata.models.return_value = {'models': [
+            {'name': 'mdl', 'model-uuid': 'uuid-mdl'},
+            {'name': 'other', 'model-uuid': 'uuid-other'}]}
+
+        self.api_uuid_patcher = patch.object(juju, '_model_uuid_from_api')
+        self.mock_api_uuid = self.api_uuid_patcher.start()
+
+    def tearDown(self):
+        self.api_uuid_patcher.stop()
+        self.jujudata_patcher.stop()
+        for p in self.patchers:
+            p.stop()
+        self.juju_app_patcher.stop()
+        super().tearDown()
+
+    def test_details_cached(self):
+        "the details resolved on first login are cached for next time"
+        juju.login()
+        self.assertEqual(['uuid-mdl'], FakeJujuClient.LOGINS)
+        self.assertEqual('wss://10.0.0.1:17070/model/uuid-mdl/api',
+                         juju.CLIENT.url)
+        self.assertEqual('user-admin', juju.USER_TAG)
+        self.next_run()
+        self.assertEqual(DETAILS, sessioncache.get('ctrl', 'mdl'))
+
+    def test_cached_details_used(self):
+        "with cached details JUJU_DATA and the controller aren't asked"
+        sessioncache.put('ctrl', 'mdl', DETAILS)
+        juju.login()
+        self.assertEqual(['uuid-mdl'], FakeJujuClient.LOGINS)
+        self.assertFalse(juju.get_controller.called)
+        self.assertFalse(self.mock_jujudata.models.called)
+
+    def test_failed_cached_login_re_resolves(self):
+        "when cached details don't work they're dropped and resolved " \
+            "again, from the controller rather than JUJU_DATA"
+        stale = dict(DETAILS, uuid='uuid-gone')
+        sessioncache.put('ctrl', 'mdl', stale)
+        self.mock_jujudata.models.return_value = {'models': [
+            {'name': 'mdl', 'model-uuid': 'uuid-gone'}]}
+        self.mock_api_uuid.return_value = 'uuid-mdl'
+
+        juju.login()
+        self.assertEqual(['uuid-gone', 'uuid-mdl'], FakeJujuClient.LOGINS)
+        self.assertEqual('uuid-mdl', juju.CLIENT.uuid)
+        self.mock_api_uuid.assert_called_once_with(
+            ['10.0.0.1:17070'], 'user-admin', 'pw', 'mdl')
+        self.next_run()
+        self.assertEqual(DETAILS, sessioncache.get('ctrl', 'mdl'))
+
+    def test_failed_refresh(self):
+        "a login that still fails once refreshed is raised"
+        sessioncache.put('ctrl', 'mdl', dict(DETAILS, uuid='uuid-gone'))
+        self.mock_api_uuid.return_value = 'uuid-gone-too'
+        with self.assertRaises(LoginError):
+            juju.login()
+        self.assertFalse(juju.IS_AUTHENTICATED)
+        self.assertEqual({}, juju.SESSIONS)
+
+    def test_client_per_model(self):
+        "a client is logged in once per (controller, model) and reused"
+        juju.login()
+        mdl_client = juju.CLIENT
+
+        self.mock_app.current_model = 'other'
+        juju.login()
+        other_client = juju.CLIENT
+        self.assertIsNot(mdl_client, other_client)
+        self.assertEqual('uuid-other', other_client.uuid)
+        self.assertEqual(('ctrl', 'other'), juju.SESSION_KEY)
+
+        self.mock_app.current_model = 'mdl'
+        juju.login(force=True)
+        self.assertIs(mdl_client, juju.CLIENT)
+        self.assertEqual(('ctrl', 'mdl'), juju.SESSION_KEY)
+        self.assertEqual(['uuid-mdl', 'uuid-other'], FakeJujuClient.LOGINS)
+
+    def test_requires_login_switches_model(self):
+        "a call needing a login uses the client of the current model"
+        calls = []
+
+        @juju.requires_login
+        def call():
+            calls.append(juju.CLIENT.uuid)
+
+        call()
+        self.mock_app.current_model = 'other'
+        call()
+        self.mock_app.current_model = 'mdl'
+        call()
+        self.assertEqual(['uuid-mdl', 'uuid-other', 'uuid-mdl'], calls)
+        self.assertEqual(2, len(FakeJujuClient.LOGINS))
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+#
+# tests statusstream.py
+#
+# Copyright 2016 Canonical, Ltd.
+
+
+import io
+import json
+import unittest
+
+from conjureup.statusstream import DETAIL_ALL, StatusStream
+
+
+def state(agent, workload, message=''):
+    return {'agent': agent, 'workload': workload, 'message': message}
+
+
+class FakeClock:
+
+    def __init__(self, t=1000.0):
+        self.t = t
+
+    def __call__(self):
+        return self.t
+
+
+class StatusStreamTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.out = io.StringIO()
+        self.clock = FakeClock()
+
+    def tearDown(self):
+        for stream in getattr(self, 'streams', []):
+            if stream.timer is not None:
+                stream.timer.cancel()
+
+    def stream(self, **kwargs):
+        stream = StatusStream(self.out, clock=self.clock, **kwargs)
+        self.streams = getattr(self, 'streams', []) + [stream]
+        return stream
+
+    def lines(self):
+        return [json.loads(line) for line in self.out.getvalue().splitlines()]
+
+    def test_unthrottled_writes_each_change(self):
+        "without a throttle every change is written as it comes"
+        stream = self.stream()
+        stream.update('mysql/0', 'mysql', state('allocating', 'waiting'))
+        self.clock.t = 1005.0
+        stream.update('mysql/0', 'mysql', state('executing', 'maintenance'))
+        self.assertEqual(
+            [{'unit': 'mysql/0', 'application': 'mysql', 'old': None,
+              'new': state('allocating', 'waiting'), 't': 1000.0},
+             {'unit': 'mysql/0', 'application': 'mysql',
+              'old': state('allocating', 'waiting'),
+              'new': state('executing', 'maintenance'), 't': 1005.0}],
+            self.lines())
+
+    def test_same_status_dropped(self):
+        "a new message alone isn't a change when following the status"
+        stream = self.stream()
+        stream.update('mysql/0', 'mysql',
+                      state('executing', 'maintenance', 'installing'))
+        stream.update('mysql/0', 'mysql',
+                      state('executing', 'maintenance', 'configuring'))
+        self.assertEqual(1, len(self.lines()))
+
+    def test_detail_all_writes_message_changes(self):
+        "a new message is a change when following everything"
+        stream = self.stream(detail=DETAIL_ALL)
+        stream.update('mysql/0', 'mysql',
+                      state('executing', 'maintenance', 'installing'))
+        stream.update('mysql/0', 'mysql',
+                      state('executing', 'maintenance', 'configuring'))
+        self.assertEqual(['installing', 'configuring'],
+                         [line['new']['message'] for line in self.lines()])
+
+    def test_throttle_folds_changes(self):
+        "changes within the throttle are written as one, from the last " \
+            "state written to the latest"
+        stream = self.stream(throttle=60)
+        stream.update('mysql/0', 'mysql', state('allocating', 'waiting'))
+        stream.flush()
+        stream.update('mysql/0', 'mysql', state('executing', 'maintenance'))
+        stream.update('mysql/0', 'mysql', state('executing', 'blocked'))
+        stream.update('mysql/0', 'mysql', state('idle', 'active'))
+        self.assertEqual(1, len(self.lines()))
+
+        self.clock.t = 1060.0
+        stream.flush()
+        last = self.lines()[-1]
+        self.assertEqual(2, len(self.lines()))
+        self.assertEqual(state('allocating', 'waiting'), last['old'])
+        self.assertEqual(state('idle', 'active'), last['new'])
+        self.assertEqual(1060.0, last['t'])
+
+    def test_throttle_drops_changes_back(self):
+        "a unit that changes and changes back within the throttle isn't " \
+            "written"
+        stream = self.stream(throttle=60)
+        stream.update('mysql/0', 'mysql', state('idle', 'active'))
+        stream.flush()
+        stream.update('mysql/0', 'mysql', state('executing', 'maintenance'))
+        stream.update('mysql/0', 'mysql', state('idle', 'active'))
+        stream.flush()
+        self.assertEqual(1, len(self.lines()))
+
+    def test_removed_unit(self):
+        "a unit that goes away is written with no new state"
+        stream = self.stream()
+        stream.update('mysql/0', 'mysql', state('idle', 'active'))
+        stream.update('mysql/0', 'mysql', None)
+        stream.update('mysql/0', 'mysql', None)
+        lines = self.lines()
+        self.assertEqual(2, len(lines))
+        self.assertEqual(None, lines[-1]['new'])
+        self.assertEqual(state('idle', 'active'), lines[-1]['old'])
+
+    def test_close_writes_held_back_changes(self):
+        "closing the stream writes what the throttle held back"
+        stream = self.stream(throttle=60)
+        stream.update('mysql/0', 'mysql', state('idle', 'active'))
+        self.assertEqual([], self.lines())
+        self.out.close = lambda: None
+        stream.close()
+        self.assertEqual(1, len(self.lines()))
+        self.assertIsNone(stream.timer)
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+#
+# tests ubuntui/widgets/table.py
+#
+# Copyright 2016 Canonical, Ltd.
+
+
+import unittest
+from unittest.mock import MagicMock
+
+from ubuntui.widgets.table import LazyTable, TableWalker
+
+
+class LazyTableTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.build_row = MagicMock(
+            side_effect=lambda row: ('row', row.row_id, row.values))
+        self.build_group = MagicMock(
+            side_effect=lambda group: ('group', group))
+        self.table = LazyTable(self.build_row, self.build_group)
+        self.walker = self.table.walker
+
+    def add(self, *names):
+        for name in names:
+            self.table.add_row(name, (name,), group=name.split('/')[0])
+
+    def shown(self):
+        "what the walker hands a ListBox, top to bottom"
+        rv = []
+        w, pos = self.walker._widget(0)
+        while w is not None:
+            rv.append(w[1])
+            w, pos = self.walker.get_next(pos)
+        return rv
+
+    def test_lazy_widgets(self):
+        "no widget is built until its row is asked for"
+        self.add('a/0', 'a/1', 'b/0')
+        self.assertFalse(self.build_row.called)
+
+        self.assertEqual(('row', 'a/1', ('a/1',)), self.walker._widget(1)[0])
+        self.assertEqual(1, self.build_row.call_count)
+        # and only once
+        self.walker._widget(1)
+        self.assertEqual(1, self.build_row.call_count)
+
+    def test_cache_bound(self):
+        "only the most recently shown widgets are kept"
+        walker = TableWalker(self.build_row, self.build_group, cache_size=3)
+        table = LazyTable()
+        table.walker = walker
+        for n in range(10):
+            table.add_row(n, (str(n),))
+        for n in range(10):
+            walker._widget(n)
+        self.assertEqual([7, 8, 9], list(walker.widgets))
+
+        walker._widget(8)
+        walker._widget(0)
+        self.assertEqual([9, 8, 0], list(walker.widgets))
+        self.assertEqual(11, self.build_row.call_count)
+
+    def test_sort(self):
+        "sorting reorders rows, back to insertion order without a key"
+        self.add('b/0', 'a/1', 'a/0')
+        self.table.sort(lambda row: row.row_id)
+        self.assertEqual(['a/0', 'a/1', 'b/0'], self.shown())
+        self.table.sort(None)
+        self.assertEqual(['b/0', 'a/1', 'a/0'], self.shown())
+
+    def test_group(self):
+        "grouped rows follow a heading per group"
+        self.add('b/0', 'a/1', 'a/0')
+        self.table.sort(lambda row: row.row_id)
+        self.table.group()
+        self.assertEqual(['a', 'a/0', 'a/1', 'b', 'b/0'], self.shown())
+        self.table.group(False)
+        self.assertEqual(['a/0', 'a/1', 'b/0'], self.shown())
+
+    def test_update_row_off_screen(self):
+        "updating a row whose widget isn't built builds nothing"
+        self.add('a/0', 'a/1')
+        modified = MagicMock()
+        self.walker._modified = modified
+        self.table.update_row('a/1', ('changed',))
+        self.assertFalse(self.build_row.called)
+        self.assertFalse(modified.called)
+        self.assertEqual(('row', 'a/1', ('changed',)),
+                         self.walker._widget(1)[0])
+
+    def test_update_row_on_screen(self):
+        "updating a shown row rebuilds its widget"
+        self.add('a/0')
+        self.walker._widget(0)
+        self.table.update_row('a/0', ('changed',))
+        self.assertEqual(('row', 'a/0', ('changed',)),
+                         self.walker._widget(0)[0])
+        self.assertEqual(2, self.build_row.call_count)
+
+    def test_update_row_resorts(self):
+        "a row whose sort key changes moves"
+        self.table.add_row('a/0', ('waiting',))
+        self.table.add_row('a/1', ('active',))
+        self.table.sort(lambda row: row.values)
+        self.assertEqual(['a/1', 'a/0'], self.shown())
+        self.table.update_row('a/1', ('zzz',))
+        self.assertEqual(['a/0', 'a/1'], self.shown())
+
+    def test_focus_follows_row(self):
+        "the focused row keeps the focus when rows are reordered"
+        self.add('b/0', 'a/1', 'a/0')
+        self.walker.set_focus(0)
+        self.table.sort(lambda row: row.row_id)
+        self.assertEqual(('row', 'b/0', ('b/0',)),
+                         self.walker.get_focus()[0])
+        self.assertEqual(2, self.walker.get_focus()[1])
+
+    def test_focus_after_remove_row(self):
+        "removing rows up to the focused one moves the focus to the end"
+        self.add(*['a/{}'.format(n) for n in range(10)])
+        self.walker.set_focus(9)
+        for n in range(7, 10):
+            self.table.remove_row('a/{}'.format(n))
+        w, pos = self.walker.get_focus()
+        self.assertEqual(6, pos)
+        self.assertEqual(('row', 'a/6', ('a/6',)), w)
+
+    def test_focus_empty(self):
+        "an empty table has no focus widget"
+        self.add('a/0')
+        self.table.remove_row('a/0')
+        self.assertEqual((None, None), self.walker.get_focus())
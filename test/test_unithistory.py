@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+#
+# tests unithistory.py
+#
+# Copyright 2016 Canonical, Ltd.
+
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from conjureup import unithistory
+
+SPELL = 'wordpress-mysql'
+
+
+class UnitHistoryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.app_patcher = patch('conjureup.unithistory.app')
+        mock_app = self.app_patcher.start()
+        mock_app.argv = MagicMock(cache_dir=self.cache_dir)
+        unithistory.DB = None
+        unithistory.RUN = None
+
+        # run-1: mysql/0 up in 100s, wordpress up in 80s (its slower unit)
+        unithistory.start(SPELL, 'ctrl', 'default', run='run-1')
+        unithistory.record('mysql', 'cs:mysql-57', 'mysql/0',
+                           'allocating', 'waiting', t=1000)
+        unithistory.record('wordpress', 'cs:wordpress-5', 'wordpress/0',
+                           'allocating', 'waiting', t=1000)
+        unithistory.record('wordpress', 'cs:wordpress-5', 'wordpress/1',
+                           'allocating', 'waiting', t=1010)
+        unithistory.record('wordpress', 'cs:wordpress-5', 'wordpress/0',
+                           'idle', 'active', t=1050)
+        unithistory.record('wordpress', 'cs:wordpress-5', 'wordpress/1',
+                           'idle', 'active', t=1090)
+        unithistory.record('mysql', 'cs:mysql-57', 'mysql/0',
+                           'idle', 'active', t=1100)
+
+        # run-2: mysql/0 up in 200s, wordpress up in 40s
+        unithistory.start(SPELL, 'ctrl', 'default', run='run-2')
+        unithistory.record('mysql', 'cs:mysql-58', 'mysql/0',
+                           'allocating', 'waiting', t=2000)
+        unithistory.record('mysql', 'cs:mysql-58', 'mysql/0',
+                           'executing', 'maintenance', t=2100)
+        unithistory.record('wordpress', 'cs:wordpress-5', 'wordpress/0',
+                           'allocating', 'waiting', t=2000)
+        # charms without a workload status are up once idle
+        unithistory.record('wordpress', 'cs:wordpress-5', 'wordpress/0',
+                           'idle', 'unknown', t=2040)
+        unithistory.record('mysql', 'cs:mysql-58', 'mysql/0',
+                           'idle', 'active', t=2200)
+
+    def tearDown(self):
+        if unithistory.DB is not None:
+            unithistory.DB.close()
+        unithistory.DB = None
+        unithistory.RUN = None
+        self.app_patcher.stop()
+        shutil.rmtree(self.cache_dir)
+
+    def test_recorded(self):
+        "runs and their status changes are kept in the cache dir"
+        db = sqlite3.connect(os.path.join(self.cache_dir,
+                                          unithistory.HISTORY_FILE))
+        try:
+            self.assertEqual(
+                [('run-1', SPELL), ('run-2', SPELL)],
+                db.execute("SELECT id, spell FROM runs "
+                           "ORDER BY id").fetchall())
+            self.assertEqual(
+                [('mysql/0', 'allocating', 'waiting', 2000),
+                 ('mysql/0', 'executing', 'maintenance', 2100),
+                 ('mysql/0', 'idle', 'active', 2200)],
+                db.execute("SELECT unit, agent, workload, t "
+                           "FROM transitions WHERE run = 'run-2' "
+                           "AND application = 'mysql' "
+                           "ORDER BY t").fetchall())
+        finally:
+            db.close()
+
+    def test_unchanged_status_not_recorded(self):
+        "a status seen again isn't recorded twice"
+        unithistory.record('mysql', 'cs:mysql-58', 'mysql/0',
+                           'idle', 'active', t=2300)
+        count = unithistory.DB.execute(
+            "SELECT COUNT(*) FROM transitions WHERE run = 'run-2'").fetchone()
+        self.assertEqual((5,), count)
+
+    def test_stats(self):
+        "time to active of each application, per run, slowest unit"
+        stats = unithistory.stats(SPELL)
+        self.assertEqual(['mysql', 'wordpress'], sorted(stats))
+        self.assertEqual([100, 200], stats['mysql'].times)
+        self.assertEqual(150, stats['mysql'].median)
+        self.assertEqual('cs:mysql-58', stats['mysql'].charm)
+        self.assertEqual([40, 80], stats['wordpress'].times)
+        self.assertEqual(60, stats['wordpress'].median)
+        self.assertEqual(2, stats['wordpress'].runs)
+
+    def test_stats_exclude(self):
+        "a run can be left out, e.g. the one under way"
+        stats = unithistory.stats(SPELL, exclude='run-2')
+        self.assertEqual([100], stats['mysql'].times)
+        self.assertEqual({}, unithistory.stats('another-spell'))
+
+    def test_units_never_active(self):
+        "a run in which a unit never went active doesn't count"
+        unithistory.start(SPELL, 'ctrl', 'default', run='run-3')
+        unithistory.record('mysql', 'cs:mysql-58', 'mysql/0',
+                           'allocating', 'waiting', t=3000)
+        unithistory.record('mysql', 'cs:mysql-58', 'mysql/0',
+                           'idle', 'error', t=3500)
+        self.assertEqual([100, 200], unithistory.stats(SPELL)['mysql'].times)
+
+    def test_report(self):
+        "the report lists applications slowest first"
+        lines = unithistory.report(SPELL).splitlines()
+        self.assertEqual("Time to active for {}:".format(SPELL), lines[0])
+        self.assertEqual(['application', 'charm', 'runs', 'median', 'min',
+                          'max'], lines[1].split())
+        self.assertEqual(['mysql', 'cs:mysql-58', '2', '150s', '100s',
+                          '200s'], lines[2].split())
+        self.assertEqual(['wordpress', 'cs:wordpress-5', '2', '60s', '40s',
+                          '80s'], lines[3].split())
+        self.assertEqual("No unit history for another-spell",
+                         unithistory.report('another-spell'))
+
+    def test_eta(self):
+        "the ETA is the longest median left of the units not yet active"
+        unithistory.start(SPELL, 'ctrl', 'default', run='run-3')
+        self.assertIsNone(unithistory.eta(now=3000))
+
+        unithistory.record('mysql', 'cs:mysql-58', 'mysql/0',
+                           'allocating', 'waiting', t=3000)
+        unithistory.record('wordpress', 'cs:wordpress-5', 'wordpress/0',
+                           'allocating', 'waiting', t=3000)
+        # applications not seen before are left out
+        unithistory.record('haproxy', 'cs:haproxy-1', 'haproxy/0',
+                           'allocating', 'waiting', t=3000)
+        self.assertEqual(120, unithistory.eta(now=3030))
+
+        unithistory.record('mysql', 'cs:mysql-58', 'mysql/0',
+                           'idle', 'active', t=3040)
+        self.assertEqual(10, unithistory.eta(now=3050))
+        # overdue
+        self.assertEqual(0, unithistory.eta(now=3100))
+
+        unithistory.record('wordpress', 'cs:wordpress-5', 'wordpress/0',
+                           'idle', 'active', t=3100)
+        self.assertIsNone(unithistory.eta(now=3100))
+
+    def test_no_cache_dir(self):
+        "without a cache dir nothing is recorded"
+        unithistory.DB.close()
+        unithistory.DB = None
+        with patch('conjureup.unithistory.app') as mock_app:
+            mock_app.argv = None
+            unithistory.start(SPELL, 'ctrl', 'default', run='run-3')
+            unithistory.record('mysql', 'cs:mysql-58', 'mysql/0',
+                               'idle', 'active', t=3000)
+            self.assertEqual({}, unithistory.stats(SPELL))
+            self.assertIsNone(unithistory.eta(now=3000))
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+#
+# Times decoding of FullStatus replies with each JSON backend macumba.codec
+# can use, against the str-then-json.loads path JujuWS used to take.
+#
+# Payloads come from sessions recorded with CONJURE_UP_RECORD_JUJU_API
+# (see macumba.recorder.SessionRecorder), or from a generated model of
+# the given size when no session is given.
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from macumba import codec  # noqa isort:skip
+from macumba.fakeserver import FakeModel  # noqa isort:skip
+
+
+def parse_options(argv):
+    parser = argparse.ArgumentParser(description="bench-json-codec",
+                                     prog="bench-json-codec")
+    parser.add_argument('sessions', nargs='*', metavar='session',
+                        help='Recorded session (JSON lines) to take '
+                        'FullStatus replies from')
+    parser.add_argument('--applications', type=int, default=100,
+                        help='Applications in the generated model')
+    parser.add_argument('--units', type=int, default=5,
+                        help='Units per application in the generated model')
+    parser.add_argument('-n', '--iterations', type=int, default=20,
+                        help='Times to decode each payload')
+    return parser.parse_args(argv)
+
+
+def recorded_payloads(paths):
+    """ Wire bytes of every FullStatus reply in the recorded sessions """
+    payloads = []
+    for path in paths:
+        requests = {}
+        with open(path) as f:
+            for line in f:
+                record = json.loads(line)
+                msg = record['msg']
+                if record['dir'] == 'send':
+                    requests[msg['RequestId']] = msg.get('Request')
+                elif requests.get(msg.get('RequestId')) == 'FullStatus':
+                    payloads.append(json.dumps(msg).encode('utf-8'))
+    return payloads
+
+
+def generated_payload(applications, units):
+    model = FakeModel(applications, units)
+    msg = {'RequestId': 1, 'Response': model.full_status()}
+    return json.dumps(msg).encode('utf-8')
+
+
+def legacy_loads(data):
+    return json.loads(data.decode('utf-8'))
+
+
+def bench(loads, payloads, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for data in payloads:
+            loads(data)
+    return time.perf_counter() - start
+
+
+def main():
+    opts = parse_options(sys.argv[1:])
+    if opts.sessions:
+        payloads = recorded_payloads(opts.sessions)
+        if not payloads:
+            sys.exit("No FullStatus replies in {}".format(
+                ", ".join(opts.sessions)))
+    else:
+        payloads = [generated_payload(opts.applications, opts.units)]
+    total = sum(len(p) for p in payloads) * opts.iterations
+
+    print("{} payloads, {:.2f} MB each on average, {} iterations".format(
+        len(payloads), total / opts.iterations / len(payloads) / 1e6,
+        opts.iterations))
+    candidates = [('decode+json', legacy_loads)]
+    candidates += [(name, codec.get_backend(name)[0])
+                   for name in codec.available()]
+    baseline = None
+    for name, loads in candidates:
+        elapsed = bench(loads, payloads, opts.iterations)
+        baseline = baseline or elapsed
+        print("{:<12} {:>8.3f}s {:>9.1f} MB/s {:>6.2f}x".format(
+            name, elapsed, total / elapsed / 1e6, baseline / elapsed))
+
+
+if __name__ == '__main__':
+    main()
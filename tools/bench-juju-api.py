@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+#
+# Times the Juju API request sequences conjure-up issues for a deploy
+# against macumba's fake Juju server, so changes to the client can be
+# compared without a controller or network.
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from macumba.aio import AsyncJujuClient  # noqa isort:skip
+from macumba.fakeserver import FakeJujuServer, FakeModel  # noqa isort:skip
+from macumba.v2 import JujuClient  # noqa isort:skip
+
+
+def parse_options(argv):
+    parser = argparse.ArgumentParser(description="bench-juju-api",
+                                     prog="bench-juju-api")
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help='Seconds the fake server waits per request')
+    parser.add_argument('--applications', type=int, default=20,
+                        help='Applications to deploy')
+    parser.add_argument('--existing', type=int, default=0,
+                        help='Applications already in the model')
+    parser.add_argument('--units', type=int, default=1,
+                        help='Units per application')
+    parser.add_argument('--url', dest='url',
+                        help='Use an already running fake server')
+    return parser.parse_args(argv)
+
+
+def relations_for(names):
+    """ Chains each application to the next, like a typical bundle """
+    return [("{}:db".format(a), "{}:db".format(b))
+            for a, b in zip(names, names[1:])]
+
+
+def deploy_args(name, units):
+    return {'application': name,
+            'charm-url': 'cs:xenial/{}-1'.format(name),
+            'series': 'xenial',
+            'num-units': units}
+
+
+def bench_serial(client, names, units):
+    """ The request sequence of juju.deploy_service and set_relations:
+    AddCharm, Deploy and Expose per application, then each AddRelation,
+    each waiting on the one before
+    """
+    for name in names:
+        client.Client(request="AddCharm",
+                      params={'url': 'cs:xenial/{}-1'.format(name)})
+        client.Application(request="Deploy",
+                           params={'applications': [deploy_args(name,
+                                                                units)]})
+        client.Application(request="Expose", params={'application': name})
+    for a, b in relations_for(names):
+        client.Application(request="AddRelation",
+                           params={'Endpoints': [a, b]})
+
+
+def bench_pipelined(client, names, units):
+    """ The same requests with independent ones in flight together """
+    futures = client.submit_many(
+        [("Client", "AddCharm", {'url': 'cs:xenial/{}-1'.format(name)})
+         for name in names])
+    [f.result() for f in futures]
+    client.Application(request="Deploy",
+                       params={'applications': [deploy_args(name, units)
+                                                for name in names]})
+    futures = client.submit_many(
+        [("Application", "Expose", {'application': name})
+         for name in names] +
+        [("Application", "AddRelation", {'Endpoints': [a, b]})
+         for a, b in relations_for(names)])
+    [f.result() for f in futures]
+
+
+async def bench_asyncio(client, names, units):
+    """ The pipelined requests awaited on an asyncio loop, as the UI
+    would issue them from urwid's loop
+    """
+    await client.gather(
+        [("Client", "AddCharm", {'url': 'cs:xenial/{}-1'.format(name)})
+         for name in names])
+    await client.Application(request="Deploy",
+                             params={'applications': [
+                                 deploy_args(name, units)
+                                 for name in names]})
+    await client.gather(
+        [("Application", "Expose", {'application': name})
+         for name in names] +
+        [("Application", "AddRelation", {'Endpoints': [a, b]})
+         for a, b in relations_for(names)])
+
+
+def bench_status(client, count=10):
+    for _ in range(count):
+        client.Client(request="FullStatus")
+
+
+def run_asyncio(url, bench, names, units):
+    """ Runs bench with an AsyncJujuClient on a loop of its own
+
+    Returns seconds bench took.
+    """
+    loop = asyncio.new_event_loop()
+    client = AsyncJujuClient(url, 'secret', loop=loop)
+    loop.run_until_complete(client.login())
+    start = time.time()
+    loop.run_until_complete(bench(client, names, units))
+    elapsed = time.time() - start
+    loop.run_until_complete(client.close())
+    loop.close()
+    return elapsed
+
+
+def run(opts, label, bench, prefix):
+    server = None
+    url = opts.url
+    if url is None:
+        server = FakeJujuServer(FakeModel(opts.existing, opts.units),
+                                latency=opts.latency).start()
+        url = server.url
+    client = JujuClient(url, 'secret')
+    client.login()
+    names = ["{}-{}".format(prefix, i) for i in range(opts.applications)]
+    if asyncio.iscoroutinefunction(bench):
+        elapsed = run_asyncio(url, bench, names, opts.units)
+    else:
+        start = time.time()
+        bench(client, names, opts.units)
+        elapsed = time.time() - start
+
+    start = time.time()
+    bench_status(client)
+    status_elapsed = time.time() - start
+
+    print("{:<12} deploy {:>8.3f}s   10x FullStatus {:>8.3f}s".format(
+        label, elapsed, status_elapsed))
+    client.close()
+    if server is not None:
+        server.stop()
+    return client.stats
+
+
+def main():
+    opts = parse_options(sys.argv[1:])
+    print("{} applications, {} existing, {:.0f}ms per request".format(
+        opts.applications, opts.existing, opts.latency * 1000))
+    run(opts, "serial", bench_serial, "serial")
+    stats = run(opts, "pipelined", bench_pipelined, "pipelined")
+    run(opts, "asyncio", bench_asyncio, "asyncio")
+    print()
+    print(stats.summary())
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,8 @@
 from __future__ import unicode_literals
 
-from urwid import (Columns, ListBox)
+from collections import OrderedDict
+
+from urwid import (Columns, ListBox, ListWalker, Pile, Text)
 from ubuntui.widgets.hr import HR
 
 
@@ -56,3 +58,200 @@ class Table:
 
     def render(self):
         return ListBox(self._rows)
+
+
+class TableRow:
+    """ Data of one row of a LazyTable, its widget is built from it only
+    when the row is on screen
+    """
+
+    __slots__ = ('row_id', 'group', 'values')
+
+    def __init__(self, row_id, values, group=None):
+        self.row_id = row_id
+        self.values = values
+        self.group = group
+
+
+class TableWalker(ListWalker):
+    """ Hands a ListBox the widgets of the rows it shows, building them as
+    they're asked for
+
+    Positions are indexes into the sorted (and grouped) order of the rows,
+    where a group is an entry of its own holding the group's name.
+    """
+
+    def __init__(self, build_row, build_group, cache_size=256):
+        self.build_row = build_row
+        self.build_group = build_group
+        self.cache_size = cache_size
+        # row_id : TableRow
+        self.rows = OrderedDict()
+        self.sort_key = None
+        self.grouped = False
+        self.order = []
+        self.dirty = False
+        # row_id, or (None, group) for groups : widget
+        self.widgets = OrderedDict()
+        self.focus = 0
+        self.focus_id = None
+
+    def _entries(self):
+        if self.dirty:
+            rows = list(self.rows.values())
+            if self.sort_key is not None:
+                rows.sort(key=self.sort_key)
+            if self.grouped:
+                groups = OrderedDict()
+                for row in rows:
+                    groups.setdefault(row.group, []).append(row)
+                rows = []
+                for group in sorted(groups, key=lambda g: (g is None, g)):
+                    rows.append(group)
+                    rows.extend(groups[group])
+            self.order = rows
+            self.dirty = False
+            if self.focus_id is not None:
+                for i, entry in enumerate(self.order):
+                    if self._entry_id(entry) == self.focus_id:
+                        self.focus = i
+                        break
+                else:
+                    # the focused row has gone, keep to its position
+                    self.focus_id = None
+            self.focus = min(self.focus, max(len(self.order) - 1, 0))
+        return self.order
+
+    def _entry_id(self, entry):
+        if isinstance(entry, TableRow):
+            return entry.row_id
+        return (None, entry)
+
+    def _widget(self, position):
+        entries = self._entries()
+        if position is None or not 0 <= position < len(entries):
+            return None, None
+        entry = entries[position]
+        key = self._entry_id(entry)
+        w = self.widgets.get(key)
+        if w is None:
+            if isinstance(entry, TableRow):
+                w = self.build_row(entry)
+            else:
+                w = self.build_group(entry)
+            self.widgets[key] = w
+            if len(self.widgets) > self.cache_size:
+                self.widgets.popitem(last=False)
+        else:
+            self.widgets.move_to_end(key)
+        return w, position
+
+    def reorder(self):
+        self.dirty = True
+        self._modified()
+
+    def invalidate(self, row_id):
+        """ Drops the widget of row_id, it's rebuilt if it's shown again
+        """
+        if self.widgets.pop(row_id, None) is not None:
+            self._modified()
+
+    def get_focus(self):
+        # reordering moves the focus, so settle the order before reading it
+        self._entries()
+        return self._widget(self.focus)
+
+    def set_focus(self, position):
+        self.focus = position
+        entries = self._entries()
+        if 0 <= position < len(entries):
+            self.focus_id = self._entry_id(entries[position])
+        self._modified()
+
+    def get_next(self, position):
+        return self._widget(position + 1)
+
+    def get_prev(self, position):
+        return self._widget(position - 1)
+
+
+class LazyTable:
+    """ Table whose row widgets are only built for the rows on screen
+
+    Rows are kept as TableRow records, sorting and grouping them
+    reorders those without touching any widgets. Suited to tables of
+    thousands of rows that change often.
+
+    Arguments:
+    build_row: returns the widget of a TableRow, defaults to its values
+               in columns
+    build_group: returns the heading widget of a group name
+    """
+
+    def __init__(self, build_row=None, build_group=None):
+        self.walker = TableWalker(build_row or self._build_row,
+                                  build_group or self._build_group)
+
+    def _build_row(self, row):
+        return Pile([Columns([Text(v) for v in row.values], dividechars=1),
+                     HR(0, 0)])
+
+    def _build_group(self, group):
+        return Text(group or "")
+
+    def __contains__(self, row_id):
+        return row_id in self.walker.rows
+
+    def __len__(self):
+        return len(self.walker.rows)
+
+    def row(self, row_id):
+        return self.walker.rows[row_id]
+
+    def add_row(self, row_id, values, group=None):
+        """ Adds a row, or updates it if row_id is already in the table
+
+        Arguments:
+        row_id: unique id of the row
+        values: what's shown in the row, as build_row takes it
+        group: name of the group the row is in
+        """
+        if row_id in self.walker.rows:
+            return self.update_row(row_id, values)
+        self.walker.rows[row_id] = TableRow(row_id, values, group)
+        self.walker.reorder()
+
+    def update_row(self, row_id, values):
+        """ Changes what row_id shows, its widget is only rebuilt if it's
+        on screen
+        """
+        row = self.walker.rows[row_id]
+        if row.values == values:
+            return
+        key = self.walker.sort_key
+        before = key(row) if key is not None else None
+        row.values = values
+        if key is not None and key(row) != before:
+            self.walker.reorder()
+        self.walker.invalidate(row_id)
+
+    def remove_row(self, row_id):
+        if self.walker.rows.pop(row_id, None) is not None:
+            self.walker.widgets.pop(row_id, None)
+            self.walker.reorder()
+
+    def sort(self, key=None):
+        """ Orders rows by key, a function of a TableRow, or in the order
+        they were added if None
+        """
+        self.walker.sort_key = key
+        self.walker.reorder()
+
+    def group(self, grouped=True):
+        """ Shows rows under a heading per group
+        """
+        self.walker.grouped = grouped
+        self.walker.reorder()
+
+    def render(self):
+        return ListBox(self.walker)